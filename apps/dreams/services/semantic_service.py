@@ -1,21 +1,29 @@
-import spacy
 from typing import Dict, List, Tuple
 from django.utils.html import format_html, mark_safe
 
+from apps.things.services.nlp_registry import nlp_registry
+
 
 class SemanticService:
     """Service for semantic bit theory analysis of text."""
     
-    def __init__(self):
-        try:
-            # Load the English language model
-            self.nlp = spacy.load("en_core_web_sm")
-            self.model_loaded = True
-        except Exception as e:
-            print(f"Warning: spaCy model not loaded. Error: {e}")
-            print("Run: python -m spacy download en_core_web_sm")
-            self.nlp = None
-            self.model_loaded = False
+    @property
+    def model_name(self) -> str:
+        return nlp_registry.default_model
+    
+    @property
+    def nlp(self):
+        # Shared with apps.things: the registry loads each model once per process
+        return nlp_registry.get(self.model_name)
+    
+    @property
+    def model_loaded(self) -> bool:
+        return nlp_registry.is_loaded(self.model_name)
+    
+    def warm_up(self):
+        """Load the English language model now (safe to call more than once)."""
+        nlp_registry.warm_up([self.model_name])
+        return self.nlp
     
     def extract_semantic_bits(self, text: str) -> Dict:
         """
@@ -84,7 +92,7 @@ class SemanticService:
     
     def is_available(self) -> bool:
         """Check if the semantic service is available."""
-        return self.model_loaded and self.nlp is not None
+        return self.nlp is not None
     
     def create_highlighted_html(self, text: str) -> str:
         """
@@ -101,8 +109,9 @@ class SemanticService:
                 return format_html(
                     '<div class="p-3 bg-yellow-50 border border-yellow-200 rounded">'
                     '<p class="text-yellow-800">Semantic analysis not available. '
-                    'Please install spaCy: <code>python -m spacy download en_core_web_sm</code></p>'
-                    '</div>'
+                    'Please install spaCy: <code>python -m spacy download {}</code></p>'
+                    '</div>',
+                    self.model_name
                 )
             return text
         
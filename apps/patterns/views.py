@@ -5,6 +5,7 @@ from django.utils import timezone
 from datetime import timedelta
 from django.http import JsonResponse
 from apps.things.models import Thing
+from apps.things.services.ai_metrics import attribute_ai_calls
 from apps.things.services.ai_service import ai_service
 from .models import ThingPattern, ThingPatternOccurrence
 import json
@@ -99,7 +100,8 @@ def dashboard(request):
 
 def analyze_user_patterns(user):
     """Run pattern analysis for a user's things."""
-    things = Thing.objects.filter(user=user).order_by('thing_date')
+    # A stable order keeps chunk boundaries, and so cached chunk results, stable
+    things = Thing.objects.filter(user=user).order_by('thing_date', 'created_at')
     
     if things.count() < 3:
         return
@@ -117,7 +119,9 @@ def analyze_user_patterns(user):
         })
     
     # Get AI pattern analysis
-    patterns = ai_service.find_patterns(thing_data)
+    with attribute_ai_calls(user):
+        patterns = ai_service.find_patterns(thing_data)
+    things_by_id = {str(thing.id): thing for thing in things}
     
     # Create pattern records
     for pattern_data in patterns:
@@ -144,10 +148,10 @@ def analyze_user_patterns(user):
             pattern.occurrence_count = len(pattern_data.get('occurrences', []))
             pattern.save()
         
-        # Link things to patterns
-        for thing_idx in pattern_data.get('occurrences', []):
-            if thing_idx < len(things):
-                thing = things[thing_idx]
+        # Link things to patterns (occurrences are thing ids)
+        for thing_id in pattern_data.get('occurrences', []):
+            thing = things_by_id.get(str(thing_id))
+            if thing is not None:
                 ThingPatternOccurrence.objects.get_or_create(
                     thing=thing,
                     pattern=pattern,
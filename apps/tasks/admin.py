@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'name', 'created_at']
+    search_fields = ['name', 'key', 'last_error']
+    raw_id_fields = ['user']
+    readonly_fields = ['created_at', 'updated_at', 'finished_at', 'locked_by', 'locked_at']
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.tasks'
+    
+    def ready(self):
+        # Task handlers live in each app's tasks.py and register on import
+        autodiscover_modules('tasks')
@@ -0,0 +1,75 @@
+import multiprocessing
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(index, stop_event, once):
+    """Entry point of one worker process."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Spawned (not forked) children start without Django configured
+        django.setup()
+    from apps.tasks.services.task_queue import task_queue
+    
+    # The parent handles Ctrl+C / SIGTERM and tells workers to stop via stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    
+    worker_id = f"{socket.gethostname()}:{multiprocessing.current_process().pid}:{index}"
+    task_queue.work(worker_id, stop_event=stop_event, once=once)
+
+
+class Command(BaseCommand):
+    help = 'Run background task workers that process the apps.tasks queue'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no task is due instead of polling',
+        )
+    
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        stop_event = multiprocessing.Event()
+        
+        def request_stop(signum, frame):
+            self.stdout.write('Stopping workers after their current task...')
+            stop_event.set()
+        
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        
+        # Forked children must open their own database connections
+        connections.close_all()
+        
+        processes = []
+        for index in range(workers):
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(index, stop_event, options['once']),
+                name=f"task-worker-{index}",
+            )
+            process.start()
+            processes.append(process)
+        
+        self.stdout.write(self.style.SUCCESS(f"Started {workers} task worker(s)"))
+        
+        for process in processes:
+            process.join()
+        
+        failed = [process.name for process in processes if process.exitcode]
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Workers exited with errors: {', '.join(failed)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('All task workers stopped'))
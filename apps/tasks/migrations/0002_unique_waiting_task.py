@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_duplicate_waiting_tasks(apps, schema_editor):
+    """Keep only the newest not-yet-attempted task per name and key, as enqueue() would have."""
+    Task = apps.get_model('tasks', 'Task')
+    waiting = Task.objects.filter(status='queued', attempts=0).exclude(key='').order_by('-created_at')
+    seen = set()
+    duplicates = []
+    for pk, name, key in waiting.values_list('pk', 'name', 'key'):
+        if (name, key) in seen:
+            duplicates.append(pk)
+        seen.add((name, key))
+    Task.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='key',
+            field=models.CharField(blank=True, help_text='Groups tasks about the same object; waiting tasks with the same name and key are merged', max_length=100),
+        ),
+        migrations.RunPython(drop_duplicate_waiting_tasks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('attempts', 0), ('status', 'queued'), models.Q(('key', ''), _negated=True)), fields=('name', 'key'), name='unique_waiting_task'),
+        ),
+    ]
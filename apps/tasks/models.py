@@ -0,0 +1,91 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+import uuid
+
+
+class Task(models.Model):
+    """A unit of background work, claimed and run by `manage.py run_workers`."""
+    
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(
+        max_length=100,
+        help_text="Registered handler name"
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Keyword arguments passed to the handler"
+    )
+    key = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Groups tasks about the same object; waiting tasks with the same name and key are merged"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tasks',
+        null=True,
+        blank=True
+    )
+    
+    # Execution state
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        help_text="Not claimed before this time (used for retry backoff)"
+    )
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    # Outcome
+    result = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'tasks'
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['name', 'key', 'status']),
+        ]
+        constraints = [
+            # At most one task per name and key waits for its first attempt
+            models.UniqueConstraint(
+                fields=['name', 'key'],
+                condition=models.Q(status='queued', attempts=0) & ~models.Q(key=''),
+                name='unique_waiting_task'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status not in self.ACTIVE_STATUSES
@@ -0,0 +1,321 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from ..models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """
+    Database-backed task queue; the tasks table is the only broker.
+    
+    Handlers register by name with @task_queue.register('app.handler') and
+    receive the task payload as keyword arguments; an optional on_failure
+    callback gets the same arguments once the task has failed for good. Workers claim queued rows
+    with a conditional UPDATE, so any number of worker processes can poll the
+    same table without double-running a task. A failing task is retried with
+    exponential backoff until max_attempts, then marked failed. While a
+    handler runs its worker refreshes the task's lock every HEARTBEAT_SECONDS,
+    so only tasks whose worker died are put back by requeue_stale().
+    
+    With TASK_QUEUE['EAGER'] set, enqueue() runs the task in-process right
+    after the surrounding transaction commits, which keeps development usable
+    without a worker running.
+    """
+    
+    def __init__(self):
+        config = getattr(settings, 'TASK_QUEUE', {})
+        self.eager = config.get('EAGER', False)
+        self.max_attempts = config.get('MAX_ATTEMPTS', 5)
+        self.backoff_seconds = config.get('BACKOFF_SECONDS', 10)
+        self.backoff_max_seconds = config.get('BACKOFF_MAX_SECONDS', 60 * 60)
+        self.poll_interval = config.get('POLL_INTERVAL', 1.0)
+        self.lock_timeout_seconds = config.get('LOCK_TIMEOUT_SECONDS', 15 * 60)
+        self.heartbeat_seconds = config.get('HEARTBEAT_SECONDS', self.lock_timeout_seconds / 3)
+        self._handlers = {}
+        self._failure_handlers = {}
+    
+    def register(self, name: str, on_failure: Optional[Callable] = None) -> Callable:
+        """Decorator registering a handler under name, and on_failure for its final failure."""
+        def decorator(func):
+            self._handlers[name] = func
+            if on_failure:
+                self._failure_handlers[name] = on_failure
+            return func
+        return decorator
+    
+    def enqueue(
+        self,
+        name: str,
+        payload: Optional[Dict] = None,
+        user=None,
+        key: str = '',
+        max_attempts: Optional[int] = None,
+        delay: Optional[timedelta] = None
+    ) -> Task:
+        """
+        Queue a task and return it.
+        
+        If key is given and a task with the same name and key is still waiting
+        for its first attempt, that task is reused with the new payload instead
+        of queueing a duplicate (e.g. repeated saves of the same thing). The
+        unique_waiting_task constraint makes the lookup and insert atomic.
+        """
+        if name not in self._handlers:
+            raise KeyError(f"No task handler registered for '{name}'")
+        
+        payload = payload or {}
+        run_after = timezone.now() + (delay or timedelta())
+        
+        fields = {
+            'payload': payload,
+            'user': user,
+            'max_attempts': max_attempts or self.max_attempts,
+            'run_after': run_after,
+        }
+        if not key:
+            task = Task.objects.create(name=name, key=key, **fields)
+        else:
+            task = self._merge_waiting(name, key, fields)
+        
+        if self.eager and not delay:
+            transaction.on_commit(lambda: self._run_eager(task.pk))
+        return task
+    
+    def _merge_waiting(self, name: str, key: str, fields: Dict) -> Task:
+        """Create the waiting task for name and key, or update the one already queued."""
+        while True:
+            # get_or_create falls back to the lookup when a concurrent insert wins the
+            # constraint; it re-raises if that task was claimed before the lookup
+            try:
+                task, created = Task.objects.get_or_create(
+                    name=name,
+                    key=key,
+                    status=Task.STATUS_QUEUED,
+                    attempts=0,
+                    defaults=fields
+                )
+            except IntegrityError:
+                continue
+            if created:
+                return task
+            
+            # A worker may claim the task in between; then queue a new one
+            updated = Task.objects.filter(pk=task.pk, status=Task.STATUS_QUEUED, attempts=0).update(
+                payload=fields['payload'],
+                run_after=Least(F('run_after'), fields['run_after']),
+                updated_at=timezone.now()
+            )
+            if updated:
+                task.refresh_from_db()
+                return task
+    
+    def claim(self, worker_id: str) -> Optional[Task]:
+        """Claim the next due task for worker_id, or return None if there is none."""
+        now = timezone.now()
+        candidates = Task.objects.filter(
+            status=Task.STATUS_QUEUED,
+            run_after__lte=now,
+            attempts__lt=F('max_attempts')
+        ).order_by('run_after').values_list('pk', flat=True)[:10]
+        
+        for pk in candidates:
+            # Only one worker's conditional update can match a still-queued row
+            claimed = Task.objects.filter(
+                pk=pk,
+                status=Task.STATUS_QUEUED,
+                attempts__lt=F('max_attempts')
+            ).update(
+                status=Task.STATUS_RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+            if claimed:
+                return Task.objects.get(pk=pk)
+        return None
+    
+    def run(self, task: Task) -> Task:
+        """Run a claimed task and record its outcome."""
+        handler = self._handlers.get(task.name)
+        try:
+            if handler is None:
+                raise KeyError(f"No task handler registered for '{task.name}'")
+            with self._heartbeat(task):
+                result = handler(**task.payload)
+        except Exception as e:
+            self._record_failure(task, e)
+        else:
+            task.status = Task.STATUS_SUCCEEDED
+            task.result = result if isinstance(result, dict) else {'value': result}
+            task.last_error = ''
+            task.finished_at = timezone.now()
+            task.save(update_fields=['status', 'result', 'last_error', 'finished_at', 'updated_at'])
+            logger.info(f"Task {task.name} {task.pk} succeeded (attempt {task.attempts})")
+        return task
+    
+    def work(
+        self,
+        worker_id: Optional[str] = None,
+        stop_event: Optional[threading.Event] = None,
+        once: bool = False
+    ) -> int:
+        """
+        Claim and run tasks until stop_event is set.
+        
+        Args:
+            worker_id: Name recorded on claimed tasks (defaults to host:pid)
+            stop_event: Event that ends the loop once set
+            once: Stop as soon as no task is due instead of polling
+        
+        Returns:
+            Number of tasks run
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        stop_event = stop_event or threading.Event()
+        processed = 0
+        
+        while not stop_event.is_set():
+            close_old_connections()
+            task = self.claim(worker_id)
+            if task is None:
+                if once:
+                    break
+                self.requeue_stale()
+                stop_event.wait(self.poll_interval)
+                continue
+            
+            self.run(task)
+            processed += 1
+        
+        close_old_connections()
+        return processed
+    
+    def requeue_stale(self) -> int:
+        """
+        Put back running tasks whose worker stopped updating them (e.g. it was killed).
+        
+        Tasks that already used up their attempts are marked failed instead.
+        
+        Returns:
+            Number of tasks requeued
+        """
+        now = timezone.now()
+        stale = Task.objects.filter(
+            status=Task.STATUS_RUNNING,
+            locked_at__lt=now - timedelta(seconds=self.lock_timeout_seconds)
+        )
+        
+        exhausted = list(stale.filter(attempts__gte=F('max_attempts')))
+        for task in exhausted:
+            task.status = Task.STATUS_FAILED
+            task.locked_by = ''
+            task.locked_at = None
+            task.last_error = 'Worker stopped before the task finished'
+            task.finished_at = now
+            task.save(update_fields=['status', 'locked_by', 'locked_at', 'last_error', 'finished_at', 'updated_at'])
+            self._on_failure(task)
+        if exhausted:
+            logger.error(f"Marked {len(exhausted)} stale task(s) failed after their last attempt")
+        
+        requeued = stale.update(status=Task.STATUS_QUEUED, locked_by='', locked_at=None, updated_at=now)
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale task(s)")
+        return requeued
+    
+    @contextmanager
+    def _heartbeat(self, task: Task):
+        """Refresh task.locked_at from a side thread while the block runs."""
+        stop = threading.Event()
+        
+        def beat():
+            try:
+                while not stop.wait(self.heartbeat_seconds):
+                    Task.objects.filter(
+                        pk=task.pk,
+                        status=Task.STATUS_RUNNING,
+                        locked_by=task.locked_by
+                    ).update(locked_at=timezone.now())
+            except Exception as e:
+                logger.warning(f"Heartbeat of task {task.name} {task.pk} stopped: {e}")
+            finally:
+                # The thread's own connection would otherwise leak
+                connection.close()
+        
+        thread = threading.Thread(target=beat, name=f"task-heartbeat-{task.pk}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+    
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before retry number attempts, doubling each time with some jitter."""
+        delay = min(self.backoff_seconds * 2 ** max(attempts - 1, 0), self.backoff_max_seconds)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+    
+    def _record_failure(self, task: Task, error: Exception) -> None:
+        task.last_error = ''.join(traceback.format_exception_only(type(error), error)).strip()
+        task.locked_by = ''
+        task.locked_at = None
+        
+        if task.attempts >= task.max_attempts:
+            task.status = Task.STATUS_FAILED
+            task.finished_at = timezone.now()
+            logger.error(f"Task {task.name} {task.pk} failed after {task.attempts} attempts: {error}")
+        else:
+            task.status = Task.STATUS_QUEUED
+            task.run_after = timezone.now() + self.backoff(task.attempts)
+            logger.warning(
+                f"Task {task.name} {task.pk} attempt {task.attempts} failed: {error}; "
+                f"retrying after {task.run_after:%H:%M:%S}"
+            )
+        
+        task.save(update_fields=[
+            'status', 'last_error', 'locked_by', 'locked_at', 'run_after', 'finished_at', 'updated_at'
+        ])
+        if task.status == Task.STATUS_FAILED:
+            self._on_failure(task)
+    
+    def _on_failure(self, task: Task) -> None:
+        on_failure = self._failure_handlers.get(task.name)
+        if on_failure is None:
+            return
+        try:
+            on_failure(**task.payload)
+        except Exception as e:
+            logger.error(f"Failure handler of task {task.name} {task.pk} raised: {e}")
+    
+    def _run_eager(self, pk) -> None:
+        claimed = Task.objects.filter(
+            pk=pk,
+            status=Task.STATUS_QUEUED,
+            attempts__lt=F('max_attempts')
+        ).update(
+            status=Task.STATUS_RUNNING,
+            locked_by='eager',
+            locked_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            self.run(Task.objects.get(pk=pk))
+
+
+# Singleton instance
+task_queue = TaskQueue()
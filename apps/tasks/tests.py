@@ -0,0 +1,243 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .services.task_queue import TaskQueue
+
+QUEUE_SETTINGS = {
+    'EAGER': False,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 10,
+    'BACKOFF_MAX_SECONDS': 60,
+    'LOCK_TIMEOUT_SECONDS': 60,
+}
+
+
+class Failure(Exception):
+    pass
+
+
+def make_queue(**overrides):
+    """A queue with its own handlers: 'test.echo' returns its payload, 'test.fail' raises."""
+    with override_settings(TASK_QUEUE={**QUEUE_SETTINGS, **overrides}):
+        queue = TaskQueue()
+    queue.failures = []
+    
+    @queue.register('test.echo')
+    def echo(**payload):
+        return payload
+    
+    def on_failure(**payload):
+        queue.failures.append(payload)
+    
+    @queue.register('test.fail', on_failure=on_failure)
+    def fail(**payload):
+        raise Failure('boom')
+    
+    return queue
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.queue = make_queue()
+    
+    def test_task_is_claimed_only_once(self):
+        task = self.queue.enqueue('test.echo', {'n': 1})
+        
+        claimed = self.queue.claim('worker-a')
+        self.assertEqual(claimed.pk, task.pk)
+        self.assertEqual(claimed.status, Task.STATUS_RUNNING)
+        self.assertEqual(claimed.locked_by, 'worker-a')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(self.queue.claim('worker-b'))
+    
+    def test_task_is_not_claimed_before_run_after(self):
+        self.queue.enqueue('test.echo', delay=timedelta(minutes=5))
+        self.assertIsNone(self.queue.claim('worker'))
+    
+    def test_exhausted_task_is_not_claimed(self):
+        Task.objects.create(name='test.echo', attempts=3, max_attempts=3)
+        self.assertIsNone(self.queue.claim('worker'))
+    
+    def test_run_records_result(self):
+        self.queue.enqueue('test.echo', {'n': 1})
+        task = self.queue.run(self.queue.claim('worker'))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_SUCCEEDED)
+        self.assertEqual(task.result, {'n': 1})
+        self.assertIsNotNone(task.finished_at)
+    
+    def test_unknown_handler_is_rejected(self):
+        with self.assertRaises(KeyError):
+            self.queue.enqueue('test.missing')
+
+
+class RetryTests(TestCase):
+    def setUp(self):
+        self.queue = make_queue()
+    
+    def test_failed_attempt_is_retried_after_backoff(self):
+        self.queue.enqueue('test.fail')
+        before = timezone.now()
+        task = self.queue.run(self.queue.claim('worker'))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('boom', task.last_error)
+        self.assertEqual(task.locked_by, '')
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=8))
+        self.assertIsNone(self.queue.claim('worker'))
+    
+    def test_backoff_doubles_up_to_the_cap(self):
+        for attempts, base in [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)]:
+            delay = self.queue.backoff(attempts).total_seconds()
+            self.assertGreaterEqual(delay, base * 0.8)
+            self.assertLessEqual(delay, base * 1.2)
+    
+    def test_task_fails_after_max_attempts(self):
+        task = self.queue.enqueue('test.fail', {'n': 1})
+        for attempt in range(3):
+            Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+            self.queue.run(self.queue.claim('worker'))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_FAILED)
+        self.assertEqual(task.attempts, 3)
+        self.assertIsNotNone(task.finished_at)
+        self.assertEqual(self.queue.failures, [{'n': 1}])
+        
+        Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        self.assertIsNone(self.queue.claim('worker'))
+    
+    def test_max_attempts_per_task(self):
+        task = self.queue.enqueue('test.fail', max_attempts=1)
+        self.queue.run(self.queue.claim('worker'))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_FAILED)
+
+
+class DedupTests(TestCase):
+    def setUp(self):
+        self.queue = make_queue()
+    
+    def test_waiting_task_with_same_key_is_reused(self):
+        first = self.queue.enqueue('test.echo', {'n': 1}, key='thing-1')
+        second = self.queue.enqueue('test.echo', {'n': 2}, key='thing-1')
+        
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(Task.objects.get().payload, {'n': 2})
+    
+    def test_merge_keeps_the_earliest_run_after(self):
+        first = self.queue.enqueue('test.echo', key='thing-1')
+        self.queue.enqueue('test.echo', key='thing-1', delay=timedelta(minutes=5))
+        
+        self.assertEqual(Task.objects.get().run_after, first.run_after)
+    
+    def test_different_keys_and_names_are_not_merged(self):
+        self.queue.enqueue('test.echo', key='thing-1')
+        self.queue.enqueue('test.echo', key='thing-2')
+        self.queue.enqueue('test.fail', key='thing-1')
+        self.queue.enqueue('test.echo')
+        self.queue.enqueue('test.echo')
+        
+        self.assertEqual(Task.objects.count(), 5)
+    
+    def test_claimed_task_is_not_reused(self):
+        first = self.queue.enqueue('test.echo', {'n': 1}, key='thing-1')
+        self.queue.claim('worker')
+        second = self.queue.enqueue('test.echo', {'n': 2}, key='thing-1')
+        
+        self.assertNotEqual(first.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.payload, {'n': 1})
+
+
+class RequeueStaleTests(TestCase):
+    def setUp(self):
+        self.queue = make_queue()
+    
+    def running(self, attempts, locked_for):
+        return Task.objects.create(
+            name='test.fail',
+            payload={'attempts': attempts},
+            status=Task.STATUS_RUNNING,
+            attempts=attempts,
+            max_attempts=3,
+            locked_by='dead-worker',
+            locked_at=timezone.now() - locked_for
+        )
+    
+    def test_stale_tasks_are_requeued_or_failed(self):
+        stale = self.running(1, timedelta(minutes=5))
+        exhausted = self.running(3, timedelta(minutes=5))
+        fresh = self.running(1, timedelta(seconds=5))
+        
+        self.assertEqual(self.queue.requeue_stale(), 1)
+        
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Task.STATUS_QUEUED)
+        self.assertEqual(stale.locked_by, '')
+        self.assertIsNone(stale.locked_at)
+        
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, Task.STATUS_FAILED)
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(self.queue.failures, [{'attempts': 3}])
+        
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, Task.STATUS_RUNNING)
+
+
+class EagerTests(TestCase):
+    def setUp(self):
+        self.queue = make_queue(EAGER=True)
+    
+    def test_task_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self.queue.enqueue('test.echo', {'n': 1})
+            self.assertEqual(Task.objects.get(pk=task.pk).status, Task.STATUS_QUEUED)
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_SUCCEEDED)
+        self.assertEqual(task.result, {'n': 1})
+        self.assertEqual(task.locked_by, 'eager')
+    
+    def test_delayed_task_is_left_for_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self.queue.enqueue('test.echo', delay=timedelta(minutes=5))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_QUEUED)
+    
+    def test_failed_eager_task_is_retried_by_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self.queue.enqueue('test.fail')
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.STATUS_QUEUED)
+        self.assertEqual(task.attempts, 1)
+
+
+class HeartbeatTests(TransactionTestCase):
+    def test_running_task_keeps_its_lock_fresh(self):
+        queue = make_queue(HEARTBEAT_SECONDS=0.05)
+        locks = []
+        
+        @queue.register('test.slow')
+        def slow():
+            locks.append(Task.objects.get(name='test.slow').locked_at)
+            time.sleep(0.3)
+            locks.append(Task.objects.get(name='test.slow').locked_at)
+        
+        queue.enqueue('test.slow')
+        task = queue.run(queue.claim('worker'))
+        
+        self.assertEqual(task.status, Task.STATUS_SUCCEEDED)
+        self.assertGreater(locks[1], locks[0])
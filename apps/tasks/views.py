@@ -0,0 +1,23 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from .models import Task
+
+
+@login_required
+def task_status(request, pk):
+    """Current state of one of the user's background tasks, for polling from the UI."""
+    task = get_object_or_404(Task, pk=pk, user=request.user)
+    
+    return JsonResponse({
+        'id': str(task.pk),
+        'name': task.name,
+        'status': task.status,
+        'finished': task.is_finished,
+        'attempts': task.attempts,
+        'max_attempts': task.max_attempts,
+        'run_after': task.run_after.isoformat(),
+        'finished_at': task.finished_at.isoformat() if task.finished_at else None,
+        'result': task.result,
+        'error': task.last_error if task.status == Task.STATUS_FAILED else '',
+    })
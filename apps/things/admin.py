@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Thing, ThingTag, ThingImage
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from .models import AICallRecord, Thing, ThingTag, ThingImage
+from .services.ai_metrics import WINDOWS, ai_metrics
 
 
 class ThingImageInline(admin.TabularInline):
@@ -62,4 +66,50 @@ class ThingImageAdmin(admin.ModelAdmin):
     list_display = ['thing', 'caption', 'order', 'uploaded_at']
     list_filter = ['uploaded_at']
     search_fields = ['caption', 'thing__title']
-    ordering = ['thing', 'order']
\ No newline at end of file
+    ordering = ['thing', 'order']
+
+
+@admin.register(AICallRecord)
+class AICallRecordAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'operation', 'model', 'provider', 'outcome', 'latency_ms',
+                    'prompt_tokens', 'completion_tokens', 'cost_usd', 'user']
+    list_filter = ['operation', 'outcome', 'provider', 'model', 'created_at']
+    search_fields = ['user__username', 'error']
+    raw_id_fields = ['user']
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/things/aicallrecord/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('metrics/', self.admin_site.admin_view(self.metrics_view), name='things_aicallrecord_metrics'),
+        ] + super().get_urls()
+
+    def metrics_view(self, request):
+        """Histograms, breakdowns and top users of the AI calls in a rolling window."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        window = request.GET.get('window', '24h')
+        if window not in WINDOWS:
+            window = '24h'
+        summary = ai_metrics.summary(window)
+        for histogram in (summary['latency_ms'], summary['tokens_per_call']):
+            peak = max(bucket['count'] for bucket in histogram['buckets']) or 1
+            for bucket in histogram['buckets']:
+                bucket['percent'] = round(100 * bucket['count'] / peak)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'AI usage',
+            'summary': summary,
+            'windows': list(WINDOWS),
+            'window': window,
+            'metrics_url': reverse('things:ai_call_metrics'),
+        }
+        return TemplateResponse(request, 'admin/things/aicallrecord/metrics.html', context)
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the things app's text pipeline.
+
+Run through management commands (benchmark_semantics, benchmark_pipeline_profiles);
+the modules here only generate inputs and measure.
+"""
@@ -0,0 +1,113 @@
+"""
+Throughput and failure benchmark for the AI paths.
+
+Drives the calls behind quick_capture (analysis), record_voice
+(transcription) and the pattern dashboard (pattern discovery) against the
+configured AI provider from a pool of threads, the way concurrent requests
+and task workers would, with ai_cache bypassed so every call reaches the
+backend. Meant to be pointed at the stand-in server (AI_PROVIDER=standin).
+"""
+import os
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.test import override_settings
+
+from ..services.ai_providers import get_provider
+from ..services.ai_service import ai_service
+from ..services.openai_client import OpenAIError
+from .corpus import synthetic_corpus
+from .semantic import percentile
+
+PATHS = ('analyze', 'transcribe', 'patterns')
+
+
+def silent_wav(path: str, seconds: float) -> str:
+    """Write seconds of 16 kHz mono silence to path."""
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(16000)
+        audio.writeframes(b'\0\0' * int(16000 * seconds))
+    return path
+
+
+def measure(call: Callable[[int], None], calls: int, concurrency: int) -> Dict:
+    """Run call(0..calls-1) on concurrency threads; latency percentiles, throughput and failures."""
+    latencies: List[float] = []
+    failures: Dict[str, int] = {}
+    
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            call(i)
+            error = None
+        except (OpenAIError, OSError, KeyError, IndexError, TypeError, ValueError) as e:
+            error = getattr(e, 'status', None) or type(e).__name__
+        return (time.perf_counter() - start) * 1000, error
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        for elapsed, error in pool.map(timed, range(calls)):
+            latencies.append(elapsed)
+            if error is not None:
+                failures[str(error)] = failures.get(str(error), 0) + 1
+    wall = time.perf_counter() - start
+    
+    latencies.sort()
+    failed = sum(failures.values())
+    return {
+        'calls': calls,
+        'concurrency': concurrency,
+        'ok': calls - failed,
+        'failed': failed,
+        'failures': failures,
+        'wall_seconds': round(wall, 3),
+        'calls_per_second': round(calls / wall, 2) if wall else 0,
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'max_ms': round(latencies[-1], 1) if latencies else 0,
+    }
+
+
+def benchmark_ai(paths=PATHS, calls: int = 50, concurrency: int = 8, words: int = 200) -> Dict:
+    """Measure each path; pattern calls each cover a batch of 20 entries."""
+    provider = get_provider()
+    texts = synthetic_corpus(words, max(calls, 20))
+    results = {
+        'provider': provider.name,
+        'available': provider.available,
+        'paths': {},
+    }
+    if not provider.available:
+        return results
+    
+    # Failures raise here instead of being swallowed by the public entry points
+    def analyze(i):
+        ai_service._request_analysis(texts[i % len(texts)])
+    
+    def patterns(i):
+        things = [
+            {'id': f"{i}-{j}", 'date': '2024-01-01', 'text': texts[(i + j) % len(texts)]}
+            for j in range(20)
+        ]
+        # find_patterns logs failed requests instead of raising
+        if not ai_service.find_patterns(things):
+            raise ValueError('no patterns found')
+    
+    with tempfile.TemporaryDirectory(prefix='ai-benchmark-') as workdir:
+        recording = silent_wav(os.path.join(workdir, 'recording.wav'), 10)
+        
+        def transcribe(i):
+            provider.transcribe_sync(recording)
+        
+        calls_by_path = {'analyze': analyze, 'transcribe': transcribe, 'patterns': patterns}
+        with override_settings(AI_CACHE={**settings.AI_CACHE, 'MAX_ENTRIES': 0}):
+            for path in paths:
+                results['paths'][path] = measure(calls_by_path[path], calls, concurrency)
+    return results
@@ -0,0 +1,172 @@
+"""
+Local stand-in for the OpenAI API, for benchmarking the AI paths offline.
+
+Serves POST /v1/chat/completions and /v1/audio/transcriptions with answers
+shaped like the real ones. Single, batched, pattern map and pattern reduce
+requests are recognised by AIService's system prompts and answered from
+canned JSON sized to the request: one result per batched text, pattern
+occurrences among the chunk's texts, candidates merged by name. Answers
+depend only on the request, so runs are reproducible.
+
+Every response waits latency_ms +/- jitter_ms, and a share error_rate fails
+with one of error_statuses; both are drawn from an RNG seeded with seed.
+GET /stats reports what has been served. Start it with run_ai_standin and
+set AI_PROVIDER=standin.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from aiohttp import web
+
+from ..services.ai_service import (
+    BATCH_ANALYSIS_PROMPT, PATTERN_MAP_PROMPT, PATTERN_REDUCE_PROMPT, estimate_tokens
+)
+
+DEFAULT_CANNED = {
+    'analysis': {
+        'themes': ['journey', 'change'],
+        'symbols': ['water', 'door'],
+        'entities': ['home'],
+    },
+    'patterns': [
+        {'name': 'Recurring journeys', 'type': 'theme', 'description': 'Travelling somewhere new', 'confidence': 0.8},
+        {'name': 'Water', 'type': 'symbol', 'description': 'Rivers, rain and the sea', 'confidence': 0.6},
+        {'name': 'Unease before change', 'type': 'emotion', 'description': 'Anxiety ahead of transitions', 'confidence': 0.5},
+    ],
+    'transcript': 'This is a transcript from the local stand-in server.',
+}
+PROMPT_KINDS = {
+    BATCH_ANALYSIS_PROMPT: 'batch',
+    PATTERN_MAP_PROMPT: 'pattern_map',
+    PATTERN_REDUCE_PROMPT: 'pattern_reduce',
+}
+BATCH_TEXT = re.compile(r'^### Text (\d+)$', re.M)
+MAP_TEXT = re.compile(r'^Text (\d+) \(', re.M)
+CANDIDATE = re.compile(r'^Candidate (\d+) \[(\w+)\] (.+?): (.*) \(confidence ([\d.]+), in \d+ texts\)$', re.M)
+
+
+class StandInServer:
+    """aiohttp application answering OpenAI-style requests with canned data."""
+    
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (503,),
+        canned: Optional[Dict] = None,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses) or [503]
+        self.canned = {**DEFAULT_CANNED, **(canned or {})}
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.started = time.time()
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/v1/audio/transcriptions', self.transcriptions)
+        app.router.add_get('/stats', self.stats)
+        return app
+    
+    def answer(self, messages: List[Dict]) -> Dict:
+        """The JSON content a chat request is answered with, and its kind."""
+        system = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+        user = '\n'.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+        kind = PROMPT_KINDS.get(system, 'analysis')
+        analysis = self.canned['analysis']
+        patterns = self.canned['patterns']
+        
+        if kind == 'batch':
+            content = {'results': [{'id': int(n), **analysis} for n in BATCH_TEXT.findall(user)]}
+        elif kind == 'pattern_map':
+            numbers = [int(n) for n in MAP_TEXT.findall(user)]
+            # Pattern i appears in every (i + 1)-th text, so patterns differ in reach
+            content = {'patterns': [
+                {**pattern, 'occurrences': [n for n in numbers if (n - 1) % (i + 1) == 0]}
+                for i, pattern in enumerate(patterns)
+            ]}
+        elif kind == 'pattern_reduce':
+            merged = {}
+            for number, type_, name, description, confidence in CANDIDATE.findall(user):
+                pattern = merged.setdefault(name, {
+                    'name': name, 'type': type_, 'description': description,
+                    'confidence': float(confidence), 'members': [],
+                })
+                pattern['members'].append(int(number))
+            content = {'patterns': list(merged.values())}
+        else:
+            content = dict(analysis)
+        return {'kind': kind, 'content': content}
+    
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        messages = body.get('messages', [])
+        answer = self.answer(messages)
+        self.requests[answer['kind']] += 1
+        failure = await self._delay_or_fail(answer['kind'])
+        if failure is not None:
+            return failure
+        
+        content = json.dumps(answer['content'])
+        prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        return web.json_response({
+            'id': f"standin-{sum(self.requests.values())}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'standin'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+    
+    async def transcriptions(self, request: web.Request) -> web.Response:
+        # Read the upload so request handling costs what a real one would
+        await request.post()
+        self.requests['transcription'] += 1
+        failure = await self._delay_or_fail('transcription')
+        if failure is not None:
+            return failure
+        return web.Response(text=self.canned['transcript'])
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'requests': dict(self.requests),
+            'errors': dict(self.errors),
+            'latency_ms': self.latency_ms,
+            'jitter_ms': self.jitter_ms,
+            'error_rate': self.error_rate,
+        })
+    
+    async def _delay_or_fail(self, kind: str) -> Optional[web.Response]:
+        delay = max(self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        fail = self.random.random() < self.error_rate
+        status = self.random.choice(self.error_statuses)
+        await asyncio.sleep(delay / 1000)
+        if not fail:
+            return None
+        
+        self.errors[kind] += 1
+        return web.json_response(
+            {'error': {'message': f"Stand-in injected error for {kind}", 'type': 'standin_error'}},
+            status=status
+        )
@@ -0,0 +1,36 @@
+import random
+from typing import List
+
+SUBJECTS = ['I', 'She', 'My brother', 'The old man', 'We', 'A stranger', 'The teacher']
+VERBS = ['walked', 'ran', 'found', 'opened', 'watched', 'carried', 'remembered', 'followed']
+OBJECTS = [
+    'the red door', 'a quiet river', 'an empty house', 'the long hallway',
+    'a broken clock', 'the crowded train', 'a letter from home', 'the dark forest',
+]
+ADVERBS = ['slowly', 'again', 'quickly', 'suddenly', 'carefully', 'never']
+TAILS = ['before sunrise', 'in the rain', 'without a word', 'near the station', 'after dinner']
+
+# Entry sizes (in words) used by default across the benchmarks
+DEFAULT_SIZES = [50, 200, 1000, 5000, 20000]
+
+
+def synthetic_entry(word_count: int, seed: int = 0) -> str:
+    """Deterministic journal-like text of roughly word_count words, split into paragraphs."""
+    rng = random.Random(seed)
+    sentences = []
+    words = 0
+    while words < word_count:
+        sentence = (
+            f"{rng.choice(SUBJECTS)} {rng.choice(ADVERBS)} {rng.choice(VERBS)} "
+            f"{rng.choice(OBJECTS)} {rng.choice(TAILS)}."
+        )
+        sentences.append(sentence)
+        words += len(sentence.split())
+    
+    paragraphs = [' '.join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)]
+    return '\n\n'.join(paragraphs)
+
+
+def synthetic_corpus(word_count: int, entries: int, seed: int = 0) -> List[str]:
+    """entries distinct synthetic entries of roughly word_count words each."""
+    return [synthetic_entry(word_count, seed=seed * 100003 + i) for i in range(entries)]
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark for the highlighted HTML renderer.
+
+Compares HighlightRenderer against the per-token format_html implementation
+it replaced (kept here as reference_render) on synthetic tokens, so no
+spaCy model is needed, and checks the outputs are identical.
+"""
+import re
+import statistics
+import time
+from typing import Dict, List, Sequence
+
+from django.utils.html import format_html, mark_safe
+
+from ..services.semantic_html import highlight_renderer, class_only_renderer
+from .corpus import synthetic_entry
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+POS_CYCLE = ['PRON', 'ADV', 'VERB', 'DET', 'ADJ', 'NOUN', 'ADP', 'PUNCT']
+
+
+def synthetic_tokens(text: str) -> List[Dict]:
+    """Token dicts for text with a deterministic mix of verb, noun and other phrases."""
+    tokens = []
+    for i, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        pos = POS_CYCLE[i % len(POS_CYCLE)]
+        phrase = 'verb' if pos in ('VERB', 'ADV') else 'noun' if pos in ('NOUN', 'ADJ', 'DET') else None
+        tokens.append({
+            'text': match.group(),
+            'idx': match.start(),
+            'pos': pos,
+            'lemma': match.group().lower(),
+            'phrase': phrase,
+        })
+    return tokens
+
+
+def reference_render(text: str, tokens: Sequence[Dict]) -> str:
+    """The previous renderer: one format_html call per token."""
+    spans = [token for token in tokens if not token['text'].isspace()]
+    html_paragraphs = []
+    span_count = len(spans)
+    k = 0
+    offset = 0
+    
+    for paragraph in text.split('\n\n'):
+        start = offset
+        end = start + len(paragraph)
+        offset = end + 2
+        
+        if not paragraph.strip():
+            while k < span_count and spans[k]['idx'] < end:
+                k += 1
+            continue
+        
+        html_parts = []
+        cursor = start
+        
+        while k < span_count and spans[k]['idx'] < end:
+            span = spans[k]
+            k += 1
+            
+            gap = text[cursor:span['idx']]
+            html_parts.append(gap.replace('\r\n', '\n').replace('\n', '<br>'))
+            
+            if span['phrase'] == 'verb':
+                html_parts.append(format_html(
+                    '<span class="semantic-verb-phrase" style="color: #3B82F6 !important; font-weight: 500 !important; display: inline !important;" '
+                    'data-phrase="verb" data-lemma="{}" title="Verb phrase component">{}</span>',
+                    span['lemma'], span['text']
+                ))
+            elif span['phrase'] == 'noun':
+                html_parts.append(format_html(
+                    '<span class="semantic-noun-phrase" style="color: #10B981 !important; font-weight: 500 !important; display: inline !important;" '
+                    'data-phrase="noun" data-lemma="{}" title="Noun phrase component">{}</span>',
+                    span['lemma'], span['text']
+                ))
+            else:
+                html_parts.append(format_html(
+                    '<span class="semantic-other" style="display: inline !important;" data-pos="{}" title="{}">{}</span>',
+                    span['pos'], span['pos'], span['text']
+                ))
+            
+            cursor = span['idx'] + len(span['text'])
+        
+        gap = text[cursor:end]
+        html_parts.append(gap.replace('\r\n', '\n').replace('\n', '<br>'))
+        html_paragraphs.append('<p>' + ''.join(html_parts) + '</p>')
+    
+    return mark_safe(''.join(html_paragraphs))
+
+
+def _median_ms(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_highlight(sizes: Sequence[int], repeat: int = 20) -> List[Dict]:
+    """Median render time and output size per entry size for each renderer."""
+    results = []
+    for size in sizes:
+        # Include an escapable character and a single line break in every entry
+        text = synthetic_entry(size, seed=size).replace('.', ' & co.', 1).replace('. ', '.\n', 1)
+        tokens = synthetic_tokens(text)
+        
+        reference = reference_render(text, tokens)
+        fast = highlight_renderer.render(text, tokens)
+        class_only = class_only_renderer.render(text, tokens)
+        
+        reference_ms = _median_ms(lambda: reference_render(text, tokens), repeat)
+        fast_ms = _median_ms(lambda: highlight_renderer.render(text, tokens), repeat)
+        class_only_ms = _median_ms(lambda: class_only_renderer.render(text, tokens), repeat)
+        
+        results.append({
+            'words': size,
+            'tokens': len(tokens),
+            'identical': fast == reference,
+            'reference_ms': round(reference_ms, 3),
+            'fast_ms': round(fast_ms, 3),
+            'class_only_ms': round(class_only_ms, 3),
+            'speedup': round(reference_ms / fast_ms, 2) if fast_ms else 0.0,
+            'inline_bytes': len(fast.encode('utf-8')),
+            'class_only_bytes': len(class_only.encode('utf-8')),
+        })
+    return results
@@ -0,0 +1,214 @@
+"""
+Latency, throughput and memory benchmarks for SemanticService.
+
+Every measurement runs with semantic_cache bypassed so it reflects real
+analysis work. Timing and memory are measured in separate passes because
+tracemalloc slows allocation-heavy code down considerably.
+"""
+import gc
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+from ..services.semantic_cache import semantic_cache
+from ..services.semantic_service import SEMANTIC_SCHEMA_VERSION, semantic_service
+from .corpus import DEFAULT_SIZES, synthetic_corpus
+
+RESULTS_FORMAT = 1
+
+# Public SemanticService entry points under test, by result name
+METHODS = {
+    'extract_semantic_bits': semantic_service.extract_semantic_bits,
+    'create_highlighted_html': semantic_service.create_highlighted_html,
+    'get_semantic_relationships': semantic_service.get_semantic_relationships,
+    'calculate_semantic_density': semantic_service.calculate_semantic_density,
+}
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Linearly interpolated p-th percentile (0-100) of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def latency_summary(timings_ms: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(timings_ms)
+    return {
+        'p50': round(percentile(ordered, 50), 3),
+        'p95': round(percentile(ordered, 95), 3),
+        'p99': round(percentile(ordered, 99), 3),
+        'mean': round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        'min': round(ordered[0], 3) if ordered else 0.0,
+        'max': round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def peak_memory_bytes(run: Callable[[], object]) -> int:
+    """Peak memory traced by tracemalloc while run() executes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_method(name: str, texts: Sequence[str], word_count: int) -> Dict:
+    """Time one method over texts (one call per text) and measure its peak memory."""
+    method = METHODS[name]
+    # Warm-up call so lazy model loading and first-use costs are not timed
+    method(texts[0])
+    
+    timings_ms = []
+    started = time.perf_counter()
+    for text in texts:
+        call_started = time.perf_counter()
+        method(text)
+        timings_ms.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'method': name,
+        'words': word_count,
+        'iterations': len(texts),
+        'throughput_per_s': round(len(texts) / elapsed, 3) if elapsed else 0.0,
+        'words_per_s': round(len(texts) * word_count / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': latency_summary(timings_ms),
+        'peak_memory_bytes': peak_memory_bytes(lambda: method(texts[-1])),
+    }
+
+
+def benchmark_volume(word_count: int, entries: int, batch_size: int = 64) -> Dict:
+    """Throughput of extract_semantic_bits_many over many entries of one size."""
+    texts = synthetic_corpus(word_count, entries, seed=word_count + 1)
+    started = time.perf_counter()
+    for _ in semantic_service.extract_semantic_bits_many(texts, batch_size=batch_size):
+        pass
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'method': 'extract_semantic_bits_many',
+        'words': word_count,
+        'entries': entries,
+        'batch_size': batch_size,
+        'seconds': round(elapsed, 3),
+        'throughput_per_s': round(entries / elapsed, 3) if elapsed else 0.0,
+        'words_per_s': round(entries * word_count / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def run_semantic_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    iterations: int = 10,
+    methods: Optional[Sequence[str]] = None,
+    volume_entries: int = 100,
+    volume_words: int = 200,
+    progress: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Run every method over synthetic entries of each size.
+    
+    Args:
+        sizes: Entry sizes in words
+        iterations: Distinct entries timed per method and size
+        methods: Subset of METHODS to run (default: all)
+        volume_entries: Entries for the batched throughput run (0 skips it)
+        volume_words: Size of each entry in the batched run
+        progress: Called with each case result as it completes
+    
+    Returns:
+        JSON-serializable results with run metadata (see results_metadata())
+    """
+    cases = []
+    with semantic_cache.bypass():
+        for size in sizes:
+            # Large entries are slow; fewer iterations keep the run bounded
+            count = max(3, iterations * 5000 // size) if size > 5000 else iterations
+            texts = synthetic_corpus(size, count, seed=size)
+            for name in methods or METHODS:
+                case = benchmark_method(name, texts, size)
+                cases.append(case)
+                if progress:
+                    progress(case)
+        
+        volume = benchmark_volume(volume_words, volume_entries) if volume_entries else None
+        if volume and progress:
+            progress(volume)
+    
+    return {
+        'meta': results_metadata(),
+        'cases': cases,
+        'volume': volume,
+    }
+
+
+def results_metadata() -> Dict:
+    """What produced a result file, so runs can be matched up when comparing."""
+    nlp = semantic_service.nlp
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'model': semantic_service.model_id,
+        'pipeline': list(nlp.pipe_names) if nlp else [],
+        'schema_version': SEMANTIC_SCHEMA_VERSION,
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 0.1) -> List[Dict]:
+    """
+    Pair up cases of two result files and report relative p50 latency and throughput changes.
+    
+    A case is flagged as a regression when its p50 latency grew, or its
+    throughput fell, by more than threshold (a fraction).
+    """
+    previous = {(case['method'], case['words']): case for case in baseline.get('cases', [])}
+    changes = []
+    
+    for case in current.get('cases', []):
+        before = previous.get((case['method'], case['words']))
+        if before is None:
+            continue
+        
+        p50_change = _relative_change(before['latency_ms']['p50'], case['latency_ms']['p50'])
+        throughput_change = _relative_change(before['throughput_per_s'], case['throughput_per_s'])
+        memory_change = _relative_change(before['peak_memory_bytes'], case['peak_memory_bytes'])
+        changes.append({
+            'method': case['method'],
+            'words': case['words'],
+            'p50_change': p50_change,
+            'throughput_change': throughput_change,
+            'memory_change': memory_change,
+            'regression': p50_change > threshold or throughput_change < -threshold,
+        })
+    
+    return changes
+
+
+def _relative_change(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return round((after - before) / before, 4)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
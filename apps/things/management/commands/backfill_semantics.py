@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+
+from apps.things.models import Thing
+from apps.things.services.lemma_index import lemma_index
+from apps.things.services.relation_store import relation_store
+from apps.things.services.semantic_rollups import semantic_rollups
+from apps.things.services.semantic_service import SEMANTIC_SCHEMA_VERSION, semantic_service
+
+SEMANTIC_FIELDS = ['semantic_verbs', 'semantic_nouns', 'semantic_bits']
+
+
+def _init_worker():
+    """Load Django and the spaCy model once per pool process."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    semantic_service.warm_up()
+
+
+def _analyze_chunk(texts):
+    return list(semantic_service.extract_semantic_bits_many(texts))
+
+
+class Command(BaseCommand):
+    help = 'Recompute semantic analysis for existing things, resumably and in parallel'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only things of this username',
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Only things created on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Only things created on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--schema-version',
+            type=int,
+            default=SEMANTIC_SCHEMA_VERSION,
+            help=f'Only things whose stored analysis is older than this version '
+                 f'(default: current, {SEMANTIC_SCHEMA_VERSION})',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reprocess matching things regardless of their stored schema version',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Things read, analyzed and written per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Analysis processes (1 analyzes in this process)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='backfill_semantics.checkpoint.json',
+            help='File recording the last processed id, for resuming',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the beginning',
+        )
+    
+    def handle(self, *args, **options):
+        if not semantic_service.is_available():
+            raise CommandError('spaCy model not available; nothing to backfill.')
+        
+        filters = {
+            'user': options['user'],
+            'since': options['since'].isoformat() if options['since'] else None,
+            'until': options['until'].isoformat() if options['until'] else None,
+            'schema_version': None if options['all'] else options['schema_version'],
+        }
+        checkpoint_path = Path(options['checkpoint'])
+        checkpoint = self._load_checkpoint(checkpoint_path, filters, options['reset'])
+        
+        things = self._queryset(filters)
+        if checkpoint['last_id']:
+            things = things.filter(pk__gt=checkpoint['last_id'])
+            self.stdout.write(f"Resuming after {checkpoint['last_id']} ({checkpoint['processed']} already done)")
+        
+        total = things.count()
+        self.stdout.write(f"{total} thing(s) to analyze with {options['workers']} worker(s)")
+        if not total:
+            return
+        
+        batch_size = max(options['batch_size'], 1)
+        workers = max(options['workers'], 1)
+        pool = None
+        if workers > 1:
+            # Forked pool processes must not share this process's DB connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        
+        started = time.perf_counter()
+        done = 0
+        words = 0
+        batch = []
+        try:
+            for thing in things.only('id', 'user_id', 'thing_date', 'description').iterator(chunk_size=batch_size):
+                batch.append(thing)
+                if len(batch) >= batch_size:
+                    words += self._process(batch, pool, workers)
+                    done += len(batch)
+                    self._save_checkpoint(checkpoint_path, checkpoint, batch[-1].pk, len(batch))
+                    self._report(done, total, words, started)
+                    batch = []
+            
+            if batch:
+                words += self._process(batch, pool, workers)
+                done += len(batch)
+                self._save_checkpoint(checkpoint_path, checkpoint, batch[-1].pk, len(batch))
+                self._report(done, total, words, started)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                f"Interrupted after {done} thing(s); run again to resume from {checkpoint_path}"
+            ))
+            return
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        
+        checkpoint_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {done} thing(s)"))
+    
+    def _queryset(self, filters):
+        things = Thing.objects.order_by('pk')
+        if filters['user']:
+            user = get_user_model().objects.filter(username=filters['user']).first()
+            if user is None:
+                raise CommandError(f"No user named '{filters['user']}'")
+            things = things.filter(user=user)
+        if filters['since']:
+            things = things.filter(created_at__date__gte=filters['since'])
+        if filters['until']:
+            things = things.filter(created_at__date__lte=filters['until'])
+        if filters['schema_version'] is not None:
+            things = things.filter(
+                Q(semantic_bits__version__isnull=True)
+                | Q(semantic_bits__version__lt=filters['schema_version'])
+            )
+        return things
+    
+    def _process(self, batch, pool, workers):
+        """Analyze a batch and write it back; returns the number of words analyzed."""
+        texts = [thing.description for thing in batch]
+        if pool is None:
+            results = list(semantic_service.extract_semantic_bits_many(texts))
+        else:
+            # One contiguous slice per worker; each slice is batched through nlp.pipe
+            size = -(-len(texts) // workers)
+            slices = [texts[i:i + size] for i in range(0, len(texts), size)]
+            results = [bits for chunk in pool.map(_analyze_chunk, slices) for bits in chunk]
+        
+        before = semantic_rollups.stored_contributions(thing.pk for thing in batch)
+        for thing, semantic_bits in zip(batch, results):
+            semantic_service.apply_semantic_analysis(thing, semantic_bits)
+        
+        # bulk_update bypasses save() and its signals, so updated_at is left alone
+        with transaction.atomic():
+            Thing.objects.bulk_update(batch, SEMANTIC_FIELDS)
+            lemma_index.sync_many(batch)
+            relation_store.sync_many(batch)
+            semantic_rollups.record_many(
+                (before.get(str(thing.pk)), semantic_rollups.contribution_of(thing)) for thing in batch
+            )
+        
+        return sum(bits.get('stats', {}).get('total_words', 0) for bits in results)
+    
+    def _load_checkpoint(self, path, filters, reset):
+        if reset or not path.exists():
+            return {'filters': filters, 'last_id': None, 'processed': 0}
+        
+        checkpoint = json.loads(path.read_text())
+        if checkpoint.get('filters') != filters:
+            raise CommandError(
+                f"{path} was written for different filters ({checkpoint.get('filters')}); "
+                f"pass --reset to start over or --checkpoint to use another file"
+            )
+        return checkpoint
+    
+    def _save_checkpoint(self, path, checkpoint, last_id, count):
+        checkpoint['last_id'] = str(last_id)
+        checkpoint['processed'] += count
+        # Write then rename so an interruption never leaves a truncated checkpoint
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps(checkpoint))
+        tmp_path.replace(path)
+    
+    def _report(self, done, total, words, started):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        remaining = (total - done) / rate if rate else 0
+        self.stdout.write(
+            f"{done}/{total} things | {rate:.1f} things/s | "
+            f"{words / elapsed if elapsed else 0:.0f} words/s | ETA {remaining:.0f}s"
+        )
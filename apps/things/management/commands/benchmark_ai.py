@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.benchmarks.ai import PATHS, benchmark_ai
+
+
+class Command(BaseCommand):
+    help = 'Load-test the AI paths (analysis, transcription, patterns) against the configured AI provider'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            action='append',
+            choices=PATHS,
+            help='Path to measure (repeatable; default all)',
+        )
+        parser.add_argument(
+            '--calls',
+            type=int,
+            default=50,
+            help='Calls per path',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Calls in flight at once',
+        )
+        parser.add_argument(
+            '--words',
+            type=int,
+            default=200,
+            help='Words per synthetic entry',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write results as JSON to this file',
+        )
+    
+    def handle(self, *args, **options):
+        results = benchmark_ai(
+            options['path'] or PATHS,
+            calls=options['calls'],
+            concurrency=options['concurrency'],
+            words=options['words'],
+        )
+        if not results['available']:
+            raise CommandError(f"AI provider '{results['provider']}' is not available")
+        
+        self.stdout.write(f"Provider: {results['provider']}")
+        self.stdout.write(
+            f"{'path':<11} {'calls':>6} {'failed':>7} {'calls/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for path, result in results['paths'].items():
+            self.stdout.write(
+                f"{path:<11} {result['calls']:>6} {result['failed']:>7} {result['calls_per_second']:>8.2f} "
+                f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_ms']:>8.1f}"
+            )
+            if result['failures']:
+                self.stdout.write(f"  failures: {result['failures']}")
+        
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
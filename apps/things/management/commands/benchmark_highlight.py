@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.benchmarks.highlight import benchmark_highlight
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the highlighted HTML renderer against the per-token format_html version'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[200, 1000, 5000],
+            help='Entry sizes in words',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed runs per size and renderer',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write results as JSON to this file',
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'words':>6} {'tokens':>7} {'format_html ms':>15} {'fast ms':>8} {'speedup':>8} "
+            f"{'class-only ms':>14} {'inline KiB':>11} {'class-only KiB':>15}"
+        )
+        
+        results = benchmark_highlight(options['sizes'], options['repeat'])
+        for result in results:
+            self.stdout.write(
+                f"{result['words']:>6} {result['tokens']:>7} {result['reference_ms']:>15.2f} "
+                f"{result['fast_ms']:>8.2f} {result['speedup']:>7.2f}x {result['class_only_ms']:>14.2f} "
+                f"{result['inline_bytes'] / 1024:>11.1f} {result['class_only_bytes'] / 1024:>15.1f}"
+            )
+        
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        
+        if not all(result['identical'] for result in results):
+            raise CommandError('Fast renderer output differs from the format_html reference')
@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.things.benchmarks.corpus import synthetic_entry
+from apps.things.services.semantic_service import PIPELINE_PROFILES, semantic_service
+
+
+class Command(BaseCommand):
+    help = 'Benchmark spaCy parse time per pipeline profile against the full pipeline'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[200, 500, 1000, 2000],
+            help='Entry sizes in words',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per size and profile',
+        )
+    
+    def handle(self, *args, **options):
+        if not semantic_service.is_available():
+            self.stdout.write(self.style.ERROR('spaCy model not available; nothing to benchmark.'))
+            return
+        
+        nlp = semantic_service.nlp
+        self.stdout.write(f"Pipeline: {', '.join(nlp.pipe_names)}")
+        self.stdout.write(f"{'words':>6}  {'profile':<10} {'disabled':<18} {'median ms':>10} {'speedup':>8}")
+        
+        for size in options['sizes']:
+            text = synthetic_entry(size, seed=size)
+            # Warm up vectors/caches so the first timed run is not an outlier
+            nlp(text)
+            
+            baseline = self._median_ms(lambda: nlp(text), options['repeat'])
+            self.stdout.write(f"{size:>6}  {'full':<10} {'-':<18} {baseline:>10.1f} {1.0:>7.2f}x")
+            
+            for profile in PIPELINE_PROFILES:
+                disabled = semantic_service.disabled_components(profile)
+                elapsed = self._median_ms(lambda: nlp(text, disable=disabled), options['repeat'])
+                speedup = baseline / elapsed if elapsed else 0
+                self.stdout.write(
+                    f"{size:>6}  {profile:<10} {','.join(disabled) or '-':<18} "
+                    f"{elapsed:>10.1f} {speedup:>7.2f}x"
+                )
+    
+    def _median_ms(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
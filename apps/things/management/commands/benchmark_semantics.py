@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.benchmarks.corpus import DEFAULT_SIZES
+from apps.things.benchmarks.semantic import METHODS, compare_results, run_semantic_benchmarks
+from apps.things.services.semantic_service import semantic_service
+
+
+class Command(BaseCommand):
+    help = 'Benchmark SemanticService latency, throughput and memory on a synthetic corpus'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=DEFAULT_SIZES,
+            help='Entry sizes in words',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=10,
+            help='Entries timed per method and size (reduced automatically above 5000 words)',
+        )
+        parser.add_argument(
+            '--methods',
+            nargs='+',
+            choices=list(METHODS),
+            help='Only benchmark these methods',
+        )
+        parser.add_argument(
+            '--volume',
+            type=int,
+            default=100,
+            help='Entries in the batched extract_semantic_bits_many run (0 to skip)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write results as JSON to this file',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file from an earlier run to compare against',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.1,
+            help='Relative slowdown flagged as a regression when comparing (default 0.1)',
+        )
+    
+    def handle(self, *args, **options):
+        if not semantic_service.is_available():
+            raise CommandError('spaCy model not available; nothing to benchmark.')
+        
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+        
+        self.stdout.write(f"Model: {semantic_service.model_id}")
+        self.stdout.write(
+            f"{'method':<28} {'words':>6} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'per s':>8} {'words/s':>9} {'peak MiB':>9}"
+        )
+        
+        results = run_semantic_benchmarks(
+            sizes=options['sizes'],
+            iterations=options['iterations'],
+            methods=options['methods'],
+            volume_entries=options['volume'],
+            progress=self._print_case,
+        )
+        
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        
+        if baseline is not None:
+            self._print_comparison(compare_results(baseline, results, options['threshold']))
+    
+    def _print_case(self, case):
+        if 'latency_ms' not in case:
+            self.stdout.write(
+                f"{case['method']:<28} {case['words']:>6} {case['entries']:>4} "
+                f"batched: {case['throughput_per_s']:.1f} entries/s, {case['words_per_s']:.0f} words/s"
+            )
+            return
+        
+        latency = case['latency_ms']
+        self.stdout.write(
+            f"{case['method']:<28} {case['words']:>6} {case['iterations']:>4} "
+            f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+            f"{case['throughput_per_s']:>8.1f} {case['words_per_s']:>9.0f} "
+            f"{case['peak_memory_bytes'] / (1024 * 1024):>9.1f}"
+        )
+    
+    def _print_comparison(self, changes):
+        if not changes:
+            self.stdout.write(self.style.WARNING('No matching cases in the baseline'))
+            return
+        
+        self.stdout.write(f"{'method':<28} {'words':>6} {'p50':>8} {'per s':>8} {'memory':>8}")
+        for change in changes:
+            line = (
+                f"{change['method']:<28} {change['words']:>6} "
+                f"{change['p50_change']:>+8.1%} {change['throughput_change']:>+8.1%} "
+                f"{change['memory_change']:>+8.1%}"
+            )
+            self.stdout.write(self.style.ERROR(line + '  REGRESSION') if change['regression'] else line)
+        
+        regressions = sum(change['regression'] for change in changes)
+        if regressions:
+            raise CommandError(f"{regressions} case(s) regressed beyond the threshold")
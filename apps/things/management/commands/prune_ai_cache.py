@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.things.services.ai_cache import ai_cache
+
+
+class Command(BaseCommand):
+    help = 'Evict expired and least recently used AI cache entries and report cache usage'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete every cached AI result instead',
+        )
+    
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {ai_cache.clear()} cached result(s)"))
+            return
+        
+        pruned = ai_cache.prune()
+        stats = ai_cache.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {pruned['expired']} expired and {pruned['evicted']} evicted result(s); "
+                f"{stats['size']}/{stats['max_entries']} cached, {stats['stored_hits']} hit(s) served"
+            )
+        )
@@ -0,0 +1,139 @@
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.models import Thing
+from apps.things.services.ai_metrics import attribute_ai_calls
+from apps.things.services.ai_service import ai_service
+from apps.things.services.related_service import related_service
+from apps.things.services.search_service import algolia_search
+from apps.things.tasks import enqueue_index
+
+AI_FIELDS = ['themes', 'symbols', 'entities']
+
+
+class Command(BaseCommand):
+    help = 'Re-run AI analysis (themes, symbols, entities) over existing things, several per request'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only things of this username',
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='Only things created on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Only things created on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only things without any themes yet',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Things read, analyzed and written per batch',
+        )
+        parser.add_argument(
+            '--token-budget',
+            type=int,
+            help='Estimated prompt tokens per request (default: OPENAI_BATCH_TOKEN_BUDGET)',
+        )
+        parser.add_argument(
+            '--no-batch',
+            action='store_true',
+            help='One request per thing, as the analyze task does',
+        )
+    
+    def handle(self, *args, **options):
+        if not ai_service.available:
+            raise CommandError('OPENAI_API_KEY is not set; nothing to analyze.')
+        
+        things = Thing.objects.exclude(description='').order_by('pk')
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named '{options['user']}'")
+            things = things.filter(user=user)
+        if options['since']:
+            things = things.filter(created_at__date__gte=options['since'])
+        if options['until']:
+            things = things.filter(created_at__date__lte=options['until'])
+        if options['missing']:
+            things = things.filter(themes=[])
+        
+        total = things.count()
+        self.stdout.write(f"{total} thing(s) to analyze")
+        if not total:
+            return
+        
+        batch_size = max(options['batch_size'], 1)
+        started = time.perf_counter()
+        totals = {'cached': 0, 'batched': 0, 'single': 0, 'calls': 0}
+        user_ids = set()
+        done = 0
+        batch = []
+        for thing in things.only('id', 'user_id', 'description', 'privacy_level').iterator(chunk_size=batch_size):
+            batch.append(thing)
+            if len(batch) >= batch_size:
+                self._process(batch, options, totals)
+                user_ids.update(thing.user_id for thing in batch)
+                done += len(batch)
+                self._report(done, total, totals, started)
+                batch = []
+        
+        if batch:
+            self._process(batch, options, totals)
+            user_ids.update(thing.user_id for thing in batch)
+            done += len(batch)
+            self._report(done, total, totals, started)
+        
+        # Themes and symbols feed the related things of every reanalyzed user
+        for user_id in user_ids:
+            related_service.rebuild(user_id)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Analyzed {done} thing(s) with {totals['calls']} API call(s) "
+            f"({totals['cached']} cached, {totals['batched']} batched, {totals['single']} single)"
+        ))
+    
+    def _process(self, batch, options, totals):
+        texts = [thing.description for thing in batch]
+        # Calls packing several users' entries are not attributed to any of them
+        owners = {thing.user_id for thing in batch}
+        with attribute_ai_calls(owners.pop() if len(owners) == 1 else None):
+            if options['no_batch']:
+                results = [ai_service.analyze_thing(text) for text in texts]
+                totals['single'] += len(texts)
+                totals['calls'] += len(texts)
+            else:
+                results, stats = ai_service.analyze_things(texts, token_budget=options['token_budget'])
+                for name, count in stats.items():
+                    totals[name] += count
+        
+        for thing, analysis in zip(batch, results):
+            for field in AI_FIELDS:
+                setattr(thing, field, analysis.get(field, []))
+        
+        # bulk_update skips save() signals, so re-index community things explicitly
+        Thing.objects.bulk_update(batch, AI_FIELDS)
+        if algolia_search.enabled:
+            for thing in batch:
+                if thing.privacy_level == 'community':
+                    enqueue_index(thing)
+    
+    def _report(self, done, total, totals, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{done}/{total} things | {totals['calls']} call(s) | "
+            f"{done / elapsed if elapsed else 0:.1f} things/s"
+        )
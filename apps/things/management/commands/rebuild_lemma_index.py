@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.models import Thing
+from apps.things.services.lemma_index import lemma_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lemma index from the semantic analysis stored on things'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only things of this username',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Things re-indexed per transaction',
+        )
+    
+    def handle(self, *args, **options):
+        things = Thing.objects.order_by('pk')
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named '{options['user']}'")
+            things = things.filter(user=user)
+        
+        batch_size = max(options['batch_size'], 1)
+        done = 0
+        entries = 0
+        batch = []
+        for thing in things.only('id', 'user_id', 'semantic_bits').iterator(chunk_size=batch_size):
+            batch.append(thing)
+            if len(batch) >= batch_size:
+                entries += lemma_index.sync_many(batch)
+                done += len(batch)
+                self.stdout.write(f"{done} thing(s), {entries} index entries")
+                batch = []
+        
+        if batch:
+            entries += lemma_index.sync_many(batch)
+            done += len(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f"Indexed {done} thing(s) into {entries} lemma entries"))
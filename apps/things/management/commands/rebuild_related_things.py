@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.services.related_service import related_service
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related things of every thing from its lemmas, themes and symbols'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only things of this username',
+        )
+    
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(things__isnull=False).distinct().order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"No things for user '{options['user']}'")
+        
+        total = 0
+        for user in users:
+            count = related_service.rebuild(user.pk)
+            total += count
+            self.stdout.write(f"{user.username}: {count} thing(s)")
+        
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt related things for {total} thing(s)"))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.services.semantic_rollups import semantic_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the weekly semantic stats rollups from the stored analysis of every thing'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only things of this username',
+        )
+    
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(things__isnull=False).distinct().order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"No things for user '{options['user']}'")
+        
+        total = 0
+        for user in users:
+            count = semantic_rollups.rebuild(user.pk)
+            total += count
+            self.stdout.write(f"{user.username}: {count} week(s)")
+        
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} weekly rollup(s)"))
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+from aiohttp import web
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.things.benchmarks.ai_standin import StandInServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local, deterministic stand-in for the OpenAI API (use with AI_PROVIDER=standin)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=200,
+            help='Delay before every response',
+        )
+        parser.add_argument(
+            '--jitter-ms',
+            type=float,
+            default=0,
+            help='Random +/- variation of the delay',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Share of requests (0-1) answered with an error status',
+        )
+        parser.add_argument(
+            '--error-status',
+            type=int,
+            action='append',
+            help='Status codes of injected errors (repeatable; default 503)',
+        )
+        parser.add_argument(
+            '--canned',
+            help='JSON file overriding the canned "analysis", "patterns" and "transcript" answers',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the latency and error draws',
+        )
+    
+    def handle(self, *args, **options):
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError('--error-rate must be between 0 and 1')
+        
+        canned = None
+        if options['canned']:
+            try:
+                canned = json.loads(Path(options['canned']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['canned']}: {e}")
+        
+        server = StandInServer(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            error_statuses=options['error_status'] or [503],
+            canned=canned,
+            seed=options['seed'],
+        )
+        url = f"http://{options['host']}:{options['port']}/v1"
+        self.stdout.write(self.style.SUCCESS(f"AI stand-in listening on {url}"))
+        self.stdout.write(f"Point the app at it with AI_PROVIDER=standin AI_STANDIN_URL={url}")
+        web.run_app(server.app(), host=options['host'], port=options['port'], print=None)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from apps.things.services.nlp_registry import nlp_registry, resolve_model_name
+
+
+class Command(BaseCommand):
+    help = 'Load spaCy models and report load time and RSS growth'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Model to load: sm, md, lg, trf or a package name (repeatable; default: SEMANTIC_MODEL)'
+        )
+        parser.add_argument(
+            '--unload',
+            action='store_true',
+            help='Unload the models afterwards and report how much memory was released'
+        )
+    
+    def handle(self, *args, **options):
+        names = [resolve_model_name(name) for name in options['models'] or []]
+        stats = nlp_registry.warm_up(names or None)
+        
+        for name, model_stats in stats.items():
+            if 'error' in model_stats:
+                self.stdout.write(
+                    self.style.ERROR(f"{name}: not loaded ({model_stats['error']})")
+                )
+                continue
+            
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name}: loaded in {model_stats['load_seconds']}s, "
+                    f"RSS +{model_stats['rss_delta_bytes'] / (1024 * 1024):.1f} MiB "
+                    f"(pid {model_stats['pid']})"
+                )
+            )
+        
+        self.stdout.write(
+            f"Loaded models account for {nlp_registry.memory_bytes() / (1024 * 1024):.1f} MiB"
+        )
+        
+        if options['unload']:
+            before = nlp_registry.memory_bytes()
+            unloaded = nlp_registry.unload()
+            self.stdout.write(
+                f"Unloaded {unloaded} model(s), releasing ~{before / (1024 * 1024):.1f} MiB"
+            )
@@ -0,0 +1,144 @@
+from django.db import migrations
+
+
+# The token encoding as of this migration, copied from services.semantic_encoding
+# so later changes to that module cannot change what this migration writes.
+COLUMNAR = 'columnar'
+
+PHRASE_CODES = {'verb': 'v', 'noun': 'n', None: '-'}
+PHRASE_NAMES = {code: name for name, code in PHRASE_CODES.items()}
+
+
+def is_columnar(tokens):
+    return isinstance(tokens, dict) and tokens.get('format') == COLUMNAR
+
+
+def encode_tokens(tokens):
+    """Encode a list of token dicts into the columnar format."""
+    columns = {
+        'format': COLUMNAR,
+        'text': [],
+        'idx': [],
+        'pos': [],
+        'pos_codes': [],
+        'tag': [],
+        'tag_codes': [],
+        'lemma_lower': [],
+        'lemma': {},
+        'stop': [],
+        'punct': [],
+    }
+    lookups = {'pos': {}, 'tag': {}}
+    phrases = []
+    
+    for i, token in enumerate(tokens):
+        text = token['text']
+        columns['text'].append(text)
+        columns['idx'].append(token.get('idx', 0))
+        for name in ('pos', 'tag'):
+            code = lookups[name].get(token[name])
+            if code is None:
+                code = lookups[name][token[name]] = len(columns[f'{name}_codes'])
+                columns[f'{name}_codes'].append(token[name])
+            columns[name].append(code)
+        
+        lemma = token['lemma']
+        if lemma != text:
+            if lemma == text.lower():
+                columns['lemma_lower'].append(i)
+            else:
+                columns['lemma'][str(i)] = lemma
+        
+        if token.get('is_stop'):
+            columns['stop'].append(i)
+        if token.get('is_punct'):
+            columns['punct'].append(i)
+        phrases.append(PHRASE_CODES.get(token.get('phrase'), '-'))
+    
+    columns['phrase'] = ''.join(phrases)
+    return columns
+
+
+def decode_tokens(columns):
+    """Decode columnar tokens into a list of token dicts."""
+    lemma_lower = set(columns['lemma_lower'])
+    stop = set(columns['stop'])
+    punct = set(columns['punct'])
+    tokens = []
+    
+    for i, text in enumerate(columns['text']):
+        if i in lemma_lower:
+            lemma = text.lower()
+        else:
+            lemma = columns['lemma'].get(str(i), text)
+        tokens.append({
+            'text': text,
+            'idx': columns['idx'][i],
+            'pos': columns['pos_codes'][columns['pos'][i]],
+            'tag': columns['tag_codes'][columns['tag'][i]],
+            'lemma': lemma,
+            'is_stop': i in stop,
+            'is_punct': i in punct,
+            'phrase': PHRASE_NAMES.get(columns['phrase'][i]),
+        })
+    return tokens
+
+
+def encode_existing_tokens(apps, schema_editor):
+    """Rewrite per-token dicts in semantic_bits into the columnar format."""
+    Thing = apps.get_model('things', 'Thing')
+    batch = []
+    
+    for thing in Thing.objects.only('id', 'semantic_bits').iterator(chunk_size=500):
+        semantic_bits = thing.semantic_bits
+        tokens = (semantic_bits or {}).get('tokens')
+        if not isinstance(tokens, list):
+            continue
+        
+        semantic_bits['tokens'] = encode_tokens(tokens)
+        # Version 2 rows already carry offsets/phrases and stay current
+        if semantic_bits.get('version') == 2:
+            semantic_bits['version'] = 3
+        batch.append(thing)
+        
+        if len(batch) >= 500:
+            Thing.objects.bulk_update(batch, ['semantic_bits'])
+            batch = []
+    
+    if batch:
+        Thing.objects.bulk_update(batch, ['semantic_bits'])
+
+
+def decode_existing_tokens(apps, schema_editor):
+    """Restore per-token dicts so the previous code can read semantic_bits again."""
+    Thing = apps.get_model('things', 'Thing')
+    batch = []
+    
+    for thing in Thing.objects.only('id', 'semantic_bits').iterator(chunk_size=500):
+        semantic_bits = thing.semantic_bits
+        tokens = (semantic_bits or {}).get('tokens')
+        if not is_columnar(tokens):
+            continue
+        
+        semantic_bits['tokens'] = decode_tokens(tokens)
+        if semantic_bits.get('version') == 3:
+            semantic_bits['version'] = 2
+        batch.append(thing)
+        
+        if len(batch) >= 500:
+            Thing.objects.bulk_update(batch, ['semantic_bits'])
+            batch = []
+    
+    if batch:
+        Thing.objects.bulk_update(batch, ['semantic_bits'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0003_story_storything_story_things'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_existing_tokens, decode_existing_tokens),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0004_columnar_semantic_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LemmaIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lemma', models.CharField(max_length=100)),
+                ('pos', models.CharField(max_length=10)),
+                ('count', models.PositiveIntegerField(default=1, help_text='Tokens in the thing with this lemma and part of speech')),
+                ('thing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lemma_entries', to='things.thing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lemma_index_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'thing_lemma_index',
+                'indexes': [models.Index(fields=['user', 'lemma', 'pos'], name='thing_lemma_user_id_025040_idx')],
+                'constraints': [models.UniqueConstraint(fields=('thing', 'lemma', 'pos'), name='unique_thing_lemma_pos')],
+            },
+        ),
+    ]
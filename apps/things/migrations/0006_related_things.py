@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0005_lemma_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedThing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text="Cosine similarity of the two things' TF-IDF vectors")),
+                ('rank', models.PositiveSmallIntegerField(default=0)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='things.thing')),
+                ('thing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='things.thing')),
+            ],
+            options={
+                'db_table': 'thing_related',
+                'ordering': ['thing', 'rank'],
+                'indexes': [models.Index(fields=['thing', 'rank'], name='thing_relat_thing_i_c21839_idx')],
+                'constraints': [models.UniqueConstraint(fields=('thing', 'related'), name='unique_related_thing')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0006_related_things'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SemanticRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(blank=True, max_length=100)),
+                ('verb', models.CharField(max_length=100)),
+                ('object', models.CharField(blank=True, max_length=100)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('thing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semantic_relations', to='things.thing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semantic_relations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'thing_semantic_relations',
+                'indexes': [models.Index(fields=['user', 'verb'], name='thing_seman_user_id_854333_idx'), models.Index(fields=['user', 'subject'], name='thing_seman_user_id_4787e4_idx'), models.Index(fields=['user', 'object'], name='thing_seman_user_id_f94f55_idx')],
+                'constraints': [models.UniqueConstraint(fields=('thing', 'subject', 'verb', 'object'), name='unique_thing_relation')],
+            },
+        ),
+    ]
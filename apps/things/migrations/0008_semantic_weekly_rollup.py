@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0007_semantic_relations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SemanticWeeklyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('thing_count', models.IntegerField(default=0)),
+                ('total_tokens', models.IntegerField(default=0)),
+                ('total_words', models.IntegerField(default=0)),
+                ('content_words', models.IntegerField(default=0)),
+                ('verb_count', models.IntegerField(default=0)),
+                ('noun_count', models.IntegerField(default=0)),
+                ('adjective_count', models.IntegerField(default=0)),
+                ('density_sum', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semantic_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'thing_semantic_weekly',
+                'ordering': ['week_start'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'week_start'), name='unique_user_semantic_week')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0009_ai_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('start_seconds', models.FloatField()),
+                ('end_seconds', models.FloatField(blank=True, null=True)),
+                ('source_key', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('thing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcription_segments', to='things.thing')),
+            ],
+            options={
+                'db_table': 'thing_transcription_segments',
+                'ordering': ['thing', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('thing', 'index'), name='unique_thing_transcription_segment')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('things', '0010_transcription_segments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('operation', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=100)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('error', 'Error')], max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('latency_ms', models.FloatField()),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('audio_seconds', models.FloatField(blank=True, null=True)),
+                ('cost_usd', models.FloatField(default=0)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ai_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ai_call_records',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['operation', 'created_at'], name='ai_call_rec_operati_d77e8b_idx'), models.Index(fields=['user', 'created_at'], name='ai_call_rec_user_id_59b60f_idx')],
+            },
+        ),
+    ]
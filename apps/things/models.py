@@ -293,4 +293,278 @@ class StoryThing(models.Model):
         unique_together = [['story', 'order']]
     
     def __str__(self):
-        return f"{self.story.title} - {self.order}: {self.thing.title or 'Untitled'}"
\ No newline at end of file
+        return f"{self.story.title} - {self.order}: {self.thing.title or 'Untitled'}"
+
+
+class LemmaIndexEntry(models.Model):
+    """
+    One row per (thing, lemma, part of speech) in a thing's semantic analysis.
+    
+    A per-user inverted index over Thing.semantic_bits, maintained by
+    services.lemma_index, so lemma searches are indexed lookups instead of
+    description scans.
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='lemma_index_entries'
+    )
+    thing = models.ForeignKey(
+        Thing,
+        on_delete=models.CASCADE,
+        related_name='lemma_entries'
+    )
+    lemma = models.CharField(max_length=100)
+    pos = models.CharField(max_length=10)
+    count = models.PositiveIntegerField(
+        default=1,
+        help_text="Tokens in the thing with this lemma and part of speech"
+    )
+    
+    class Meta:
+        db_table = 'thing_lemma_index'
+        indexes = [
+            models.Index(fields=['user', 'lemma', 'pos']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['thing', 'lemma', 'pos'], name='unique_thing_lemma_pos'),
+        ]
+    
+    def __str__(self):
+        return f"{self.lemma}/{self.pos} x{self.count}"
+
+
+class RelatedThing(models.Model):
+    """
+    A precomputed nearest neighbor of a thing among the same user's things.
+    
+    Maintained by services.related_service from TF-IDF vectors over lemmas,
+    themes and symbols; rank 0 is the most similar.
+    """
+    
+    thing = models.ForeignKey(
+        Thing,
+        on_delete=models.CASCADE,
+        related_name='related_links'
+    )
+    related = models.ForeignKey(
+        Thing,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField(help_text="Cosine similarity of the two things' TF-IDF vectors")
+    rank = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'thing_related'
+        ordering = ['thing', 'rank']
+        indexes = [
+            models.Index(fields=['thing', 'rank']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['thing', 'related'], name='unique_related_thing'),
+        ]
+    
+    def __str__(self):
+        return f"{self.thing_id} ~ {self.related_id} ({self.score:.2f})"
+
+
+class SemanticRelation(models.Model):
+    """
+    A subject-verb-object triple found in a thing, as lowercased lemmas.
+    
+    Rows are derived from the 'relations' of Thing.semantic_bits and kept
+    in sync by services.relation_store; count is how often the triple occurs
+    in the thing. A missing subject or object is stored as ''.
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='semantic_relations'
+    )
+    thing = models.ForeignKey(
+        Thing,
+        on_delete=models.CASCADE,
+        related_name='semantic_relations'
+    )
+    subject = models.CharField(max_length=100, blank=True)
+    verb = models.CharField(max_length=100)
+    object = models.CharField(max_length=100, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        db_table = 'thing_semantic_relations'
+        indexes = [
+            models.Index(fields=['user', 'verb']),
+            models.Index(fields=['user', 'subject']),
+            models.Index(fields=['user', 'object']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['thing', 'subject', 'verb', 'object'],
+                name='unique_thing_relation'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject or '?'} {self.verb} {self.object or '?'} x{self.count}"
+
+
+class SemanticWeeklyRollup(models.Model):
+    """
+    Per-user, per-week totals of the semantic stats of analyzed things.
+    
+    Weeks start on Monday of the thing_date. Rows are maintained as deltas
+    by services.semantic_rollups whenever an analysis is written or a thing
+    is moved or deleted, so trends read O(weeks) rows. density_sum adds up
+    each entry's own density; content_words / total_words is the week's
+    word-weighted density.
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='semantic_rollups'
+    )
+    week_start = models.DateField()
+    thing_count = models.IntegerField(default=0)
+    total_tokens = models.IntegerField(default=0)
+    total_words = models.IntegerField(default=0)
+    content_words = models.IntegerField(default=0)
+    verb_count = models.IntegerField(default=0)
+    noun_count = models.IntegerField(default=0)
+    adjective_count = models.IntegerField(default=0)
+    density_sum = models.FloatField(default=0)
+    
+    class Meta:
+        db_table = 'thing_semantic_weekly'
+        ordering = ['week_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'week_start'],
+                name='unique_user_semantic_week'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} week of {self.week_start}: {self.thing_count} things"
+
+
+class AIResultCache(models.Model):
+    """
+    A stored AI result, addressed by a hash of its input.
+    
+    key is sha256 over the kind of call, the model, the prompt version and
+    the input text, so a changed prompt or model never reuses an old result.
+    Rows expire after settings.AI_CACHE['TIMEOUT'] and the least recently
+    used are evicted beyond MAX_ENTRIES (see services.ai_cache).
+    """
+    
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    prompt_version = models.PositiveIntegerField()
+    result = models.JSONField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'ai_result_cache'
+    
+    def __str__(self):
+        return f"{self.kind} ({self.model} v{self.prompt_version}) {self.key[:12]}"
+
+
+class TranscriptionSegment(models.Model):
+    """
+    One time slice of a thing's voice recording and its transcript.
+    
+    Long recordings are transcribed as overlapping segments (see
+    services.transcription_service). Finished segments are kept so a retried
+    transcription only redoes the ones that failed; source_key ties them to
+    the recording file they were cut from.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    thing = models.ForeignKey(
+        Thing,
+        on_delete=models.CASCADE,
+        related_name='transcription_segments'
+    )
+    index = models.PositiveIntegerField()
+    start_seconds = models.FloatField()
+    end_seconds = models.FloatField(null=True, blank=True)
+    source_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    text = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'thing_transcription_segments'
+        ordering = ['thing', 'index']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['thing', 'index'],
+                name='unique_thing_transcription_segment'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.thing_id} segment {self.index} ({self.status})"
+
+
+class AICallRecord(models.Model):
+    """
+    One AI provider call: who caused it, how long it took and what it used.
+    
+    Written in batches by services.ai_metrics and kept for
+    AI_METRICS['RETENTION_DAYS']. Retries inside one call count as one
+    record; cost_usd is priced from AI_METRICS['PRICES'] when recorded.
+    """
+    
+    OUTCOME_CHOICES = [
+        ('ok', 'OK'),
+        ('error', 'Error'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ai_calls'
+    )
+    provider = models.CharField(max_length=50)
+    operation = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    latency_ms = models.FloatField()
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    audio_seconds = models.FloatField(null=True, blank=True)
+    cost_usd = models.FloatField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        db_table = 'ai_call_records'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['operation', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.operation} ({self.model}) {self.outcome} in {self.latency_ms:.0f} ms"
@@ -0,0 +1,158 @@
+"""
+Persistent, content-addressed cache for AI results.
+
+Results are stored in AIResultCache rows keyed by sha256(kind, model, prompt
+version, text), so re-saving an entry with unchanged text reuses the stored
+analysis instead of paying for another LLM round trip, in any process.
+Entries expire after AI_CACHE['TIMEOUT'] seconds; every PRUNE_EVERY writes,
+expired rows are deleted and the least recently used beyond MAX_ENTRIES are
+evicted. Hit and miss counters are kept per process (see stats()).
+"""
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models import AIResultCache
+from .semantic_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class AICache:
+    """Reads, writes and evicts AIResultCache rows."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+    
+    @property
+    def config(self) -> Dict:
+        return settings.AI_CACHE
+    
+    @property
+    def enabled(self) -> bool:
+        return self.config['MAX_ENTRIES'] > 0
+    
+    def make_key(self, kind: str, model: str, prompt_version: int, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (kind, model, str(prompt_version), text):
+            digest.update(part.encode('utf-8'))
+            # Separator so ('ab', 'c') and ('a', 'bc') hash differently
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Any:
+        """Return the cached result for key, or MISSING if absent or expired."""
+        now = timezone.now()
+        result = (
+            AIResultCache.objects.filter(key=key, expires_at__gt=now)
+            .values_list('result', flat=True)
+            .first()
+        )
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            return MISSING
+        
+        AIResultCache.objects.filter(key=key).update(hit_count=F('hit_count') + 1, last_used_at=now)
+        with self._lock:
+            self.hits += 1
+        return result
+    
+    def set(self, key: str, kind: str, model: str, prompt_version: int, result: Any) -> None:
+        now = timezone.now()
+        fields = {
+            'kind': kind,
+            'model': model,
+            'prompt_version': prompt_version,
+            'result': result,
+            'hit_count': 0,
+            'created_at': now,
+            'last_used_at': now,
+            'expires_at': now + timedelta(seconds=self.config['TIMEOUT']),
+        }
+        try:
+            with transaction.atomic():
+                AIResultCache.objects.update_or_create(key=key, defaults=fields)
+        except IntegrityError:
+            # Another process stored the same key first; its result is as good
+            pass
+        
+        with self._lock:
+            self.writes += 1
+            prune = self.writes % max(self.config['PRUNE_EVERY'], 1) == 0
+        if prune:
+            self.prune()
+    
+    def get_or_compute(
+        self,
+        kind: str,
+        model: str,
+        prompt_version: int,
+        text: str,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return the cached result for text, calling compute on a miss.
+        
+        compute should raise rather than return a fallback when the call
+        fails, so failures are never cached.
+        """
+        if not self.enabled:
+            return compute()
+        
+        key = self.make_key(kind, model, prompt_version, text)
+        result = self.get(key)
+        if result is MISSING:
+            result = compute()
+            self.set(key, kind, model, prompt_version, result)
+        return result
+    
+    def prune(self) -> Dict[str, int]:
+        """Delete expired rows, then the least recently used beyond MAX_ENTRIES."""
+        expired, _ = AIResultCache.objects.filter(expires_at__lte=timezone.now()).delete()
+        
+        evicted = 0
+        overflow = AIResultCache.objects.count() - self.config['MAX_ENTRIES']
+        if overflow > 0:
+            stale = AIResultCache.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+            evicted, _ = AIResultCache.objects.filter(pk__in=list(stale)).delete()
+        
+        if expired or evicted:
+            logger.info(f"AI cache pruned {expired} expired and {evicted} least recently used entries")
+        return {'expired': expired, 'evicted': evicted}
+    
+    def clear(self) -> int:
+        """Delete every stored result and reset the counters; returns rows deleted."""
+        deleted, _ = AIResultCache.objects.all().delete()
+        with self._lock:
+            self.hits = self.misses = self.writes = 0
+        return deleted
+    
+    def stats(self) -> Dict:
+        """This process's hit/miss counters plus the table's size and lifetime hits."""
+        table = AIResultCache.objects.aggregate(total_hits=Sum('hit_count'))
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'size': AIResultCache.objects.count(),
+                'max_entries': self.config['MAX_ENTRIES'],
+                'stored_hits': table['total_hits'] or 0,
+            }
+
+
+# Singleton instance
+ai_cache = AICache()
@@ -0,0 +1,340 @@
+"""
+Instrumentation of AI provider calls.
+
+Every chat completion and transcription made through an AIProvider is
+recorded as an AICallRecord: provider, operation (analyze_thing,
+analyze_batch, pattern_map, pattern_reduce, transcribe), model, latency,
+tokens in and out, outcome, cost and the user the call was made for. The
+user is set with attribute_ai_calls() around a task handler or view's AI
+work; it is a context variable, so it follows the call onto the provider's
+event loop.
+
+Calls finish on that event loop, where the ORM must not be used, so
+record() only buffers. A background thread writes the buffer with
+bulk_create every FLUSH_SECONDS, or as soon as FLUSH_SIZE records are
+waiting, and prunes rows older than RETENTION_DAYS. summary() aggregates a
+rolling window into latency and token histograms, per-operation, per-model
+and per-provider breakdowns and the users driving the most cost.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from ..models import AICallRecord
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; a final open bucket holds the rest
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+PERCENTILES = (50, 95, 99)
+PRUNE_INTERVAL_SECONDS = 3600
+
+_current_user = contextvars.ContextVar('ai_call_user', default=None)
+
+
+@contextmanager
+def attribute_ai_calls(user):
+    """Attribute AI calls made inside the block to user (a user, a user id or None)."""
+    token = _current_user.set(getattr(user, 'pk', user))
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+class AIMetrics:
+    """Buffers, writes and aggregates AICallRecord rows."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer: List[AICallRecord] = []
+        self._thread = None
+        self._pid = None
+        self._last_prune = 0.0
+    
+    @property
+    def config(self) -> Dict:
+        return settings.AI_METRICS
+    
+    def record(
+        self,
+        provider: str,
+        operation: str,
+        model: str,
+        latency_ms: float,
+        usage: Optional[Dict] = None,
+        audio_seconds: Optional[float] = None,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """Buffer one finished call; safe to use from any thread or event loop."""
+        if not self.config['ENABLED']:
+            return
+        
+        usage = usage or {}
+        prompt_tokens = int(usage.get('prompt_tokens') or 0)
+        completion_tokens = int(usage.get('completion_tokens') or 0)
+        record = AICallRecord(
+            user_id=_current_user.get(),
+            provider=provider,
+            operation=operation,
+            model=model,
+            outcome='error' if error else 'ok',
+            status_code=getattr(error, 'status', None),
+            latency_ms=round(latency_ms, 1),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            audio_seconds=round(audio_seconds, 3) if audio_seconds is not None else None,
+            # Failed calls are not billed
+            cost_usd=0 if error else self.cost(model, prompt_tokens, completion_tokens, audio_seconds),
+            error=str(error)[:255] if error else '',
+            created_at=timezone.now(),
+        )
+        with self._lock:
+            self._ensure_thread()
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.config['FLUSH_SIZE']
+        if full:
+            self._wake.set()
+    
+    def cost(
+        self,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        audio_seconds: Optional[float] = None
+    ) -> float:
+        """USD cost of a call at AI_METRICS['PRICES'] (0 for unpriced models)."""
+        price = self.config['PRICES'].get(model) or {}
+        cost = (
+            prompt_tokens / 1000 * price.get('input', 0)
+            + completion_tokens / 1000 * price.get('output', 0)
+            + (audio_seconds or 0) / 60 * price.get('minute', 0)
+        )
+        return round(cost, 6)
+    
+    def flush(self) -> int:
+        """Write the buffered records now; returns how many were written."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return 0
+        try:
+            AICallRecord.objects.bulk_create(records, batch_size=500)
+        except DatabaseError as e:
+            logger.warning(f"Dropped {len(records)} AI call records: {e}")
+            return 0
+        return len(records)
+    
+    def prune(self) -> int:
+        """Delete records older than RETENTION_DAYS; returns rows deleted."""
+        cutoff = timezone.now() - timedelta(days=self.config['RETENTION_DAYS'])
+        deleted, _ = AICallRecord.objects.filter(created_at__lt=cutoff).delete()
+        return deleted
+    
+    def summary(self, window: str = '24h', user=None, top_users: int = 20) -> Dict:
+        """
+        Aggregates of the calls in the last window (a WINDOWS key), optionally for one user.
+        
+        Histograms list per-bucket counts with their upper bound ('le', None
+        for the open last bucket); percentiles are interpolated within them.
+        """
+        since = timezone.now() - WINDOWS[window]
+        rows = AICallRecord.objects.filter(created_at__gte=since)
+        if user is not None:
+            rows = rows.filter(user=user)
+        
+        totals = rows.aggregate(
+            calls=Count('id'),
+            errors=Count('id', filter=Q(outcome='error')),
+            unattributed=Count('id', filter=Q(user__isnull=True)),
+            prompt_tokens=Sum('prompt_tokens'),
+            completion_tokens=Sum('completion_tokens'),
+            audio_seconds=Sum('audio_seconds'),
+            cost_usd=Sum('cost_usd'),
+            mean_latency_ms=Avg('latency_ms'),
+            max_latency_ms=Max('latency_ms'),
+            **self._bucket_counts('latency_ms', LATENCY_BUCKETS_MS)
+        )
+        tokens = self._with_total_tokens(rows.exclude(operation='transcribe')).aggregate(
+            calls=Count('id'),
+            max_tokens=Max('total_tokens'),
+            **self._bucket_counts('total_tokens', TOKEN_BUCKETS)
+        )
+        
+        return {
+            'window': window,
+            'since': since.isoformat(),
+            'buffered': len(self._buffer),
+            'totals': {
+                'calls': totals['calls'],
+                'errors': totals['errors'],
+                'error_rate': round(totals['errors'] / totals['calls'], 4) if totals['calls'] else 0,
+                'unattributed_calls': totals['unattributed'],
+                'prompt_tokens': totals['prompt_tokens'] or 0,
+                'completion_tokens': totals['completion_tokens'] or 0,
+                'audio_seconds': round(totals['audio_seconds'] or 0, 1),
+                'cost_usd': round(totals['cost_usd'] or 0, 4),
+                'mean_latency_ms': round(totals['mean_latency_ms'] or 0, 1),
+                'max_latency_ms': totals['max_latency_ms'] or 0,
+            },
+            'latency_ms': self._histogram(totals, LATENCY_BUCKETS_MS, totals['calls'], totals['max_latency_ms']),
+            'tokens_per_call': self._histogram(tokens, TOKEN_BUCKETS, tokens['calls'], tokens['max_tokens']),
+            'operations': self._breakdown(rows, 'operation'),
+            'models': self._breakdown(rows, 'model'),
+            'providers': self._breakdown(rows, 'provider'),
+            'top_users': self._top_users(rows, top_users),
+        }
+    
+    def _breakdown(self, rows, field: str) -> List[Dict]:
+        """Totals and latency percentiles per value of field, busiest first."""
+        groups = (
+            rows.values(field)
+            .annotate(
+                calls=Count('id'),
+                errors=Count('id', filter=Q(outcome='error')),
+                prompt_tokens=Sum('prompt_tokens'),
+                completion_tokens=Sum('completion_tokens'),
+                cost_usd=Sum('cost_usd'),
+                mean_latency_ms=Avg('latency_ms'),
+                max_latency_ms=Max('latency_ms'),
+                **self._bucket_counts('latency_ms', LATENCY_BUCKETS_MS)
+            )
+            .order_by('-calls')
+        )
+        results = []
+        for group in groups:
+            latency = self._histogram(group, LATENCY_BUCKETS_MS, group['calls'], group['max_latency_ms'])
+            results.append({
+                'name': group[field],
+                'calls': group['calls'],
+                'errors': group['errors'],
+                'prompt_tokens': group['prompt_tokens'] or 0,
+                'completion_tokens': group['completion_tokens'] or 0,
+                'cost_usd': round(group['cost_usd'] or 0, 4),
+                'mean_latency_ms': round(group['mean_latency_ms'] or 0, 1),
+                **{f'p{p}_latency_ms': latency[f'p{p}'] for p in PERCENTILES},
+            })
+        return results
+    
+    def _top_users(self, rows, limit: int) -> List[Dict]:
+        users = (
+            rows.filter(user__isnull=False)
+            .values('user_id', 'user__username')
+            .annotate(
+                calls=Count('id'),
+                prompt_tokens=Sum('prompt_tokens'),
+                completion_tokens=Sum('completion_tokens'),
+                cost_usd=Sum('cost_usd'),
+                total_latency_ms=Sum('latency_ms'),
+            )
+            .order_by('-cost_usd', '-calls')[:limit]
+        )
+        return [
+            {
+                'user_id': row['user_id'],
+                'username': row['user__username'],
+                'calls': row['calls'],
+                'prompt_tokens': row['prompt_tokens'] or 0,
+                'completion_tokens': row['completion_tokens'] or 0,
+                'cost_usd': round(row['cost_usd'] or 0, 4),
+                'total_latency_ms': round(row['total_latency_ms'] or 0, 1),
+            }
+            for row in users
+        ]
+    
+    def _with_total_tokens(self, rows):
+        return rows.annotate(total_tokens=F('prompt_tokens') + F('completion_tokens'))
+    
+    def _bucket_counts(self, field: str, bounds: Sequence[float]) -> Dict:
+        """Cumulative Count() aggregates of field <= each bound."""
+        return {
+            f'le_{i}': Count('id', filter=Q(**{f'{field}__lte': bound}))
+            for i, bound in enumerate(bounds)
+        }
+    
+    def _histogram(self, row: Dict, bounds: Sequence[float], total: int, maximum: Optional[float]) -> Dict:
+        cumulative = [row[f'le_{i}'] for i in range(len(bounds))] + [total]
+        buckets = []
+        previous = 0
+        for bound, count in zip([*bounds, None], cumulative):
+            buckets.append({'le': bound, 'count': count - previous})
+            previous = count
+        return {
+            'buckets': buckets,
+            **{f'p{p}': self._percentile(bounds, cumulative, p, maximum) for p in PERCENTILES},
+        }
+    
+    def _percentile(
+        self,
+        bounds: Sequence[float],
+        cumulative: List[int],
+        p: float,
+        maximum: Optional[float]
+    ) -> float:
+        """p-th percentile, interpolated linearly within its bucket and capped at the observed maximum."""
+        total = cumulative[-1]
+        if not total:
+            return 0
+        # The open last bucket ends at the maximum, and no bucket reaches past it
+        top = maximum if maximum is not None else bounds[-1]
+        uppers = [min(bound, top) for bound in bounds] + [top]
+        target = total * p / 100
+        lower = 0
+        below = 0
+        for upper, count in zip(uppers, cumulative):
+            if count >= target:
+                share = (target - below) / (count - below) if count > below else 1
+                return round(lower + (upper - lower) * share, 1)
+            lower = upper
+            below = count
+        return round(top, 1)
+    
+    def _ensure_thread(self) -> None:
+        # Called with the lock held
+        pid = os.getpid()
+        if self._pid != pid:
+            # A forked worker inherits the parent's buffer, which the parent writes itself
+            if self._pid is not None:
+                self._buffer = []
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='ai-metrics', daemon=True)
+            self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.config['FLUSH_SECONDS'])
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except DatabaseError as e:
+                logger.warning(f"AI metrics maintenance failed: {e}")
+            finally:
+                # Otherwise this thread keeps its database connection open between flushes
+                connections.close_all()
+
+
+# Singleton instance
+ai_metrics = AIMetrics()
+atexit.register(ai_metrics.flush)
@@ -0,0 +1,196 @@
+"""
+Pluggable backends for AI calls.
+
+AIService and the transcription pipeline do not talk to a vendor directly:
+they use the provider named by AI_PROVIDER['BACKEND'] (see get_provider()),
+whose chat_completion() and transcribe() coroutines take and return
+OpenAI-shaped requests and responses and record every call in ai_metrics.
+Analysis, batched analysis and pattern discovery are all chat completions,
+so a backend only implements the two hooks behind them, _chat_completion()
+and _transcribe().
+
+Backends:
+- openai: the OpenAI API over the pooled openai_client
+- standin: the same client pointed at AI_PROVIDER['STANDIN_URL'], where
+  run_ai_standin serves deterministic canned answers with configurable
+  latency and error rate, so the AI paths can be load-tested offline
+- disabled: no AI calls; callers fall back to their empty results
+
+Anything else is imported as the dotted path of an AIProvider subclass.
+"""
+import atexit
+import concurrent.futures
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .ai_metrics import ai_metrics
+from .openai_client import AsyncOpenAIClient, OpenAIError, openai_client
+
+
+class AIProvider(ABC):
+    """Interface of an AI backend; coroutines run on a client event loop thread."""
+    
+    name = 'base'
+    
+    @property
+    def available(self) -> bool:
+        """Whether calls can be made at all (e.g. credentials are configured)."""
+        return False
+    
+    def cache_model(self, model: str) -> str:
+        """Model name used in ai_cache keys, so backends never share cached results."""
+        return f"{self.name}/{model}"
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict],
+        model: str = 'gpt-3.5-turbo',
+        timeout: Optional[float] = None,
+        operation: str = 'chat',
+        **params
+    ) -> Dict:
+        """
+        Return an OpenAI-shaped chat completion response; raise OpenAIError on failure.
+        
+        Every call is recorded by ai_metrics under operation.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self._chat_completion(messages, model=model, timeout=timeout, **params)
+        except Exception as e:
+            ai_metrics.record(self.name, operation, model, _elapsed_ms(started), error=e)
+            raise
+        ai_metrics.record(self.name, operation, model, _elapsed_ms(started), usage=response.get('usage'))
+        return response
+    
+    async def transcribe(
+        self,
+        audio_file_path: str,
+        model: str = 'whisper-1',
+        timeout: Optional[float] = None,
+        operation: str = 'transcribe',
+        audio_seconds: Optional[float] = None
+    ) -> str:
+        """
+        Return the plain-text transcript of a recording; raise OpenAIError on failure.
+        
+        audio_seconds (the recording's length, if known) prices the call in ai_metrics.
+        """
+        started = time.perf_counter()
+        try:
+            text = await self._transcribe(audio_file_path, model=model, timeout=timeout)
+        except Exception as e:
+            ai_metrics.record(self.name, operation, model, _elapsed_ms(started), audio_seconds=audio_seconds, error=e)
+            raise
+        ai_metrics.record(self.name, operation, model, _elapsed_ms(started), audio_seconds=audio_seconds)
+        return text
+    
+    @abstractmethod
+    async def _chat_completion(self, messages: List[Dict], model: str, timeout: Optional[float], **params) -> Dict:
+        """Backend hook behind chat_completion()."""
+    
+    @abstractmethod
+    async def _transcribe(self, audio_file_path: str, model: str, timeout: Optional[float]) -> str:
+        """Backend hook behind transcribe()."""
+    
+    def chat_completion_sync(self, messages: List[Dict], **kwargs) -> Dict:
+        """Blocking chat_completion() for sync callers."""
+        return self.run(self.chat_completion(messages, **kwargs))
+    
+    def transcribe_sync(self, audio_file_path: str, **kwargs) -> str:
+        """Blocking transcribe() for sync callers."""
+        return self.run(self.transcribe(audio_file_path, **kwargs))
+    
+    def run(self, coroutine):
+        """Run a coroutine on the provider's event loop and wait for its result."""
+        return self.submit(coroutine).result()
+    
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the provider's event loop without waiting for it."""
+        return openai_client.submit(coroutine)
+
+
+class OpenAIProvider(AIProvider):
+    """The OpenAI API, through the shared pooled client."""
+    
+    name = 'openai'
+    
+    @property
+    def client(self) -> AsyncOpenAIClient:
+        return openai_client
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.client.api_key)
+    
+    def cache_model(self, model: str) -> str:
+        # Keys written before providers existed stay valid
+        return model
+    
+    async def _chat_completion(self, messages, model, timeout, **params):
+        return await self.client.chat_completion(messages, model=model, timeout=timeout, **params)
+    
+    async def _transcribe(self, audio_file_path, model, timeout):
+        return await self.client.transcribe(audio_file_path, model=model, timeout=timeout)
+    
+    def submit(self, coroutine):
+        return self.client.submit(coroutine)
+
+
+class StandInProvider(OpenAIProvider):
+    """The local stand-in server (run_ai_standin), spoken to like the OpenAI API."""
+    
+    name = 'standin'
+    
+    def __init__(self):
+        # Own client: the stand-in needs no key and must not share OpenAI's pool
+        self._client = AsyncOpenAIClient(base_url=settings.AI_PROVIDER['STANDIN_URL'], api_key='standin')
+        atexit.register(self._client.close)
+    
+    @property
+    def client(self) -> AsyncOpenAIClient:
+        return self._client
+    
+    def cache_model(self, model: str) -> str:
+        return AIProvider.cache_model(self, model)
+
+
+class DisabledProvider(AIProvider):
+    """No AI backend; every call fails and callers use their fallbacks."""
+    
+    name = 'disabled'
+    
+    async def _chat_completion(self, messages, model, timeout, **params):
+        raise OpenAIError('AI provider is disabled')
+    
+    async def _transcribe(self, audio_file_path, model, timeout):
+        raise OpenAIError('AI provider is disabled')
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'standin': StandInProvider,
+    'disabled': DisabledProvider,
+}
+
+_instances: Dict[str, AIProvider] = {}
+_lock = threading.Lock()
+
+
+def get_provider(backend: Optional[str] = None) -> AIProvider:
+    """The provider for backend (default AI_PROVIDER['BACKEND']), created once per process."""
+    backend = backend or settings.AI_PROVIDER['BACKEND']
+    with _lock:
+        if backend not in _instances:
+            provider_class = PROVIDERS.get(backend) or import_string(backend)
+            _instances[backend] = provider_class()
+        return _instances[backend]
@@ -1,123 +1,513 @@
-import os
 import json
-from typing import Dict, List, Optional
-import openai
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
 from django.conf import settings
+from .ai_cache import ai_cache
+from .ai_providers import AIProvider, get_provider
+from .openai_client import OpenAIError
+from .semantic_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL = "gpt-3.5-turbo"
+# Bump whenever ANALYSIS_PROMPT or the result shape changes so cached results are not reused
+ANALYSIS_PROMPT_VERSION = 1
+ANALYSIS_PROMPT = """You are a text analysis assistant. Analyze the text and extract:
+1. Themes: Major recurring ideas or concepts
+2. Symbols: Significant objects or symbols with potential meaning
+3. Entities: People, places, or things mentioned
+
+Return as JSON with keys: themes, symbols, entities (each as arrays of strings).
+Be objective and avoid interpretation - just identify elements."""
+BATCH_ANALYSIS_PROMPT = """You are a text analysis assistant. You will receive several texts, each starting with a line "### Text <id>". For each text extract:
+1. Themes: Major recurring ideas or concepts
+2. Symbols: Significant objects or symbols with potential meaning
+3. Entities: People, places, or things mentioned
+
+Return a JSON object {"results": [{"id": <id>, "themes": [...], "symbols": [...], "entities": [...]}]} with exactly one result per text (arrays of strings).
+Be objective and avoid interpretation - just identify elements."""
+PATTERN_PROMPT_VERSION = 1
+PATTERN_TYPES = ('theme', 'symbol', 'emotion', 'sequence')
+PATTERN_MAP_PROMPT = """You are a text pattern analyst. Identify recurring patterns across multiple texts.
+Look for:
+1. Recurring themes or situations
+2. Repeated symbols or objects
+3. Common emotions or moods
+4. Sequential patterns (one element following another)
+
+Return a JSON object {"patterns": [...]} whose items contain:
+- name: Pattern name
+- type: theme/symbol/emotion/sequence
+- description: Brief description
+- confidence: 0-1 score
+- occurrences: which text numbers it appears in"""
+PATTERN_REDUCE_PROMPT = """You are a text pattern analyst. You will receive numbered candidate patterns found in different parts of one person's texts.
+Merge candidates that describe the same pattern, drop ones that are not really recurring, and re-score confidence for the merged set.
+
+Return a JSON object {"patterns": [...]} whose items contain:
+- name: Pattern name
+- type: theme/symbol/emotion/sequence
+- description: Brief description
+- confidence: 0-1 score
+- members: the candidate numbers it combines"""
+# Completion tokens reserved per entry of a batched request
+BATCH_OUTPUT_TOKENS_PER_ENTRY = 150
+ANALYSIS_KEYS = ('themes', 'symbols', 'entities')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
 
 
 class AIService:
-    """Service for AI-powered thing analysis and transcription."""
+    """
+    Service for AI-powered thing analysis and transcription.
     
-    def __init__(self):
-        self.api_key = os.getenv('OPENAI_API_KEY')
-        if self.api_key:
-            openai.api_key = self.api_key
+    Calls go through the configured AI provider (see ai_providers), by
+    default the OpenAI API over openai_client's pooled session with its
+    timeouts and retries; a call that still fails is logged and yields an
+    empty result.
+    """
+    
+    @property
+    def provider(self) -> AIProvider:
+        return get_provider()
+    
+    @property
+    def available(self) -> bool:
+        return self.provider.available
+    
+    @property
+    def cache_model(self) -> str:
+        """ANALYSIS_MODEL as named in ai_cache keys for the current provider."""
+        return self.provider.cache_model(ANALYSIS_MODEL)
     
     def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
         """Transcribe audio file to text using OpenAI Whisper."""
-        if not self.api_key:
+        if not self.available:
             return None
             
         try:
-            with open(audio_file_path, 'rb') as audio_file:
-                transcript = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
-            return transcript
-        except Exception as e:
-            print(f"Transcription error: {e}")
+            return self.provider.transcribe_sync(audio_file_path, model="whisper-1")
+        except (OpenAIError, OSError) as e:
+            logger.error(f"Transcription error: {e}")
             return None
     
     def analyze_thing(self, thing_text: str) -> Dict:
-        """Analyze thing text to extract themes, symbols, and entities."""
-        if not self.api_key:
-            return {
-                'themes': [],
-                'symbols': [],
-                'entities': []
-            }
+        """
+        Analyze thing text to extract themes, symbols, and entities.
+        
+        Results are cached by text, model and prompt version (see ai_cache),
+        so unchanged text costs no API call.
+        """
+        if not self.available:
+            return self._empty_analysis()
         
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a text analysis assistant. Analyze the text and extract:
-                        1. Themes: Major recurring ideas or concepts
-                        2. Symbols: Significant objects or symbols with potential meaning
-                        3. Entities: People, places, or things mentioned
-                        
-                        Return as JSON with keys: themes, symbols, entities (each as arrays of strings).
-                        Be objective and avoid interpretation - just identify elements."""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze this text: {thing_text}"
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=500
+            return ai_cache.get_or_compute(
+                'analyze_thing',
+                self.cache_model,
+                ANALYSIS_PROMPT_VERSION,
+                thing_text,
+                lambda: self._request_analysis(thing_text)
             )
-            
-            result = response.choices[0].message.content
-            return json.loads(result)
-            
-        except Exception as e:
-            print(f"Thing analysis error: {e}")
-            return {
-                'themes': [],
-                'symbols': [],
-                'entities': []
-            }
+        except (OpenAIError, KeyError, IndexError, TypeError, ValueError) as e:
+            logger.error(f"Thing analysis error: {e}")
+            return self._empty_analysis()
+    
+    def analyze_things(
+        self,
+        texts: Sequence[str],
+        token_budget: Optional[int] = None
+    ) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        Analyze many texts, packing several into each request.
+        
+        Cached texts are answered from ai_cache. The rest are packed into
+        requests of at most token_budget estimated prompt tokens (default
+        OPENAI['BATCH_TOKEN_BUDGET']), sent concurrently over the pooled
+        client. Entries a batch did not answer properly, and texts too long
+        to share a request, fall back to analyze_thing(). Batched results
+        are cached under the same key as single ones.
+        
+        Returns:
+            (results in input order, counts of cached/batched/single texts
+            and API calls made)
+        """
+        stats = {'cached': 0, 'batched': 0, 'single': 0, 'calls': 0}
+        if not self.available:
+            return [self._empty_analysis() for _ in texts], stats
+        
+        # Identical texts are analyzed once
+        keys = [
+            ai_cache.make_key('analyze_thing', self.cache_model, ANALYSIS_PROMPT_VERSION, text)
+            for text in texts
+        ]
+        found = {}
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in pending:
+                continue
+            cached = ai_cache.get(key) if ai_cache.enabled else MISSING
+            if cached is MISSING:
+                pending[key] = text
+            else:
+                found[key] = cached
+                stats['cached'] += 1
+        
+        batches, singles = self._pack(list(pending.items()), token_budget)
+        if batches:
+            responses = self.provider.run(self._request_batches(batches))
+            stats['calls'] += len(batches)
+            for batch, response in zip(batches, responses):
+                answered = self._parse_batch(batch, response)
+                for key, text in batch:
+                    if key in answered:
+                        found[key] = answered[key]
+                        stats['batched'] += 1
+                        if ai_cache.enabled:
+                            ai_cache.set(key, 'analyze_thing', self.cache_model, ANALYSIS_PROMPT_VERSION, answered[key])
+                    else:
+                        singles.append((key, text))
+        
+        for key, text in singles:
+            found[key] = self.analyze_thing(text)
+            stats['single'] += 1
+            stats['calls'] += 1
+        
+        return [found[key] for key in keys], stats
+    
+    def _pack(
+        self,
+        items: List[Tuple[str, str]],
+        token_budget: Optional[int]
+    ) -> Tuple[List[List[Tuple[str, str]]], List[Tuple[str, str]]]:
+        """Split (key, text) items into batches within the token budget plus texts sent alone."""
+        budget = token_budget or settings.OPENAI['BATCH_TOKEN_BUDGET']
+        overhead = estimate_tokens(BATCH_ANALYSIS_PROMPT)
+        batches = []
+        singles = []
+        batch = []
+        used = overhead
+        for key, text in items:
+            # Each text also carries its "### Text <id>" header
+            cost = estimate_tokens(text) + 6
+            if overhead + cost > budget:
+                singles.append((key, text))
+                continue
+            if used + cost > budget:
+                batches.append(batch)
+                batch = []
+                used = overhead
+            batch.append((key, text))
+            used += cost
+        if batch:
+            batches.append(batch)
+        
+        # A batch of one is just a single call with a bigger prompt
+        singles.extend(batch[0] for batch in batches if len(batch) == 1)
+        return [batch for batch in batches if len(batch) > 1], singles
+    
+    async def _request_batches(self, batches: List[List[Tuple[str, str]]]) -> List:
+        """Send the batches concurrently; failed requests come back as exceptions."""
+        semaphore = asyncio.Semaphore(max(settings.OPENAI['BATCH_CONCURRENCY'], 1))
+        
+        async def request(batch):
+            texts = "\n\n".join(f"### Text {i + 1}\n{text}" for i, (_, text) in enumerate(batch))
+            async with semaphore:
+                return await self.provider.chat_completion(
+                    model=ANALYSIS_MODEL,
+                    operation='analyze_batch',
+                    messages=[
+                        {"role": "system", "content": BATCH_ANALYSIS_PROMPT},
+                        {"role": "user", "content": f"Analyze these texts:\n\n{texts}"}
+                    ],
+                    temperature=0.7,
+                    max_tokens=BATCH_OUTPUT_TOKENS_PER_ENTRY * len(batch),
+                    response_format={"type": "json_object"}
+                )
+        
+        return await asyncio.gather(*(request(batch) for batch in batches), return_exceptions=True)
+    
+    def _parse_batch(self, batch: List[Tuple[str, str]], response) -> Dict[str, Dict]:
+        """Well-formed per-entry results of a batched response, keyed by cache key."""
+        if isinstance(response, BaseException):
+            logger.warning(f"Batched analysis of {len(batch)} texts failed: {response}")
+            return {}
+        try:
+            results = json.loads(response['choices'][0]['message']['content'])['results']
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            logger.warning(f"Batched analysis of {len(batch)} texts returned malformed JSON: {e}")
+            return {}
+        
+        answered = {}
+        for result in results if isinstance(results, list) else []:
+            try:
+                index = int(result['id']) - 1
+                analysis = {name: result[name] for name in ANALYSIS_KEYS}
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(batch) and all(isinstance(value, list) for value in analysis.values()):
+                answered[batch[index][0]] = analysis
+        return answered
+    
+    def _request_analysis(self, thing_text: str) -> Dict:
+        """One analysis call; raises on any failure so nothing bad is cached."""
+        response = self.provider.chat_completion_sync(
+            model=ANALYSIS_MODEL,
+            operation='analyze_thing',
+            messages=[
+                {
+                    "role": "system",
+                    "content": ANALYSIS_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": f"Analyze this text: {thing_text}"
+                }
+            ],
+            temperature=0.7,
+            max_tokens=500
+        )
+        
+        result = response['choices'][0]['message']['content']
+        return json.loads(result)
+    
+    def _empty_analysis(self) -> Dict:
+        return {
+            'themes': [],
+            'symbols': [],
+            'entities': []
+        }
     
     def find_patterns(self, things: List[Dict]) -> List[Dict]:
-        """Analyze multiple things to find patterns."""
-        if not self.api_key or len(things) < 3:
+        """
+        Find recurring patterns across things (dicts with id, date and text).
+        
+        A map-reduce pipeline, so histories of any length fit the model's
+        context: things are cut in order into chunks of at most
+        OPENAI['PATTERN_CHUNK_TOKENS'] estimated tokens, candidate patterns
+        are extracted from every chunk concurrently (map), and candidates are
+        merged and re-scored from their summaries, not the texts (reduce),
+        in as many rounds as it takes to fit one request. Chunk and reduce
+        results are cached by content (see ai_cache), so after new entries
+        only the chunk holding them and the reduce step cost API calls.
+        
+        Returns:
+            Patterns with name, type, description, confidence (0-1) and
+            occurrences (ids of the things they appear in), best first
+        """
+        if not self.available or len(things) < 3:
             return []
         
-        try:
-            things_text = "\n\n".join([
-                f"Thing {i+1} ({d.get('date', 'Unknown date')}): {d.get('text', '')}"
-                for i, d in enumerate(things)
-            ])
-            
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a text pattern analyst. Identify recurring patterns across multiple texts.
-                        Look for:
-                        1. Recurring themes or situations
-                        2. Repeated symbols or objects
-                        3. Common emotions or moods
-                        4. Sequential patterns (one element following another)
-                        
-                        Return as JSON array with objects containing:
-                        - name: Pattern name
-                        - type: theme/symbol/emotion/sequence
-                        - description: Brief description
-                        - confidence: 0-1 score
-                        - occurrences: which text numbers it appears in"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Find patterns in these texts:\n\n{things_text}"
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=1000
+        candidates = self._map_patterns(self._pattern_chunks(things))
+        if not candidates:
+            return []
+        return self._reduce_patterns(candidates)
+    
+    def _pattern_chunks(self, things: List[Dict]) -> List[List[Dict]]:
+        """Consecutive runs of things within the chunk token budget."""
+        budget = settings.OPENAI['PATTERN_CHUNK_TOKENS']
+        chunks = []
+        chunk = []
+        used = 0
+        for thing in things:
+            text = thing.get('text') or ''
+            # An entry longer than a whole chunk is cut to fit on its own
+            text = text[:budget * 4]
+            cost = estimate_tokens(text) + 10
+            if chunk and used + cost > budget:
+                chunks.append(chunk)
+                chunk = []
+                used = 0
+            chunk.append({'id': str(thing['id']), 'date': thing.get('date') or 'Unknown date', 'text': text})
+            used += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    def _map_patterns(self, chunks: List[List[Dict]]) -> List[Dict]:
+        """Candidate patterns of every chunk, from the cache or concurrent requests."""
+        candidates = []
+        pending = []
+        for chunk in chunks:
+            content = "\n\n".join(
+                f"Text {i + 1} ({thing['date']}): {thing['text']}" for i, thing in enumerate(chunk)
             )
+            # Thing ids are part of the key: cached occurrences refer to them
+            key = ai_cache.make_key(
+                'pattern_chunk', self.cache_model, PATTERN_PROMPT_VERSION,
+                ' '.join(thing['id'] for thing in chunk) + '\n' + content
+            )
+            cached = ai_cache.get(key) if ai_cache.enabled else MISSING
+            if cached is MISSING:
+                pending.append((key, chunk, content))
+            else:
+                candidates.extend(cached)
+        
+        if pending:
+            requests = [
+                (PATTERN_MAP_PROMPT, f"Find patterns in these texts:\n\n{content}")
+                for _, _, content in pending
+            ]
+            responses = self.provider.run(self._request_patterns(requests, 'pattern_map'))
+            for (key, chunk, _), response in zip(pending, responses):
+                try:
+                    found = self._parse_patterns(response, lambda n, chunk=chunk: [
+                        chunk[i - 1]['id'] for i in n if 0 < i <= len(chunk)
+                    ])
+                except (OpenAIError, KeyError, IndexError, TypeError, ValueError) as e:
+                    # Not cached, so the chunk is retried on the next run
+                    logger.error(f"Pattern analysis error in a chunk of {len(chunk)} things: {e}")
+                    continue
+                found = [pattern for pattern in found if pattern['occurrences']]
+                if ai_cache.enabled:
+                    ai_cache.set(key, 'pattern_chunk', self.cache_model, PATTERN_PROMPT_VERSION, found)
+                candidates.extend(found)
+        return candidates
+    
+    def _reduce_patterns(self, candidates: List[Dict]) -> List[Dict]:
+        """Merge and re-score candidates in rounds until one request covers them all."""
+        patterns = self._merge_patterns(candidates)
+        budget = settings.OPENAI['PATTERN_CHUNK_TOKENS']
+        
+        while len(patterns) > 1:
+            groups = []
+            group = []
+            used = 0
+            for pattern in patterns:
+                cost = estimate_tokens(self._pattern_summary(0, pattern))
+                if group and used + cost > budget:
+                    groups.append(group)
+                    group = []
+                    used = 0
+                group.append(pattern)
+                used += cost
+            groups.append(group)
             
-            result = response.choices[0].message.content
-            return json.loads(result)
+            pending = []
+            reduced = []
+            for group in groups:
+                summaries = "\n".join(self._pattern_summary(i + 1, pattern) for i, pattern in enumerate(group))
+                key = ai_cache.make_key('pattern_reduce', self.cache_model, PATTERN_PROMPT_VERSION, summaries)
+                cached = ai_cache.get(key) if ai_cache.enabled else MISSING
+                if cached is MISSING:
+                    pending.append((key, group, summaries))
+                else:
+                    reduced.extend(self._expand_members(cached, group))
             
-        except Exception as e:
-            print(f"Pattern analysis error: {e}")
-            return []
+            if pending:
+                requests = [
+                    (PATTERN_REDUCE_PROMPT, f"Merge these candidate patterns:\n\n{summaries}")
+                    for _, _, summaries in pending
+                ]
+                responses = self.provider.run(self._request_patterns(requests, 'pattern_reduce'))
+                for (key, group, _), response in zip(pending, responses):
+                    try:
+                        merged = self._parse_patterns(response, lambda n: n, field='members')
+                    except (OpenAIError, KeyError, IndexError, TypeError, ValueError) as e:
+                        logger.error(f"Pattern merge error for {len(group)} candidates: {e}")
+                        reduced.extend(group)
+                        continue
+                    if ai_cache.enabled:
+                        ai_cache.set(key, 'pattern_reduce', self.cache_model, PATTERN_PROMPT_VERSION, merged)
+                    reduced.extend(self._expand_members(merged, group))
+            
+            reduced = self._merge_patterns(reduced)
+            # Stop once everything fitted one request, or when a round no longer shrinks the list
+            if len(groups) == 1 or len(reduced) >= len(patterns):
+                patterns = reduced
+                break
+            patterns = reduced
+        
+        return sorted(patterns, key=lambda p: (-p['confidence'], -len(p['occurrences']), p['name']))
+    
+    async def _request_patterns(self, requests: List[Tuple[str, str]], operation: str) -> List:
+        """Send (system prompt, user message) pattern requests concurrently."""
+        semaphore = asyncio.Semaphore(max(settings.OPENAI['BATCH_CONCURRENCY'], 1))
+        
+        async def request(system, message):
+            async with semaphore:
+                return await self.provider.chat_completion(
+                    model=ANALYSIS_MODEL,
+                    operation=operation,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": message}
+                    ],
+                    temperature=0.7,
+                    max_tokens=1000,
+                    response_format={"type": "json_object"}
+                )
+        
+        return await asyncio.gather(*(request(*item) for item in requests), return_exceptions=True)
+    
+    def _parse_patterns(self, response, resolve, field: str = 'occurrences') -> List[Dict]:
+        """
+        Patterns from a map or reduce response; raises if it is unusable.
+        
+        resolve maps the list of numbers in field (text or candidate
+        numbers) to what the result should hold.
+        """
+        if isinstance(response, BaseException):
+            raise response
+        data = json.loads(response['choices'][0]['message']['content'])
+        patterns = []
+        for item in data['patterns']:
+            try:
+                numbers = [int(n) for n in item.get(field, [])]
+                confidence = min(max(float(item.get('confidence', 0.5)), 0.0), 1.0)
+            except (TypeError, ValueError):
+                continue
+            name = str(item.get('name') or '').strip()[:100]
+            if not name:
+                continue
+            patterns.append({
+                'name': name,
+                'type': item.get('type') if item.get('type') in PATTERN_TYPES else 'theme',
+                'description': str(item.get('description') or ''),
+                'confidence': round(confidence, 3),
+                field: resolve(numbers),
+            })
+        return patterns
+    
+    def _expand_members(self, merged: List[Dict], group: List[Dict]) -> List[Dict]:
+        """Turn reduce results (candidate numbers) back into patterns with thing occurrences."""
+        patterns = []
+        for pattern in merged:
+            members = [group[n - 1] for n in pattern['members'] if 0 < n <= len(group)]
+            if not members:
+                continue
+            occurrences = list(dict.fromkeys(o for member in members for o in member['occurrences']))
+            patterns.append({**{k: v for k, v in pattern.items() if k != 'members'}, 'occurrences': occurrences})
+        return patterns
+    
+    def _merge_patterns(self, patterns: List[Dict]) -> List[Dict]:
+        """Combine patterns with the same type and name, weighting confidence by occurrences."""
+        merged = {}
+        for pattern in patterns:
+            key = (pattern['type'], pattern['name'].lower())
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(pattern, occurrences=list(pattern['occurrences']))
+                continue
+            weight = max(len(current['occurrences']), 1)
+            extra = max(len(pattern['occurrences']), 1)
+            current['confidence'] = round(
+                (current['confidence'] * weight + pattern['confidence'] * extra) / (weight + extra), 3
+            )
+            if len(pattern['description']) > len(current['description']):
+                current['description'] = pattern['description']
+            current['occurrences'] = list(dict.fromkeys(current['occurrences'] + pattern['occurrences']))
+        return list(merged.values())
+    
+    def _pattern_summary(self, number: int, pattern: Dict) -> str:
+        return (
+            f"Candidate {number} [{pattern['type']}] {pattern['name']}: {pattern['description']} "
+            f"(confidence {pattern['confidence']}, in {len(pattern['occurrences'])} texts)"
+        )
 
 
 # Singleton instance
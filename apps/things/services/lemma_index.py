@@ -0,0 +1,183 @@
+"""
+Per-user inverted index from lemmas to the things that mention them.
+
+LemmaIndexEntry rows are derived from Thing.semantic_bits: one row per
+(thing, lemma, part of speech) with the number of matching tokens. sync()
+is called wherever an analysis is written (the semantics task, the detail
+page's stale re-analysis, backfill_semantics) and on regular saves that
+include semantic_bits; deleting a thing removes its rows by cascade.
+
+Queries are conjunctions of OR-groups, e.g. "fly OR fall water:NOUN" finds
+things mentioning (fly or fall) and water as a noun. Each group is one
+lookup on the (user, lemma, pos) index.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Q, QuerySet, Sum
+
+from ..models import LemmaIndexEntry, Thing
+from .semantic_encoding import semantic_tokens
+
+# Tokens with these parts of speech, stop words and punctuation are not indexed
+SKIPPED_POS = {'PUNCT', 'SPACE', 'SYM', 'X'}
+MAX_LEMMA_LENGTH = 100
+
+# (lemma, pos or None for any part of speech)
+Term = Tuple[str, Optional[str]]
+
+
+class LemmaIndex:
+    """Maintains and queries LemmaIndexEntry rows."""
+    
+    def lemma_counts(self, semantic_bits: Optional[Dict]) -> Counter:
+        """Token counts per (lemma, pos) in a stored analysis, as indexed."""
+        tokens = semantic_tokens(semantic_bits)
+        counts = Counter()
+        for lemma, pos, is_stop, is_punct in zip(
+            tokens.column('lemma'),
+            tokens.column('pos'),
+            tokens.column('is_stop'),
+            tokens.column('is_punct'),
+        ):
+            if is_stop or is_punct or pos in SKIPPED_POS:
+                continue
+            lemma = lemma.strip().lower()
+            if lemma and len(lemma) <= MAX_LEMMA_LENGTH:
+                counts[(lemma, pos)] += 1
+        return counts
+    
+    def sync(self, thing) -> Dict[str, int]:
+        """
+        Bring a thing's index rows in line with its semantic_bits.
+        
+        Only rows whose lemma, part of speech or count changed are written,
+        so re-indexing an edited entry touches just the edited vocabulary.
+        """
+        wanted = self.lemma_counts(thing.semantic_bits)
+        existing = {
+            (entry.lemma, entry.pos): entry
+            for entry in LemmaIndexEntry.objects.filter(thing_id=thing.pk)
+        }
+        
+        stale_ids = [entry.pk for key, entry in existing.items() if key not in wanted]
+        changed = []
+        created = []
+        for (lemma, pos), count in wanted.items():
+            entry = existing.get((lemma, pos))
+            if entry is None:
+                created.append(LemmaIndexEntry(
+                    user_id=thing.user_id, thing_id=thing.pk, lemma=lemma, pos=pos, count=count
+                ))
+            elif entry.count != count:
+                entry.count = count
+                changed.append(entry)
+        
+        with transaction.atomic():
+            if stale_ids:
+                LemmaIndexEntry.objects.filter(pk__in=stale_ids).delete()
+            if changed:
+                LemmaIndexEntry.objects.bulk_update(changed, ['count'])
+            if created:
+                LemmaIndexEntry.objects.bulk_create(created)
+        
+        return {'created': len(created), 'updated': len(changed), 'deleted': len(stale_ids)}
+    
+    def sync_many(self, things: Sequence) -> int:
+        """Replace the index rows of several things at once; returns rows written."""
+        entries = [
+            LemmaIndexEntry(user_id=thing.user_id, thing_id=thing.pk, lemma=lemma, pos=pos, count=count)
+            for thing in things
+            for (lemma, pos), count in self.lemma_counts(thing.semantic_bits).items()
+        ]
+        with transaction.atomic():
+            LemmaIndexEntry.objects.filter(thing_id__in=[thing.pk for thing in things]).delete()
+            LemmaIndexEntry.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+    
+    def parse_query(self, query: str) -> List[List[Term]]:
+        """
+        Parse a query string into AND-ed groups of OR-ed terms.
+        
+        Whitespace-separated terms must all match; "OR" or "|" between terms
+        makes them alternatives, and "AND" may be written for readability.
+        A term may carry a part of speech, e.g. "fly:VERB".
+        """
+        groups: List[List[Term]] = []
+        join_next = False
+        for word in query.split():
+            if word.upper() == 'AND':
+                join_next = False
+                continue
+            if word.upper() == 'OR':
+                join_next = bool(groups)
+                continue
+            
+            terms = [self._parse_term(part) for part in word.split('|') if part]
+            terms = [term for term in terms if term[0]]
+            if not terms:
+                continue
+            if join_next:
+                groups[-1].extend(terms)
+            else:
+                groups.append(terms)
+            join_next = False
+        return groups
+    
+    def search(
+        self,
+        user,
+        groups: Iterable[Iterable[Term]],
+        pos: Optional[Sequence[str]] = None
+    ) -> QuerySet:
+        """
+        Things of user matching every group, best matches first.
+        
+        Args:
+            user: Owner of the things searched
+            groups: AND-ed groups of OR-ed (lemma, pos) terms (see parse_query())
+            pos: Only count tokens with one of these parts of speech
+        
+        Returns:
+            Thing queryset annotated with match_count, the number of matching
+            tokens, ordered by it and then by thing date
+        """
+        things = Thing.objects.filter(user=user)
+        counted = Q()
+        
+        for group in groups:
+            condition = Q()
+            for lemma, term_pos in group:
+                condition |= self._term_q(lemma, term_pos)
+                counted |= self._term_q(lemma, term_pos, prefix='lemma_entries__')
+            if not condition:
+                continue
+            
+            entries = LemmaIndexEntry.objects.filter(condition, user=user)
+            if pos:
+                entries = entries.filter(pos__in=pos)
+            things = things.filter(pk__in=entries.values('thing_id'))
+        
+        if not counted:
+            return Thing.objects.none()
+        
+        if pos:
+            counted &= Q(lemma_entries__pos__in=pos)
+        return things.annotate(
+            match_count=Sum('lemma_entries__count', filter=counted)
+        ).order_by('-match_count', '-thing_date', '-created_at')
+    
+    def _parse_term(self, text: str) -> Term:
+        lemma, _, pos = text.partition(':')
+        return lemma.strip().lower(), pos.strip().upper() or None
+    
+    def _term_q(self, lemma: str, pos: Optional[str], prefix: str = '') -> Q:
+        term = Q(**{f'{prefix}lemma': lemma.lower()})
+        if pos:
+            term &= Q(**{f'{prefix}pos': pos.upper()})
+        return term
+
+
+# Singleton instance
+lemma_index = LemmaIndex()
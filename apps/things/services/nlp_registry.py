@@ -0,0 +1,170 @@
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Short names accepted by the SEMANTIC_MODEL setting
+MODEL_ALIASES = {
+    'sm': 'en_core_web_sm',
+    'md': 'en_core_web_md',
+    'lg': 'en_core_web_lg',
+    'trf': 'en_core_web_trf',
+}
+DEFAULT_MODEL = 'en_core_web_sm'
+
+
+def resolve_model_name(name: str) -> str:
+    """Full spaCy package name for a model alias (sm/md/lg/trf) or name."""
+    return MODEL_ALIASES.get(name, name)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process in bytes (0 if it cannot be read)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+class NLPModelRegistry:
+    """
+    Lazily loads spaCy pipelines, one instance per model name per process.
+    
+    This is the only place spaCy models are loaded: the things and dreams
+    semantic services both take their pipeline from here, so a process that
+    uses both holds a single copy. Which model they use is the SEMANTIC_MODEL
+    setting (see default_model).
+    
+    Nothing is loaded at import time: a model is loaded on first use via
+    get(), or up front via warm_up(). Calling warm_up() in a pre-fork server
+    master (see gunicorn.conf.py) lets every worker share the model's memory
+    pages copy-on-write instead of loading its own copy. unload() drops a
+    model again, e.g. after a one-off batch job.
+    """
+    
+    def __init__(self):
+        self._models = {}
+        self._failed = {}
+        self._load_stats = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name: str):
+        """Return the loaded pipeline for name, loading it on first use (None if unavailable)."""
+        name = resolve_model_name(name)
+        model = self._models.get(name)
+        if model is not None or name in self._failed:
+            return model
+        
+        with self._lock:
+            if name not in self._models and name not in self._failed:
+                self._load(name)
+        return self._models.get(name)
+    
+    @property
+    def default_model(self) -> str:
+        """Package name of the configured model (settings.SEMANTIC_MODEL)."""
+        return resolve_model_name(getattr(settings, 'SEMANTIC_MODEL', DEFAULT_MODEL))
+    
+    def is_loaded(self, name: str) -> bool:
+        return resolve_model_name(name) in self._models
+    
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Load the given models (default: the configured one) now rather than on first request.
+        
+        Returns:
+            Load stats per model name (see stats())
+        """
+        for name in names or [self.default_model]:
+            self.get(name)
+        # Move everything allocated so far out of the collector's generations so
+        # forked workers do not dirty (and copy) those pages during GC passes
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        return self.stats()
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Load time and RSS delta for every model this process has tried to load."""
+        stats = {name: dict(load_stats) for name, load_stats in self._load_stats.items()}
+        for name, error in self._failed.items():
+            stats.setdefault(name, {})['error'] = error
+        return stats
+    
+    def memory_bytes(self) -> int:
+        """RSS growth attributed to the models currently loaded in this process."""
+        return sum(self._load_stats.get(name, {}).get('rss_delta_bytes', 0) for name in self._models)
+    
+    def unload(self, name: Optional[str] = None) -> int:
+        """
+        Drop a loaded model (or every model) so its memory can be reclaimed.
+        
+        A later get() loads it again; a failed load is forgotten too, so
+        installing the model makes it loadable without a restart. Returns the
+        number of models unloaded.
+        """
+        with self._lock:
+            names = [resolve_model_name(name)] if name else list(self._models) + list(self._failed)
+            unloaded = 0
+            for model_name in names:
+                if self._models.pop(model_name, None) is not None:
+                    unloaded += 1
+                    stats = self._load_stats.pop(model_name, {})
+                    logger.info(
+                        f"Unloaded spaCy model '{model_name}' "
+                        f"(loaded with RSS +{stats.get('rss_delta_bytes', 0) / (1024 * 1024):.1f} MiB)"
+                    )
+                self._failed.pop(model_name, None)
+        
+        if unloaded:
+            # Models may have been frozen out of GC by warm_up(); make them collectable
+            if hasattr(gc, 'unfreeze'):
+                gc.unfreeze()
+            gc.collect()
+        return unloaded
+    
+    def _load(self, name: str) -> None:
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        try:
+            import spacy
+            model = spacy.load(name)
+        except Exception as e:
+            logger.warning(
+                f"spaCy model '{name}' not loaded. Error: {e}. "
+                f"Run: python -m spacy download {name}"
+            )
+            self._failed[name] = str(e)
+            return
+        
+        load_seconds = time.perf_counter() - started
+        rss_delta = max(current_rss_bytes() - rss_before, 0)
+        self._models[name] = model
+        self._load_stats[name] = {
+            'load_seconds': round(load_seconds, 3),
+            'rss_delta_bytes': rss_delta,
+            'pid': os.getpid(),
+        }
+        logger.info(
+            f"Loaded spaCy model '{name}' in {load_seconds:.2f}s "
+            f"(RSS +{rss_delta / (1024 * 1024):.1f} MiB, pid {os.getpid()})"
+        )
+
+
+# Singleton instance
+nlp_registry = NLPModelRegistry()
+
@@ -0,0 +1,215 @@
+"""
+Async OpenAI REST client with a shared connection pool, timeouts and retries.
+
+All calls go through one aiohttp session owned by a background event loop
+thread, so connections (and their TLS handshakes) are reused across calls
+and across the sync callers in views and task handlers. Every request has a
+total timeout; timeouts, connection errors, 429s and 5xx responses are
+retried with jittered exponential backoff, honoring Retry-After. Worst-case
+latency of a call is therefore bounded by roughly
+MAX_RETRIES x (timeout + BACKOFF_MAX_SECONDS).
+
+Coroutines (chat_completion, transcribe) can be awaited from async code;
+the *_sync wrappers run them on the client's loop for everything else, and
+submit() schedules one there without waiting.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import random
+import threading
+from typing import Dict, List, Optional
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class OpenAIError(Exception):
+    """An OpenAI(-compatible) request failed (after any retries)."""
+    
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncOpenAIClient:
+    """
+    Pooled aiohttp client for the OpenAI chat and transcription endpoints.
+    
+    base_url and api_key default to OPENAI['BASE_URL'] and OPENAI_API_KEY;
+    pass them to talk to another OpenAI-compatible server.
+    """
+    
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self._base_url = base_url
+        self._api_key = api_key
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    @property
+    def config(self) -> Dict:
+        return settings.OPENAI
+    
+    @property
+    def base_url(self) -> str:
+        return self._base_url or self.config['BASE_URL']
+    
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.getenv('OPENAI_API_KEY')
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict],
+        model: str = 'gpt-3.5-turbo',
+        timeout: Optional[float] = None,
+        **params
+    ) -> Dict:
+        """POST /chat/completions and return the decoded response."""
+        return await self._request(
+            'chat/completions',
+            json={'model': model, 'messages': messages, **params},
+            timeout=timeout or self.config['TIMEOUT']
+        )
+    
+    async def transcribe(
+        self,
+        audio_file_path: str,
+        model: str = 'whisper-1',
+        timeout: Optional[float] = None
+    ) -> str:
+        """POST /audio/transcriptions and return the plain-text transcript."""
+        with open(audio_file_path, 'rb') as audio_file:
+            audio = audio_file.read()
+        
+        def form():
+            # A FormData can only be sent once, so every attempt builds its own
+            data = aiohttp.FormData()
+            data.add_field('model', model)
+            data.add_field('response_format', 'text')
+            data.add_field('file', audio, filename=os.path.basename(audio_file_path))
+            return data
+        
+        return await self._request(
+            'audio/transcriptions',
+            data=form,
+            timeout=timeout or self.config['TRANSCRIBE_TIMEOUT'],
+            expect_json=False
+        )
+    
+    def chat_completion_sync(self, messages: List[Dict], **kwargs) -> Dict:
+        """Blocking chat_completion() for sync callers."""
+        return self.run(self.chat_completion(messages, **kwargs))
+    
+    def transcribe_sync(self, audio_file_path: str, **kwargs) -> str:
+        """Blocking transcribe() for sync callers."""
+        return self.run(self.transcribe(audio_file_path, **kwargs))
+    
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop thread and wait for its result."""
+        return self.submit(coroutine).result()
+    
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the client's event loop thread without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+    
+    def close(self) -> None:
+        """Close the pooled session and stop the loop thread (idempotent)."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None or self._pid != os.getpid():
+                return
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=5)
+                self._session = None
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+    
+    async def _request(self, path: str, timeout: float, data=None, json=None, expect_json: bool = True):
+        if not self.api_key:
+            raise OpenAIError('OPENAI_API_KEY is not set')
+        
+        url = f"{self.base_url.rstrip('/')}/{path}"
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        attempts = max(self.config['MAX_RETRIES'], 0) + 1
+        
+        for attempt in range(attempts):
+            retry_after = None
+            try:
+                async with self._get_session().post(
+                    url,
+                    headers=headers,
+                    json=json,
+                    data=data() if callable(data) else data,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    if response.status < 400:
+                        return await response.json() if expect_json else await response.text()
+                    
+                    body = await response.text()
+                    error = OpenAIError(f"{path} returned {response.status}: {body[:500]}", response.status)
+                    if response.status not in RETRYABLE_STATUSES:
+                        raise error
+                    retry_after = self._retry_after(response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = OpenAIError(f"{path} failed: {e!r}")
+            
+            if attempt + 1 >= attempts:
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            logger.warning(f"OpenAI {path} attempt {attempt + 1}/{attempts} failed ({error}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        cap = min(self.config['BACKOFF_SECONDS'] * 2 ** attempt, self.config['BACKOFF_MAX_SECONDS'])
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.config['BACKOFF_MAX_SECONDS']))
+        return delay
+    
+    def _retry_after(self, value: Optional[str]) -> Optional[float]:
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only called on the loop thread, so no locking is needed
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.config['POOL_SIZE'],
+                    keepalive_timeout=self.config['KEEPALIVE_SECONDS']
+                )
+            )
+        return self._session
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked worker inherits the attributes but not the loop thread
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='openai-client',
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+
+# Singleton instance
+openai_client = AsyncOpenAIClient()
+atexit.register(openai_client.close)
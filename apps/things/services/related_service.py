@@ -0,0 +1,352 @@
+"""
+Precomputed "related things": nearest neighbors among one user's things.
+
+Each thing is a sparse TF-IDF vector over its indexed lemmas (see
+lemma_index) plus its AI themes and symbols, and neighbors are ranked by
+cosine similarity. rebuild() computes every thing's top-k in row blocks of
+the user's similarity matrix. update() handles changed things without that
+all-pairs pass: it replaces their rows in the user's cached matrix, scores
+them against it once, and recomputes only the neighbor lists they can have
+entered or left.
+
+Replaced rows are weighted with the current document frequencies while the
+other rows keep theirs, so weights drift slightly between rebuilds;
+rebuild_related_things resets them.
+"""
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from ..models import LemmaIndexEntry, RelatedThing, Thing
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 8
+# Themes and symbols summarize a whole entry, so each counts for more than a lemma
+THEME_WEIGHT = 2.0
+SYMBOL_WEIGHT = 2.0
+# Similarity matrix rows computed at once (BLOCK_SIZE x things dense floats)
+BLOCK_SIZE = 256
+MIN_SCORE = 1e-6
+# Users whose term matrices are kept in memory between updates
+MAX_CACHED_USERS = 32
+
+
+class TermMatrix:
+    """
+    Weighted term frequencies of one user's things and their TF-IDF vectors.
+    
+    Row i is thing_ids[i]. Document frequencies are kept per term, so
+    set_row() re-weights only the row it replaces; the other rows keep the
+    IDF weights they were last computed with.
+    """
+    
+    def __init__(self, rows: Dict[str, Dict[str, float]], versions: Optional[Dict[str, Tuple]] = None):
+        self.thing_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        # Per-thing fingerprint of the data its row was read from (see RelatedThingsService.versions)
+        self.versions = dict(versions or {})
+        # Versions at which each thing's neighbor list was last recomputed from this matrix
+        self.settled: Dict[str, Tuple] = {}
+        self.vocabulary: Dict[str, int] = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self._terms: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._vectors: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._matrix = None
+        
+        for pk, row in rows.items():
+            terms = self._encode(row)
+            self.positions[pk] = len(self.thing_ids)
+            self.thing_ids.append(pk)
+            self._terms.append(terms)
+            self.document_frequency[terms[0]] += 1
+        self._vectors = [self._vector(*terms) for terms in self._terms]
+    
+    def __len__(self) -> int:
+        return len(self.thing_ids)
+    
+    def set_row(self, pk: str, row: Dict[str, float], version: Optional[Tuple] = None) -> int:
+        """Add or replace one thing's row; returns its position."""
+        terms = self._encode(row)
+        i = self.positions.get(pk)
+        if i is None:
+            i = self.positions[pk] = len(self.thing_ids)
+            self.thing_ids.append(pk)
+            self._terms.append(terms)
+            self._vectors.append(terms)
+        else:
+            self.document_frequency[self._terms[i][0]] -= 1
+            self._terms[i] = terms
+        self.document_frequency[terms[0]] += 1
+        self._vectors[i] = self._vector(*terms)
+        self.versions[pk] = version
+        self._matrix = None
+        return i
+    
+    def remove_row(self, pk: str) -> None:
+        i = self.positions.pop(pk, None)
+        if i is None:
+            return
+        self.document_frequency[self._terms[i][0]] -= 1
+        del self.thing_ids[i], self._terms[i], self._vectors[i]
+        self.versions.pop(pk, None)
+        self.settled.pop(pk, None)
+        for j in range(i, len(self.thing_ids)):
+            self.positions[self.thing_ids[j]] = j
+        self._matrix = None
+    
+    def tfidf(self) -> sparse.csr_matrix:
+        """L2-normalized TF-IDF rows, so row dot products are cosine similarities."""
+        if self._matrix is None:
+            indptr = np.cumsum([0] + [len(indices) for indices, _ in self._vectors])
+            self._matrix = sparse.csr_matrix(
+                (
+                    np.concatenate([weights for _, weights in self._vectors] or [np.zeros(0)]),
+                    np.concatenate([indices for indices, _ in self._vectors] or [np.zeros(0, dtype=np.int64)]),
+                    indptr
+                ),
+                shape=(len(self.thing_ids), len(self.vocabulary))
+            )
+        return self._matrix
+    
+    def _encode(self, row: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Column indices and weights of a row, adding unseen terms to the vocabulary."""
+        indices = np.asarray(
+            [self.vocabulary.setdefault(term, len(self.vocabulary)) for term in row],
+            dtype=np.int64
+        )
+        if len(self.vocabulary) > len(self.document_frequency):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self.document_frequency)), dtype=np.int64)
+            grown[:len(self.document_frequency)] = self.document_frequency
+            self.document_frequency = grown
+        order = np.argsort(indices)
+        return indices[order], np.asarray(list(row.values()), dtype=np.float64)[order]
+    
+    def _vector(self, indices: np.ndarray, tf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        idf = np.log((1 + len(self.thing_ids)) / (1 + self.document_frequency[indices])) + 1
+        weighted = tf * idf
+        norm = np.sqrt(np.dot(weighted, weighted)) or 1
+        return indices, weighted / norm
+
+
+class RelatedThingsService:
+    """
+    Builds and maintains RelatedThing rows.
+    
+    The term matrices of recently updated users are kept in memory, so
+    update() only reads the rows of things whose versions changed since.
+    """
+    
+    def __init__(self, top_k: int = TOP_K, max_cached_users: int = MAX_CACHED_USERS):
+        self.top_k = top_k
+        self.max_cached_users = max_cached_users
+        self._matrices: "OrderedDict[str, TermMatrix]" = OrderedDict()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def rows(self, user_id, thing_ids: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, float]]:
+        """Weighted terms of a user's things (or just thing_ids), read from the lemma index and Thing fields."""
+        things = Thing.objects.filter(user_id=user_id)
+        entries = LemmaIndexEntry.objects.filter(user_id=user_id)
+        if thing_ids is not None:
+            things = things.filter(pk__in=thing_ids)
+            entries = entries.filter(thing_id__in=thing_ids)
+        
+        rows = {}
+        for pk, themes, symbols in things.values_list('pk', 'themes', 'symbols'):
+            row = rows[str(pk)] = {}
+            for theme in themes or []:
+                row[f"t:{str(theme).strip().lower()}"] = THEME_WEIGHT
+            for symbol in symbols or []:
+                row[f"s:{str(symbol).strip().lower()}"] = SYMBOL_WEIGHT
+        
+        # Lemmas are counted across parts of speech; sublinear tf damps long entries
+        lemma_counts = {}
+        for thing_id, lemma, count in entries.values_list('thing_id', 'lemma', 'count').iterator(chunk_size=5000):
+            key = (str(thing_id), lemma)
+            lemma_counts[key] = lemma_counts.get(key, 0) + count
+        for (thing_id, lemma), count in lemma_counts.items():
+            row = rows.get(thing_id)
+            if row is not None:
+                row[f"l:{lemma}"] = 1 + math.log(count)
+        
+        return rows
+    
+    def versions(self, user_id) -> Dict[str, Tuple]:
+        """
+        Fingerprint of each of a user's things' row inputs.
+        
+        Themes and symbols change with updated_at; lemma index rows follow
+        semantic_bits, whose writes leave updated_at alone.
+        """
+        things = Thing.objects.filter(user_id=user_id).values_list(
+            'pk', 'updated_at', 'semantic_bits__text_hash', 'semantic_bits__version'
+        )
+        return {str(pk): (updated_at, bits_hash, bits_version) for pk, updated_at, bits_hash, bits_version in things}
+    
+    def load(self, user_id) -> TermMatrix:
+        """Term matrix of a user's things, read from the database."""
+        # Versions first: a row changed in between is simply read again next time
+        versions = self.versions(user_id)
+        return TermMatrix(self.rows(user_id), versions)
+    
+    def rebuild(self, user_id) -> int:
+        """Recompute the neighbors of every thing of a user; returns things processed."""
+        with self._user_lock(user_id):
+            matrix = self.load(user_id)
+            matrix.settled = dict(matrix.versions)
+            self._remember(user_id, matrix)
+            if not len(matrix):
+                return 0
+            
+            vectors = matrix.tfidf()
+            neighbors = {}
+            for start in range(0, len(matrix), BLOCK_SIZE):
+                rows = list(range(start, min(start + BLOCK_SIZE, len(matrix))))
+                neighbors.update(self._neighbors(vectors, rows))
+            
+            self._write(matrix, neighbors)
+        logger.info(f"Rebuilt related things for user {user_id}: {len(matrix)} things")
+        return len(matrix)
+    
+    def update(self, thing) -> Dict[str, int]:
+        """
+        Refresh related things after one thing changed.
+        
+        The user's cached term matrix is brought up to date by re-reading
+        only the things whose versions changed. The neighbors of those things
+        and of thing are recomputed unless already done for their current
+        version, and so are those of every thing that listed one of them
+        (its score may have dropped) or that one of them now outscores (it
+        may have entered their top k). So the first update of a burst also
+        covers the rest, which then find nothing to do.
+        """
+        user_id = str(thing.user_id)
+        with self._user_lock(user_id):
+            matrix, stale = self._refresh(user_id)
+            pending = set(stale)
+            pk = str(thing.pk)
+            if pk in matrix.positions and matrix.settled.get(pk) != matrix.versions[pk]:
+                pending.add(pk)
+            changed = sorted(matrix.positions[pk] for pk in pending)
+            if not changed:
+                return {'refreshed': 0}
+            
+            vectors = matrix.tfidf()
+            scores = (vectors @ vectors[changed].T).toarray()
+            
+            # Lowest listed score per thing; lists shorter than top_k accept any match
+            thresholds = np.zeros(len(matrix))
+            lists = (
+                RelatedThing.objects.filter(thing__user_id=user_id)
+                .values('thing_id')
+                .annotate(lowest=Min('score'), size=Count('id'))
+            )
+            for row in lists:
+                j = matrix.positions.get(str(row['thing_id']))
+                if j is not None and row['size'] >= self.top_k:
+                    thresholds[j] = row['lowest']
+            
+            beaten = (scores > np.maximum(thresholds, MIN_SCORE)[:, None]).any(axis=1)
+            affected = set(np.flatnonzero(beaten).tolist()) | set(changed)
+            changed_ids = [matrix.thing_ids[i] for i in changed]
+            for pk in RelatedThing.objects.filter(related_id__in=changed_ids).values_list('thing_id', flat=True):
+                j = matrix.positions.get(str(pk))
+                if j is not None:
+                    affected.add(j)
+            
+            rows = sorted(affected)
+            neighbors = {}
+            for start in range(0, len(rows), BLOCK_SIZE):
+                neighbors.update(self._neighbors(vectors, rows[start:start + BLOCK_SIZE]))
+            
+            self._write(matrix, neighbors)
+            for i in changed:
+                pk = matrix.thing_ids[i]
+                matrix.settled[pk] = matrix.versions[pk]
+        return {'refreshed': len(neighbors)}
+    
+    def _refresh(self, user_id: str) -> Tuple[TermMatrix, List[str]]:
+        """
+        The user's cached term matrix with changed, new and deleted things synced.
+        
+        Returns:
+            The matrix and the things whose rows were re-read (none when it
+            had to be loaded from scratch)
+        """
+        matrix = self._matrices.get(user_id)
+        stale = []
+        if matrix is None:
+            matrix = self.load(user_id)
+        else:
+            versions = self.versions(user_id)
+            for pk in [pk for pk in matrix.positions if pk not in versions]:
+                matrix.remove_row(pk)
+            stale = [pk for pk, version in versions.items() if matrix.versions.get(pk) != version]
+            rows = self.rows(user_id, stale) if stale else {}
+            for pk in stale:
+                matrix.set_row(pk, rows.get(pk, {}), versions[pk])
+        self._remember(user_id, matrix)
+        return matrix, stale
+    
+    def _remember(self, user_id, matrix: TermMatrix) -> None:
+        with self._lock:
+            self._matrices[str(user_id)] = matrix
+            self._matrices.move_to_end(str(user_id))
+            while len(self._matrices) > self.max_cached_users:
+                self._matrices.popitem(last=False)
+    
+    def _user_lock(self, user_id) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(str(user_id), threading.Lock())
+    
+    def _neighbors(self, vectors: sparse.csr_matrix, rows: Sequence[int]) -> Dict[int, List[Tuple[int, float]]]:
+        """Top-k (column, score) pairs for each of rows, best first."""
+        scores = (vectors[rows] @ vectors.T).toarray()
+        scores[np.arange(len(rows)), rows] = 0
+        
+        k = min(self.top_k, scores.shape[1])
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (len(rows), 1))
+        
+        neighbors = {}
+        for r, row in enumerate(rows):
+            row_scores = scores[r, candidates[r]]
+            order = np.argsort(-row_scores, kind='stable')
+            neighbors[row] = [
+                (int(candidates[r, o]), float(row_scores[o]))
+                for o in order
+                if row_scores[o] > MIN_SCORE
+            ]
+        return neighbors
+    
+    def _write(self, matrix: TermMatrix, neighbors: Dict[int, List[Tuple[int, float]]]) -> None:
+        thing_ids = [matrix.thing_ids[row] for row in neighbors]
+        links = [
+            RelatedThing(
+                thing_id=matrix.thing_ids[row],
+                related_id=matrix.thing_ids[j],
+                score=round(score, 6),
+                rank=rank
+            )
+            for row, related in neighbors.items()
+            for rank, (j, score) in enumerate(related)
+        ]
+        with transaction.atomic():
+            for start in range(0, len(thing_ids), 500):
+                RelatedThing.objects.filter(thing_id__in=thing_ids[start:start + 500]).delete()
+            RelatedThing.objects.bulk_create(links, batch_size=1000)
+
+
+# Singleton instance
+related_service = RelatedThingsService()
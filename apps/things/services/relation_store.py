@@ -0,0 +1,161 @@
+"""
+Persisted subject-verb-object relations and per-user queries over them.
+
+Relations are extracted at analysis time (semantic_bits['relations'], one
+[subject, verb, object] lemma triple per verb with a subject or object) and
+normalized into SemanticRelation rows here, wherever lemma_index is synced.
+Queries filter on the (user, verb/subject/object) indexes instead of
+re-parsing old entries.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from ..models import SemanticRelation
+
+MAX_LEMMA_LENGTH = 100
+
+
+class RelationStore:
+    """Maintains and queries SemanticRelation rows."""
+    
+    def relation_counts(self, semantic_bits: Optional[Dict]) -> Counter:
+        """Occurrences per (subject, verb, object) triple in a stored analysis."""
+        counts = Counter()
+        for subject, verb, obj in (semantic_bits or {}).get('relations', []):
+            if verb and max(len(subject), len(verb), len(obj)) <= MAX_LEMMA_LENGTH:
+                counts[(subject, verb, obj)] += 1
+        return counts
+    
+    def sync(self, thing) -> Dict[str, int]:
+        """Bring a thing's relation rows in line with its semantic_bits, writing only changes."""
+        wanted = self.relation_counts(thing.semantic_bits)
+        existing = {
+            (relation.subject, relation.verb, relation.object): relation
+            for relation in SemanticRelation.objects.filter(thing_id=thing.pk)
+        }
+        
+        stale_ids = [relation.pk for key, relation in existing.items() if key not in wanted]
+        changed = []
+        created = []
+        for (subject, verb, obj), count in wanted.items():
+            relation = existing.get((subject, verb, obj))
+            if relation is None:
+                created.append(SemanticRelation(
+                    user_id=thing.user_id, thing_id=thing.pk,
+                    subject=subject, verb=verb, object=obj, count=count
+                ))
+            elif relation.count != count:
+                relation.count = count
+                changed.append(relation)
+        
+        with transaction.atomic():
+            if stale_ids:
+                SemanticRelation.objects.filter(pk__in=stale_ids).delete()
+            if changed:
+                SemanticRelation.objects.bulk_update(changed, ['count'])
+            if created:
+                SemanticRelation.objects.bulk_create(created)
+        
+        return {'created': len(created), 'updated': len(changed), 'deleted': len(stale_ids)}
+    
+    def sync_many(self, things: Sequence) -> int:
+        """Replace the relation rows of several things at once; returns rows written."""
+        relations = [
+            SemanticRelation(
+                user_id=thing.user_id, thing_id=thing.pk,
+                subject=subject, verb=verb, object=obj, count=count
+            )
+            for thing in things
+            for (subject, verb, obj), count in self.relation_counts(thing.semantic_bits).items()
+        ]
+        with transaction.atomic():
+            SemanticRelation.objects.filter(thing_id__in=[thing.pk for thing in things]).delete()
+            SemanticRelation.objects.bulk_create(relations, batch_size=1000)
+        return len(relations)
+    
+    def objects_of(self, user, verb: str, limit: int = 50) -> List[Dict]:
+        """Objects the user's entries attach to verb, most frequent first."""
+        return self._arguments(user, verb, 'object', limit)
+    
+    def subjects_of(self, user, verb: str, limit: int = 50) -> List[Dict]:
+        """Subjects the user's entries attach to verb, most frequent first."""
+        return self._arguments(user, verb, 'subject', limit)
+    
+    def timeline(
+        self,
+        user,
+        subject: str = '',
+        verb: str = '',
+        obj: str = '',
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        limit: int = 200
+    ) -> List[Dict]:
+        """
+        Who does what to whom over time: matching relations in thing date order.
+        
+        Empty subject, verb or obj match anything.
+        """
+        relations = self._filter(user, subject=subject, verb=verb, object=obj)
+        if since:
+            relations = relations.filter(thing__thing_date__gte=since)
+        if until:
+            relations = relations.filter(thing__thing_date__lte=until)
+        
+        rows = relations.order_by('thing__thing_date', 'thing__created_at').values(
+            'thing_id', 'thing__title', 'thing__thing_date', 'subject', 'verb', 'object', 'count'
+        )[:limit]
+        return [
+            {
+                'thing_id': str(row['thing_id']),
+                'title': row['thing__title'],
+                'thing_date': row['thing__thing_date'].isoformat(),
+                'subject': row['subject'],
+                'verb': row['verb'],
+                'object': row['object'],
+                'count': row['count'],
+            }
+            for row in rows
+        ]
+    
+    def top_triples(
+        self,
+        user,
+        limit: int = 20,
+        since: Optional[date] = None,
+        until: Optional[date] = None
+    ) -> List[Dict]:
+        """Most frequent complete triples across the user's entries."""
+        relations = SemanticRelation.objects.filter(user=user).exclude(subject='').exclude(object='')
+        if since:
+            relations = relations.filter(thing__thing_date__gte=since)
+        if until:
+            relations = relations.filter(thing__thing_date__lte=until)
+        
+        return list(
+            relations.values('subject', 'verb', 'object')
+            .annotate(total=Sum('count'), things=Count('thing_id'))
+            .order_by('-total', '-things', 'verb')[:limit]
+        )
+    
+    def _filter(self, user, **lemmas):
+        filters = {field: value.lower() for field, value in lemmas.items() if value}
+        return SemanticRelation.objects.filter(user=user, **filters)
+    
+    def _arguments(self, user, verb: str, role: str, limit: int) -> List[Dict]:
+        rows = (
+            self._filter(user, verb=verb)
+            .exclude(**{role: ''})
+            .values(role)
+            .annotate(total=Sum('count'), things=Count('thing_id'))
+            .order_by('-total', role)[:limit]
+        )
+        return [{'lemma': row[role], 'total': row['total'], 'things': row['things']} for row in rows]
+
+
+# Singleton instance
+relation_store = RelationStore()
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class SemanticCache:
+    """
+    Two-tier cache for semantic analysis results.
+    
+    Entries are keyed by (namespace, sha256(text), model id, schema version),
+    so a cached result is only reused for the exact same text analyzed by the
+    same model into the same stored shape. The first tier is a bounded
+    in-process LRU; the optional second tier is a Django cache alias shared
+    between processes.
+    
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self):
+        config = getattr(settings, 'SEMANTIC_CACHE', {})
+        self.max_entries = config.get('MAX_ENTRIES', 256)
+        self.backend_alias = config.get('BACKEND') or None
+        self.timeout = config.get('TIMEOUT', 60 * 60 * 24)
+        
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and not getattr(self._local, 'bypass', False)
+    
+    @contextmanager
+    def bypass(self):
+        """Disable the cache for the current thread (e.g. while benchmarking)."""
+        previous = getattr(self._local, 'bypass', False)
+        self._local.bypass = True
+        try:
+            yield
+        finally:
+            self._local.bypass = previous
+    
+    def make_key(self, namespace: str, text: str, model_id: str, schema_version: int) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"semantic:{namespace}:{model_id}:v{schema_version}:{digest}"
+    
+    def get(self, key: str) -> Any:
+        """Return the cached value for key, or MISSING."""
+        with self._lock:
+            value = self._entries.get(key, MISSING)
+            if value is not MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        
+        backend = self._backend()
+        if backend is not None:
+            try:
+                value = backend.get(key, MISSING)
+            except Exception as e:
+                # An unreachable backend is a miss; the caller recomputes
+                logger.warning(f"Semantic cache backend read failed: {e}")
+                value = MISSING
+            if value is not MISSING:
+                self._store_local(key, value)
+                with self._lock:
+                    self.backend_hits += 1
+                return value
+        
+        with self._lock:
+            self.misses += 1
+        return MISSING
+    
+    def set(self, key: str, value: Any) -> None:
+        self._store_local(key, value)
+        backend = self._backend()
+        if backend is not None:
+            try:
+                backend.set(key, value, self.timeout)
+            except Exception as e:
+                logger.warning(f"Semantic cache backend write failed: {e}")
+    
+    def get_or_compute(
+        self,
+        namespace: str,
+        text: str,
+        model_id: str,
+        schema_version: int,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """Return the cached result for text, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+        
+        key = self.make_key(namespace, text, model_id, schema_version)
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+    
+    def clear(self) -> None:
+        """Drop the in-process tier and reset counters (the shared backend is left alone)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.backend_hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.backend_hits + self.misses
+            return {
+                'hits': self.hits,
+                'backend_hits': self.backend_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.backend_hits) / lookups, 3) if lookups else 0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'backend': self.backend_alias,
+            }
+    
+    def _store_local(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _backend(self) -> Optional[Any]:
+        if not self.backend_alias:
+            return None
+        try:
+            from django.core.cache import caches
+            return caches[self.backend_alias]
+        except Exception as e:
+            logger.warning(f"Semantic cache backend '{self.backend_alias}' unavailable: {e}")
+            return None
+
+
+# Singleton instance
+semantic_cache = SemanticCache()
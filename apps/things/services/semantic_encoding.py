@@ -0,0 +1,249 @@
+"""
+Compact columnar encoding for the per-token data stored in Thing.semantic_bits.
+
+The original format stored one dict per token, repeating every key for every
+token. The columnar format stores parallel arrays instead:
+
+    {
+        'format': 'columnar',
+        'text':  ['I', 'ran', ...],      # token text
+        'idx':   [0, 2, ...],            # character offsets into the source text
+        'pos':   [3, 1, ...],            # indexes into 'pos_codes'
+        'pos_codes': ['PRON', 'VERB', ...],
+        'tag':   [5, 0, ...],            # indexes into 'tag_codes'
+        'tag_codes': ['VBD', ...],
+        'lemma_lower': [0, ...],         # tokens whose lemma is text.lower()
+        'lemma': {'1': 'run', ...},      # any other lemma that differs from text
+        'stop':  [0, ...],               # indexes of stop words
+        'punct': [9, ...],               # indexes of punctuation tokens
+        'phrase': 'nv-...',              # one char per token: v(erb), n(oun), -
+    }
+
+Tokens absent from 'lemma_lower' and 'lemma' have lemma == text. Use
+semantic_tokens() to read either format back as the original dict view.
+"""
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+COLUMNAR = 'columnar'
+
+PHRASE_CODES = {'verb': 'v', 'noun': 'n', None: '-'}
+PHRASE_NAMES = {code: name for name, code in PHRASE_CODES.items()}
+
+
+def encode_tokens(tokens: Iterable[Dict]) -> Dict:
+    """Encode a list of token dicts into the columnar format."""
+    columns = {
+        'format': COLUMNAR,
+        'text': [],
+        'idx': [],
+        'pos': [],
+        'pos_codes': [],
+        'tag': [],
+        'tag_codes': [],
+        'lemma_lower': [],
+        'lemma': {},
+        'stop': [],
+        'punct': [],
+    }
+    pos_lookup = {}
+    tag_lookup = {}
+    phrases = []
+    
+    for i, token in enumerate(tokens):
+        text = token['text']
+        columns['text'].append(text)
+        columns['idx'].append(token.get('idx', 0))
+        columns['pos'].append(_intern(token['pos'], pos_lookup, columns['pos_codes']))
+        columns['tag'].append(_intern(token['tag'], tag_lookup, columns['tag_codes']))
+        
+        lemma = token['lemma']
+        if lemma != text:
+            if lemma == text.lower():
+                columns['lemma_lower'].append(i)
+            else:
+                columns['lemma'][str(i)] = lemma
+        
+        if token.get('is_stop'):
+            columns['stop'].append(i)
+        if token.get('is_punct'):
+            columns['punct'].append(i)
+        phrases.append(PHRASE_CODES.get(token.get('phrase'), '-'))
+    
+    columns['phrase'] = ''.join(phrases)
+    return columns
+
+
+def decode_tokens(tokens: Union[Dict, List[Dict]]) -> List[Dict]:
+    """Decode columnar tokens into a list of token dicts (legacy lists pass through)."""
+    return list(TokenView(tokens))
+
+
+def is_columnar(tokens) -> bool:
+    return isinstance(tokens, dict) and tokens.get('format') == COLUMNAR
+
+
+def semantic_tokens(semantic_bits: Optional[Dict]) -> 'TokenView':
+    """Read the tokens of a stored semantic_bits dict as a sequence of token dicts."""
+    return TokenView((semantic_bits or {}).get('tokens') or [])
+
+
+class TokenView(Sequence):
+    """
+    Read-only sequence of token dicts over either storage format.
+    
+    Columnar data is decoded one token at a time on access, so callers that
+    only need a single column can read it directly via column() instead.
+    """
+    
+    def __init__(self, tokens: Union[Dict, List[Dict]]):
+        self._tokens = tokens
+        self._columnar = is_columnar(tokens)
+        if self._columnar:
+            self._lemma_lower = set(tokens['lemma_lower'])
+            self._stop = set(tokens['stop'])
+            self._punct = set(tokens['punct'])
+    
+    def __len__(self) -> int:
+        if self._columnar:
+            return len(self._tokens['text'])
+        return len(self._tokens)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if not self._columnar:
+            return self._tokens[i]
+        if i < 0:
+            i += len(self)
+        
+        columns = self._tokens
+        text = columns['text'][i]
+        return {
+            'text': text,
+            'idx': columns['idx'][i],
+            'pos': columns['pos_codes'][columns['pos'][i]],
+            'tag': columns['tag_codes'][columns['tag'][i]],
+            'lemma': self._lemma(i, text),
+            'is_stop': i in self._stop,
+            'is_punct': i in self._punct,
+            'phrase': PHRASE_NAMES.get(columns['phrase'][i]),
+        }
+    
+    def column(self, name: str) -> List:
+        """Values of one field for every token, without building token dicts."""
+        if not self._columnar:
+            return [token.get(name) for token in self._tokens]
+        
+        columns = self._tokens
+        if name in ('text', 'idx'):
+            return columns[name]
+        if name in ('pos', 'tag'):
+            codes = columns[f'{name}_codes']
+            return [codes[code] for code in columns[name]]
+        if name == 'lemma':
+            return [self._lemma(i, text) for i, text in enumerate(columns['text'])]
+        if name == 'phrase':
+            return [PHRASE_NAMES.get(code) for code in columns['phrase']]
+        if name in ('is_stop', 'is_punct'):
+            members = self._stop if name == 'is_stop' else self._punct
+            return [i in members for i in range(len(self))]
+        raise KeyError(name)
+    
+    def _lemma(self, i: int, text: str) -> str:
+        if i in self._lemma_lower:
+            return text.lower()
+        return self._tokens['lemma'].get(str(i), text)
+
+
+def _intern(value: str, lookup: Dict[str, int], codes: List[str]) -> int:
+    code = lookup.get(value)
+    if code is None:
+        code = lookup[value] = len(codes)
+        codes.append(value)
+    return code
+
+
+def split_tokens(columns: Dict, ranges: List[Tuple[int, int, int]]) -> List[Dict]:
+    """
+    Cut columnar tokens into independent columnar parts.
+    
+    Args:
+        columns: Columnar tokens
+        ranges: (start, end, char_shift) per part; token offsets in each part
+            are reduced by char_shift so they are relative to the part's text
+    
+    Each part's code tables list only the codes it uses, in order of first
+    use, so a part equals encode_tokens() of its tokens.
+    """
+    lemma_keys = sorted(int(key) for key in columns['lemma'])
+    parts = []
+    
+    for start, end, char_shift in ranges:
+        pos, pos_codes = _recode(columns['pos'][start:end], columns['pos_codes'])
+        tag, tag_codes = _recode(columns['tag'][start:end], columns['tag_codes'])
+        parts.append({
+            'format': COLUMNAR,
+            'text': columns['text'][start:end],
+            'idx': [idx - char_shift for idx in columns['idx'][start:end]],
+            'pos': pos,
+            'pos_codes': pos_codes,
+            'tag': tag,
+            'tag_codes': tag_codes,
+            'lemma_lower': _sparse_slice(columns['lemma_lower'], start, end),
+            'lemma': {
+                str(i - start): columns['lemma'][str(i)]
+                for i in lemma_keys[bisect_left(lemma_keys, start):bisect_left(lemma_keys, end)]
+            },
+            'stop': _sparse_slice(columns['stop'], start, end),
+            'punct': _sparse_slice(columns['punct'], start, end),
+            'phrase': columns['phrase'][start:end],
+        })
+    
+    return parts
+
+
+def concat_tokens(parts: Iterable[Tuple[Dict, int]]) -> Dict:
+    """
+    Join columnar parts into one columnar token set.
+    
+    Args:
+        parts: (columns, char_offset) pairs in document order; each part's
+            token offsets are shifted by char_offset
+    """
+    merged = encode_tokens([])
+    pos_lookup = {}
+    tag_lookup = {}
+    phrases = []
+    base = 0
+    
+    for columns, char_offset in parts:
+        pos_map = [_intern(code, pos_lookup, merged['pos_codes']) for code in columns['pos_codes']]
+        tag_map = [_intern(code, tag_lookup, merged['tag_codes']) for code in columns['tag_codes']]
+        
+        merged['text'].extend(columns['text'])
+        merged['idx'].extend(idx + char_offset for idx in columns['idx'])
+        merged['pos'].extend(pos_map[code] for code in columns['pos'])
+        merged['tag'].extend(tag_map[code] for code in columns['tag'])
+        merged['lemma_lower'].extend(i + base for i in columns['lemma_lower'])
+        merged['lemma'].update((str(int(i) + base), lemma) for i, lemma in columns['lemma'].items())
+        merged['stop'].extend(i + base for i in columns['stop'])
+        merged['punct'].extend(i + base for i in columns['punct'])
+        phrases.append(columns['phrase'])
+        base += len(columns['text'])
+    
+    merged['phrase'] = ''.join(phrases)
+    return merged
+
+
+def _recode(codes: List[int], table: List[str]) -> Tuple[List[int], List[str]]:
+    """Re-intern codes into a table holding only the values they use."""
+    lookup = {}
+    compact = []
+    return [_intern(table[code], lookup, compact) for code in codes], compact
+
+
+def _sparse_slice(indexes: List[int], start: int, end: int) -> List[int]:
+    """Members of a sorted index list within [start, end), rebased to start."""
+    return [i - start for i in indexes[bisect_left(indexes, start):bisect_left(indexes, end)]]
@@ -0,0 +1,162 @@
+"""
+Highlighted HTML rendering for semantic analysis results.
+
+The markup is assembled from fragments prepared once per renderer, so each
+token costs one escape of its text (plus its lemma or POS tag) and a few
+list appends into its paragraph's buffer. render() joins the paragraphs
+once; render_paragraphs() yields them one by one for streaming responses.
+"""
+from html import escape
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from django.utils.safestring import SafeString, mark_safe
+
+from .semantic_encoding import TokenView, is_columnar
+
+# Paragraphs are the unit of both rendering (one <p> each) and analysis
+# (each is parsed and stored as its own segment, see semantic_service)
+PARAGRAPH_SEPARATOR = '\n\n'
+
+VERB_STYLE = 'color: #3B82F6 !important; font-weight: 500 !important; display: inline !important;'
+NOUN_STYLE = 'color: #10B981 !important; font-weight: 500 !important; display: inline !important;'
+OTHER_STYLE = 'display: inline !important;'
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, str]]:
+    """Split text on blank lines into (character offset, paragraph) pairs."""
+    paragraphs = []
+    offset = 0
+    for paragraph in text.split(PARAGRAPH_SEPARATOR):
+        paragraphs.append((offset, paragraph))
+        offset += len(paragraph) + len(PARAGRAPH_SEPARATOR)
+    return paragraphs
+
+
+class HighlightRenderer:
+    """
+    Renders color-coded semantic spans for text from its stored tokens.
+    
+    Verb Phrases: Blue (#3B82F6) - includes verbs with their modifiers
+    Noun Phrases: Green (#10B981) - includes nouns with their modifiers
+    Others: Default color
+    
+    With inline_styles=False the spans carry only their classes, which is
+    much smaller; the page must then style the semantic-* classes itself
+    (as things/thing_detail.html does).
+    """
+    
+    def __init__(self, inline_styles: bool = True):
+        self.inline_styles = inline_styles
+        self._verb_open = (
+            f'<span class="semantic-verb-phrase"{self._style(VERB_STYLE)} '
+            'data-phrase="verb" data-lemma="'
+        )
+        self._verb_close = '" title="Verb phrase component">'
+        self._noun_open = (
+            f'<span class="semantic-noun-phrase"{self._style(NOUN_STYLE)} '
+            'data-phrase="noun" data-lemma="'
+        )
+        self._noun_close = '" title="Noun phrase component">'
+        self._other_open = f'<span class="semantic-other"{self._style(OTHER_STYLE)} data-pos="'
+        # Per-POS opening markup; POS tags are a small closed set
+        self._other_prefixes = {}
+    
+    def render(self, text: str, tokens: Sequence[Dict]) -> SafeString:
+        """
+        Render highlighted HTML for text.
+        
+        tokens is a sequence of token dicts, e.g. semantic_tokens(semantic_bits),
+        or columnar tokens.
+        Each token needs 'text', 'idx' (character offset into text), 'phrase',
+        'pos' and 'lemma'. Paragraphs are split on blank lines and wrapped in
+        <p> tags; single line breaks inside a paragraph become <br>.
+        """
+        return mark_safe(''.join(self.render_paragraphs(text, tokens)))
+    
+    def render_paragraphs(self, text: str, tokens: Sequence[Dict]) -> Iterator[str]:
+        """Yield the <p> element of each non-blank paragraph of text (see render())."""
+        if not isinstance(tokens, TokenView):
+            # Columnar token dicts (e.g. one stored segment) or token dicts
+            tokens = TokenView(tokens if is_columnar(tokens) else list(tokens))
+        token_texts = tokens.column('text')
+        offsets = tokens.column('idx')
+        phrases = tokens.column('phrase')
+        pos_tags = tokens.column('pos')
+        lemmas = tokens.column('lemma')
+        
+        spans = [i for i, token_text in enumerate(token_texts) if not token_text.isspace()]
+        span_count = len(spans)
+        k = 0
+        
+        for start, paragraph in split_paragraphs(text):
+            end = start + len(paragraph)
+            
+            if not paragraph.strip():
+                while k < span_count and offsets[spans[k]] < end:
+                    k += 1
+                continue
+            
+            out: List[str] = ['<p>']
+            append = out.append
+            cursor = start
+            
+            while k < span_count and offsets[spans[k]] < end:
+                i = spans[k]
+                k += 1
+                token_text = token_texts[i]
+                offset = offsets[i]
+                
+                if offset > cursor:
+                    append(_whitespace_html(text[cursor:offset]))
+                
+                phrase = phrases[i]
+                if phrase == 'verb':
+                    append(self._verb_open)
+                    append(escape(lemmas[i]))
+                    append(self._verb_close)
+                elif phrase == 'noun':
+                    append(self._noun_open)
+                    append(escape(lemmas[i]))
+                    append(self._noun_close)
+                else:
+                    append(self._other_prefix(pos_tags[i]))
+                append(escape(token_text))
+                append('</span>')
+                
+                cursor = offset + len(token_text)
+            
+            if end > cursor:
+                append(_whitespace_html(text[cursor:end]))
+            append('</p>')
+            yield ''.join(out)
+    
+    def _other_prefix(self, pos: str) -> str:
+        prefix = self._other_prefixes.get(pos)
+        if prefix is None:
+            escaped = escape(pos)
+            prefix = self._other_prefixes[pos] = f'{self._other_open}{escaped}" title="{escaped}">'
+        return prefix
+    
+    def _style(self, css: str) -> str:
+        return f' style="{css}"' if self.inline_styles else ''
+
+
+def _whitespace_html(gap: str) -> str:
+    # Handle newlines within paragraphs (single line breaks), keeping the spaces around them
+    if '\n' in gap:
+        return gap.replace('\r\n', '\n').replace('\n', '<br>')
+    return gap
+
+
+# Shared instances
+highlight_renderer = HighlightRenderer()
+class_only_renderer = HighlightRenderer(inline_styles=False)
+
+
+def get_renderer(inline_styles: bool = True) -> HighlightRenderer:
+    return highlight_renderer if inline_styles else class_only_renderer
+
+
+def render_highlighted_html(text: str, tokens: Sequence[Dict], inline_styles: bool = True) -> SafeString:
+    """Render highlighted HTML for text from its tokens (see HighlightRenderer.render)."""
+    return get_renderer(inline_styles).render(text, tokens)
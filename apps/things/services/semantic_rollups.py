@@ -0,0 +1,182 @@
+"""
+Per-user weekly totals of semantic stats, maintained as deltas.
+
+A thing contributes its semantic_bits['stats'] (tokens, words, content
+words, verbs, nouns, adjectives, density) to the SemanticWeeklyRollup row of
+its owner and the week of its thing_date. Every write path records the
+contribution before and after the change: the Thing save/delete signals,
+save_thing_analysis() and backfill_semantics. Only the difference is added
+to the affected rows, so a year of trends is read from ~52 rows instead of
+every entry's stored analysis. rebuild_semantic_rollups recomputes them from
+scratch.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+
+from ..models import SemanticWeeklyRollup, Thing
+
+# Rollup counters and the semantic_bits['stats'] key each one sums
+COUNTERS = {
+    'total_tokens': 'total_tokens',
+    'total_words': 'total_words',
+    'content_words': 'content_words',
+    'verb_count': 'verb_count',
+    'noun_count': 'noun_count',
+    'adjective_count': 'adjective_count',
+    'density_sum': 'density',
+}
+PERIODS = {
+    'week': None,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+class Contribution(NamedTuple):
+    """What one analyzed thing adds to one weekly rollup row."""
+    user_id: int
+    week_start: date
+    counts: Dict[str, float]
+
+
+def week_start(day: date) -> date:
+    """Monday of the week containing day."""
+    return day - timedelta(days=day.weekday())
+
+
+class SemanticRollups:
+    """Maintains and queries SemanticWeeklyRollup rows."""
+    
+    def contribution(self, user_id, thing_date: Optional[date], stats: Optional[Dict]) -> Optional[Contribution]:
+        """A thing's share of its week, or None if it has no stored analysis."""
+        if not stats or not thing_date:
+            return None
+        counts = {field: stats.get(key) or 0 for field, key in COUNTERS.items()}
+        counts['thing_count'] = 1
+        return Contribution(user_id, week_start(thing_date), counts)
+    
+    def contribution_of(self, thing) -> Optional[Contribution]:
+        """Contribution of an in-memory thing as it is now."""
+        return self.contribution(thing.user_id, thing.thing_date, (thing.semantic_bits or {}).get('stats'))
+    
+    def stored_contributions(self, pks: Iterable) -> Dict[str, Optional[Contribution]]:
+        """Contributions of things as currently stored, keyed by str(pk), without loading semantic_bits."""
+        rows = Thing.objects.filter(pk__in=list(pks)).values_list(
+            'pk', 'user_id', 'thing_date', 'semantic_bits__stats'
+        )
+        return {str(pk): self.contribution(user_id, thing_date, stats) for pk, user_id, thing_date, stats in rows}
+    
+    def record(self, before: Optional[Contribution], after: Optional[Contribution]) -> None:
+        """Apply the change from one contribution to another (either may be None)."""
+        self.record_many([(before, after)])
+    
+    def record_many(self, changes: Iterable[Tuple[Optional[Contribution], Optional[Contribution]]]) -> None:
+        """Apply several before/after changes, touching each affected row once."""
+        deltas = defaultdict(lambda: defaultdict(float))
+        for before, after in changes:
+            for contribution, sign in ((before, -1), (after, 1)):
+                if contribution is not None:
+                    key = (contribution.user_id, contribution.week_start)
+                    for field, value in contribution.counts.items():
+                        deltas[key][field] += sign * value
+        
+        with transaction.atomic():
+            for (user_id, week), delta in deltas.items():
+                delta = {field: value for field, value in delta.items() if value}
+                if delta:
+                    self._apply(user_id, week, delta)
+    
+    def rebuild(self, user_id) -> int:
+        """Recompute every weekly row of a user from the stored analyses; returns rows written."""
+        totals = defaultdict(lambda: defaultdict(float))
+        things = Thing.objects.filter(user_id=user_id).values_list('thing_date', 'semantic_bits__stats')
+        for thing_date, stats in things.iterator(chunk_size=2000):
+            contribution = self.contribution(user_id, thing_date, stats)
+            if contribution is not None:
+                for field, value in contribution.counts.items():
+                    totals[contribution.week_start][field] += value
+        
+        rows = [
+            SemanticWeeklyRollup(user_id=user_id, week_start=week, **self._stored(counts))
+            for week, counts in totals.items()
+        ]
+        with transaction.atomic():
+            SemanticWeeklyRollup.objects.filter(user_id=user_id).delete()
+            SemanticWeeklyRollup.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+    
+    def trends(
+        self,
+        user,
+        period: str = 'week',
+        since: Optional[date] = None,
+        until: Optional[date] = None
+    ) -> List[Dict]:
+        """
+        Writing-style totals per period (week, month or year), oldest first.
+        
+        Months and years group weeks by the month/year their Monday falls in.
+        """
+        rows = SemanticWeeklyRollup.objects.filter(user=user)
+        if since:
+            rows = rows.filter(week_start__gte=week_start(since))
+        if until:
+            rows = rows.filter(week_start__lte=until)
+        
+        fields = ['thing_count', *COUNTERS]
+        truncate = PERIODS[period]
+        if truncate is None:
+            rows = rows.annotate(period=F('week_start')).values('period', *fields)
+        else:
+            rows = (
+                rows.annotate(period=truncate('week_start'))
+                .values('period')
+                .annotate(**{field: Sum(field) for field in fields})
+            )
+        
+        results = []
+        for row in rows.order_by('period'):
+            counts = {field: row[field] for field in fields}
+            total_words = counts['total_words']
+            results.append({
+                'period_start': row['period'].isoformat(),
+                'thing_count': counts['thing_count'],
+                'total_tokens': counts['total_tokens'],
+                'total_words': total_words,
+                'content_words': counts['content_words'],
+                'verb_count': counts['verb_count'],
+                'noun_count': counts['noun_count'],
+                'adjective_count': counts['adjective_count'],
+                'density': round(counts['content_words'] / total_words, 3) if total_words else 0,
+                'mean_entry_density': (
+                    round(counts['density_sum'] / counts['thing_count'], 3) if counts['thing_count'] else 0
+                ),
+            })
+        return results
+    
+    def _apply(self, user_id, week: date, delta: Dict[str, float]) -> None:
+        updates = {field: F(field) + value for field, value in self._stored(delta).items()}
+        rows = SemanticWeeklyRollup.objects.filter(user_id=user_id, week_start=week)
+        if not rows.update(**updates):
+            # Removals never create rows (the user may be being deleted too)
+            if delta.get('thing_count', 0) <= 0:
+                return
+            SemanticWeeklyRollup.objects.get_or_create(user_id=user_id, week_start=week)
+            rows.update(**updates)
+        rows.filter(thing_count__lte=0).delete()
+    
+    def _stored(self, counts: Dict[str, float]) -> Dict[str, float]:
+        """Counts with the integer columns rounded back to ints."""
+        return {
+            field: value if field == 'density_sum' else int(round(value))
+            for field, value in counts.items()
+        }
+
+
+# Singleton instance
+semantic_rollups = SemanticRollups()
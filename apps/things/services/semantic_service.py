@@ -1,42 +1,227 @@
-import spacy
-from typing import Dict, List, Tuple
-from django.utils.html import format_html, mark_safe
+import hashlib
+from collections import deque
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .lemma_index import lemma_index
+from .nlp_registry import nlp_registry
+from .relation_store import relation_store
+from .semantic_cache import semantic_cache, MISSING
+from .semantic_encoding import concat_tokens, encode_tokens, semantic_tokens, split_tokens
+from .semantic_html import get_renderer, render_highlighted_html, split_paragraphs
+from .semantic_rollups import semantic_rollups
+
+
+# Bump whenever the shape of the stored semantic_bits dict changes so stale
+# rows are re-analyzed instead of rendered from incompatible data.
+SEMANTIC_SCHEMA_VERSION = 5
+
+
+# Pipeline components each operation can skip. Nothing reads entities, so NER
+# never runs; phrase highlighting and SVO relations walk noun_chunks and
+# dependency children, so they keep the parser, while density and POS buckets
+# only need tags/lemmas. Components missing from the loaded model are ignored.
+PIPELINE_PROFILES = {
+    'phrases': ('ner',),
+    'highlight': ('ner',),
+    'relations': ('ner',),
+    'density': ('ner', 'parser'),
+    'pos': ('ner', 'parser'),
+}
+
+
+def text_hash(text: str) -> str:
+    """Content hash used to tie a stored analysis to the exact text it describes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
 class SemanticService:
     """Service for semantic bit theory analysis of text."""
     
-    def __init__(self):
-        try:
-            # Load the English language model
-            self.nlp = spacy.load("en_core_web_sm")
-            self.model_loaded = True
-        except Exception as e:
-            print(f"Warning: spaCy model not loaded. Error: {e}")
-            print("Run: python -m spacy download en_core_web_sm")
-            self.nlp = None
-            self.model_loaded = False
+    @property
+    def model_name(self) -> str:
+        """spaCy package configured by settings.SEMANTIC_MODEL."""
+        return nlp_registry.default_model
+    
+    @property
+    def nlp(self):
+        """The English language model, loaded lazily on first use (None if unavailable)."""
+        return nlp_registry.get(self.model_name)
+    
+    @property
+    def model_loaded(self) -> bool:
+        return nlp_registry.is_loaded(self.model_name)
+    
+    def warm_up(self) -> Dict:
+        """Load the model now (e.g. in a pre-fork server master) and return its load stats."""
+        return nlp_registry.warm_up([self.model_name])
+    
+    def disabled_components(self, profile: str) -> List[str]:
+        """Names of loaded pipeline components that the given profile does not need."""
+        if not self.nlp:
+            return []
+        skip = PIPELINE_PROFILES[profile]
+        return [name for name in self.nlp.pipe_names if name in skip]
+    
+    def parse_paragraphs(self, paragraphs: Sequence[str], profile: str = 'phrases') -> List:
+        """Run spaCy over each paragraph with only the components the profile needs."""
+        return list(self.nlp.pipe(paragraphs, disable=self.disabled_components(profile)))
+    
+    @property
+    def model_id(self) -> str:
+        """Name and version of the loaded model, used to key cached results."""
+        if not self.nlp:
+            return 'none'
+        meta = self.nlp.meta
+        return f"{meta.get('lang', 'xx')}_{meta.get('name', 'pipeline')}-{meta.get('version', '0')}"
     
-    def extract_semantic_bits(self, text: str) -> Dict:
+    def extract_semantic_bits(self, text: str, previous: Optional[Dict] = None) -> Dict:
         """
         Extract semantic bits (verb phrases and noun phrases) from text.
         Semantically bifurcates sentences into noun-like and verb-like components.
         
+        Args:
+            text: Text to analyze
+            previous: Semantic bits stored for an earlier version of the text;
+                paragraphs it already covers are reused instead of re-parsed
+        
         Returns:
             Dict with 'verb_phrases', 'noun_phrases', and 'tokens' lists
         """
-        if not self.nlp or not text:
-            return {
-                'verb_phrases': [],
-                'noun_phrases': [],
-                'tokens': []
-            }
+        if not self.nlp:
+            return self._empty_bits()
+        if not text:
+            return self._empty_bits(text or '')
+        
+        return self.analyze(text, previous=previous).semantic_bits
+    
+    def extract_semantic_bits_many(
+        self,
+        texts: Iterable[str],
+        batch_size: int = 64,
+        n_process: int = 1
+    ) -> Iterator[Dict]:
+        """
+        Extract semantic bits from many texts using spaCy's batched nlp.pipe.
+        
+        Args:
+            texts: Iterable of texts to analyze (consumed lazily)
+            batch_size: Number of paragraphs spaCy buffers per batch
+            n_process: Number of worker processes spaCy should use
+        
+        Yields:
+            One result per input text, in input order, with the same shape
+            as extract_semantic_bits()
+        """
+        if not self.nlp:
+            for _ in texts:
+                yield self._empty_bits()
+            return
+        
+        # Texts whose paragraphs have been handed to the segment stream, in order
+        layouts = deque()
+        segments = []
+        
+        def paragraphs():
+            for text in texts:
+                layout = split_paragraphs(text) if text else []
+                layouts.append((text, layout))
+                for _, paragraph in layout:
+                    yield paragraph
+        
+        def completed():
+            while layouts and len(layouts[0][1]) <= len(segments):
+                text, layout = layouts.popleft()
+                if not text:
+                    yield self._empty_bits(text or '')
+                    continue
+                done = segments[:len(layout)]
+                del segments[:len(layout)]
+                yield self._merge_segments(text, layout, done)
+        
+        for segment in self._segment_stream(paragraphs(), batch_size=batch_size, n_process=n_process):
+            segments.append(segment)
+            yield from completed()
+        
+        yield from completed()
+    
+    def _segment_stream(
+        self,
+        paragraphs: Iterable[str],
+        reusable: Optional[Dict[str, Dict]] = None,
+        batch_size: int = 64,
+        n_process: int = 1
+    ) -> Iterator[Dict]:
+        """
+        Yield one analysis segment per paragraph, in order.
+        
+        A paragraph is only parsed when its hash is not in reusable and its
+        segment is not in semantic_cache.
+        """
+        model_id = self.model_id
+        # Input-ordered slots; only paragraphs with nothing to reuse go through nlp.pipe
+        pending = deque()
         
-        doc = self.nlp(text)
+        def misses():
+            for paragraph in paragraphs:
+                slot = [paragraph, reusable.get(text_hash(paragraph), MISSING) if reusable else MISSING]
+                if slot[1] is MISSING and semantic_cache.enabled:
+                    key = semantic_cache.make_key('segment', paragraph, model_id, SEMANTIC_SCHEMA_VERSION)
+                    slot[1] = semantic_cache.get(key)
+                pending.append(slot)
+                if slot[1] is MISSING:
+                    yield paragraph
         
+        docs = self.nlp.pipe(
+            misses(),
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=self.disabled_components('phrases')
+        )
+        for doc in docs:
+            while pending[0][1] is not MISSING:
+                yield pending.popleft()[1]
+            
+            paragraph = pending.popleft()[0]
+            segment = self._segment_from_doc(doc)
+            if semantic_cache.enabled:
+                key = semantic_cache.make_key('segment', paragraph, model_id, SEMANTIC_SCHEMA_VERSION)
+                semantic_cache.set(key, segment)
+            yield segment
+        
+        while pending:
+            yield pending.popleft()[1]
+    
+    def _empty_bits(self, text: Optional[str] = None) -> Dict:
+        """
+        Semantic bits without any phrases.
+        
+        With text (an empty description that was analyzed) they are stamped
+        like a real analysis, so backfills do not pick the thing up again;
+        without it (no model) they stay unversioned and are redone later.
+        """
+        semantic_bits = {
+            'verb_phrases': [],
+            'noun_phrases': [],
+            'relations': [],
+            'tokens': []
+        }
+        if text is not None:
+            semantic_bits['version'] = SEMANTIC_SCHEMA_VERSION
+            semantic_bits['text_hash'] = text_hash(text)
+        return semantic_bits
+    
+    def _segment_from_doc(self, doc) -> Dict:
+        """Build the semantic bits of one paragraph from its parsed Doc (offsets relative to it)."""
         verb_phrases = []
         noun_phrases = []
+        relations = []
         tokens = []
+        verb_phrase_tokens, noun_chunk_tokens = self._phrase_marks(doc)
+        pos_counts = {}
+        content_words = 0
+        total_words = 0
         
         # Extract noun chunks (includes adjectives and determiners)
         for chunk in doc.noun_chunks:
@@ -50,16 +235,31 @@ class SemanticService:
         
         # Extract verb phrases with their modifiers
         for token in doc:
+            if token.i in verb_phrase_tokens:
+                phrase = 'verb'
+            elif token.i in noun_chunk_tokens:
+                phrase = 'noun'
+            else:
+                phrase = None
+            
             token_info = {
                 'text': token.text,
+                'idx': token.idx,
                 'pos': token.pos_,
                 'tag': token.tag_,
                 'lemma': token.lemma_,
                 'is_stop': token.is_stop,
-                'is_punct': token.is_punct
+                'is_punct': token.is_punct,
+                'phrase': phrase
             }
             tokens.append(token_info)
             
+            if not token.is_punct and not token.is_space:
+                total_words += 1
+                pos_counts[token.pos_] = pos_counts.get(token.pos_, 0) + 1
+                if token.pos_ in ["VERB", "NOUN"]:
+                    content_words += 1
+            
             if token.pos_ == "VERB":
                 # Collect verb with its modifiers (adverbs, auxiliaries, particles)
                 phrase_tokens = [token]
@@ -79,29 +279,311 @@ class SemanticService:
                     'root_lemma': token.lemma_,
                     'tag': token.tag_
                 })
+                
+                relation = self._relation_from_verb(token)
+                if relation:
+                    relations.append(relation)
+        
+        density = content_words / total_words if total_words > 0 else 0
         
         return {
             'verb_phrases': verb_phrases,
             'noun_phrases': noun_phrases,
-            'tokens': tokens,
+            'relations': relations,
+            'tokens': encode_tokens(tokens),
             'stats': {
                 'total_tokens': len(tokens),
                 'verb_phrase_count': len(verb_phrases),
-                'noun_phrase_count': len(noun_phrases)
+                'noun_phrase_count': len(noun_phrases),
+                'relation_count': len(relations),
+                'total_words': total_words,
+                'content_words': content_words,
+                'density': round(density, 2),
+                'verb_count': pos_counts.get('VERB', 0),
+                'noun_count': pos_counts.get('NOUN', 0),
+                'adjective_count': pos_counts.get('ADJ', 0)
             }
         }
     
+    def _relation_from_verb(self, token) -> Optional[List[str]]:
+        """
+        [subject, verb, object] lemmas (lowercased) for a verb token, or None.
+        
+        Uses the same dependencies as get_semantic_relationships(); a missing
+        subject or object is ''.
+        """
+        subject = ''
+        obj = ''
+        for child in token.children:
+            if child.dep_ in ["nsubj", "nsubjpass"]:
+                subject = child.lemma_.lower()
+            elif child.dep_ in ["dobj", "pobj"]:
+                obj = child.lemma_.lower()
+        
+        if not subject and not obj:
+            return None
+        return [subject, token.lemma_.lower(), obj]
+    
+    def _phrase_marks(self, doc) -> Tuple[set, set]:
+        """Return the token indices belonging to verb phrases and to noun chunks."""
+        # Mark noun chunks
+        noun_chunk_tokens = set()
+        for chunk in doc.noun_chunks:
+            for i in range(chunk.start, chunk.end):
+                noun_chunk_tokens.add(i)
+        
+        # Mark verb phrases (verb + modifiers)
+        verb_phrase_tokens = set()
+        for token in doc:
+            if token.pos_ == "VERB":
+                verb_phrase_tokens.add(token.i)
+                # Add modifiers
+                for child in token.children:
+                    if child.pos_ == "ADV" or child.dep_ in ["aux", "auxpass", "neg", "prt"]:
+                        verb_phrase_tokens.add(child.i)
+        
+        return verb_phrase_tokens, noun_chunk_tokens
+    
+    def _merge_segments(
+        self,
+        text: str,
+        paragraphs: Sequence[Tuple[int, str]],
+        segments: Iterable[Dict]
+    ) -> Dict:
+        """
+        Splice per-paragraph segments into the semantic bits of the whole text.
+        
+        Token offsets are shifted into the document, and a 'segments' index
+        records each paragraph's hash, offset and counts so the result can be
+        cut back into segments by _stored_segments().
+        """
+        token_parts = []
+        verb_phrases = []
+        noun_phrases = []
+        relations = []
+        segment_index = []
+        totals = {}
+        token_base = 0
+        
+        for (start, paragraph), segment in zip(paragraphs, segments):
+            token_parts.append((segment['tokens'], start))
+            verb_phrases.extend(segment['verb_phrases'])
+            relations.extend(segment['relations'])
+            for phrase in segment['noun_phrases']:
+                noun_phrases.append(dict(
+                    phrase,
+                    start=phrase['start'] + token_base,
+                    end=phrase['end'] + token_base
+                ))
+            
+            stats = segment['stats']
+            for key, value in stats.items():
+                if key != 'density':
+                    totals[key] = totals.get(key, 0) + value
+            segment_index.append({'hash': text_hash(paragraph), 'start': start, 'stats': stats})
+            token_base += stats['total_tokens']
+        
+        total_words = totals.get('total_words', 0)
+        density = totals.get('content_words', 0) / total_words if total_words > 0 else 0
+        totals['density'] = round(density, 2)
+        
+        return {
+            'version': SEMANTIC_SCHEMA_VERSION,
+            'text_hash': text_hash(text),
+            'verb_phrases': verb_phrases,
+            'noun_phrases': noun_phrases,
+            'relations': relations,
+            'tokens': concat_tokens(token_parts),
+            'stats': totals,
+            'segments': segment_index
+        }
+    
+    def _stored_segments(self, semantic_bits: Optional[Dict], wanted: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Cut stored semantic bits back into segments for the wanted paragraph hashes.
+        
+        Returns:
+            Segments keyed by paragraph hash; empty if the stored bits predate
+            the current schema
+        """
+        if not semantic_bits or semantic_bits.get('version') != SEMANTIC_SCHEMA_VERSION:
+            return {}
+        
+        wanted = set(wanted)
+        picked = {}
+        # Running [start, end) of each segment's slice of the per-document lists
+        counted = (
+            ('tokens', 'total_tokens'),
+            ('verb_phrases', 'verb_phrase_count'),
+            ('noun_phrases', 'noun_phrase_count'),
+            ('relations', 'relation_count'),
+        )
+        starts = dict.fromkeys((name for name, _ in counted), 0)
+        
+        for entry in semantic_bits.get('segments', []):
+            stats = entry['stats']
+            ranges = {name: (starts[name], starts[name] + stats[count]) for name, count in counted}
+            if entry['hash'] in wanted and entry['hash'] not in picked:
+                picked[entry['hash']] = (entry, ranges)
+            starts = {name: end for name, (_, end) in ranges.items()}
+        
+        token_parts = split_tokens(
+            semantic_bits['tokens'],
+            [(*ranges['tokens'], entry['start']) for entry, ranges in picked.values()]
+        )
+        
+        segments = {}
+        for (entry, ranges), tokens in zip(picked.values(), token_parts):
+            token_start = ranges['tokens'][0]
+            segments[entry['hash']] = {
+                'verb_phrases': semantic_bits['verb_phrases'][slice(*ranges['verb_phrases'])],
+                'noun_phrases': [
+                    dict(phrase, start=phrase['start'] - token_start, end=phrase['end'] - token_start)
+                    for phrase in semantic_bits['noun_phrases'][slice(*ranges['noun_phrases'])]
+                ],
+                'relations': semantic_bits['relations'][slice(*ranges['relations'])],
+                'tokens': tokens,
+                'stats': entry['stats']
+            }
+        return segments
+    
     def is_available(self) -> bool:
-        """Check if the semantic service is available."""
-        return self.model_loaded and self.nlp is not None
+        """Check if the semantic service is available (loads the model on first call)."""
+        return self.nlp is not None
+    
+    def analyze(
+        self,
+        text: str,
+        profile: str = 'phrases',
+        previous: Optional[Dict] = None
+    ) -> 'SemanticAnalysis':
+        """
+        Parse text once and return a bundle exposing every semantic view of it.
+        
+        The default profile runs every component any view needs; callers that
+        only want one view can pass a narrower profile from PIPELINE_PROFILES.
+        
+        Highlight spans, SVO relationships, density, POS buckets and the
+        semantic bits dict are all derived lazily from the same spaCy Docs,
+        and each view is served from semantic_cache when available, so the
+        text is parsed at most once and not at all on a full cache hit.
+        Semantic bits are built paragraph by paragraph, reusing unchanged
+        paragraphs from previous (the stored bits of an earlier version).
+        """
+        return SemanticAnalysis(self, text or '', profile, previous)
+    
+    def has_current_analysis(self, semantic_bits: Optional[Dict], text: str) -> bool:
+        """Check whether stored semantic bits were produced for this exact text and schema."""
+        if not semantic_bits or not text:
+            return False
+        return (
+            semantic_bits.get('version') == SEMANTIC_SCHEMA_VERSION
+            and semantic_bits.get('text_hash') == text_hash(text)
+        )
+    
+    def apply_semantic_analysis(self, thing, semantic_analysis: Dict) -> None:
+        """Copy a semantic bits result onto a Thing's semantic fields (does not save)."""
+        thing.semantic_verbs = semantic_analysis.get('verb_phrases', [])
+        thing.semantic_nouns = semantic_analysis.get('noun_phrases', [])
+        thing.semantic_bits = semantic_analysis
+    
+    def get_thing_highlight(
+        self,
+        thing,
+        analyze_if_stale: bool = True,
+        inline_styles: bool = True
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Return (highlighted_html, stats) for a Thing's description.
+        
+        Renders from the stored semantic_bits when they match the current
+        description, so the read path never touches spaCy. Otherwise the
+        description is analyzed once and the result is written back, unless
+        analyze_if_stale is False (e.g. a background task is about to do it),
+        in which case (None, None) is returned. With inline_styles=False the
+        page must style the semantic-* classes itself.
+        """
+        text = thing.description
+        if not text:
+            return None, None
+        
+        if not self.has_current_analysis(thing.semantic_bits, text):
+            if not analyze_if_stale:
+                return None, None
+            if not self.is_available():
+                return self.create_highlighted_html(text, inline_styles), None
+            
+            self.save_thing_analysis(thing, self.extract_semantic_bits(text, previous=thing.semantic_bits))
+        
+        semantic_bits = thing.semantic_bits
+        return (
+            render_highlighted_html(text, semantic_tokens(semantic_bits), inline_styles),
+            semantic_bits.get('stats')
+        )
+    
+    def stream_thing_highlight(
+        self,
+        thing,
+        analyze_if_stale: bool = True,
+        inline_styles: bool = True
+    ) -> Iterator[str]:
+        """
+        Yield a Thing's highlighted HTML one paragraph at a time.
+        
+        Like get_thing_highlight(), but a stale description is parsed
+        paragraph by paragraph and each one is yielded as soon as it is
+        analyzed, so long entries start arriving before spaCy has finished.
+        The merged analysis is written back after the last paragraph.
+        """
+        text = thing.description
+        if not text:
+            return
+        
+        renderer = get_renderer(inline_styles)
+        if self.has_current_analysis(thing.semantic_bits, text):
+            yield from renderer.render_paragraphs(text, semantic_tokens(thing.semantic_bits))
+            return
+        if not analyze_if_stale:
+            return
+        if not self.is_available():
+            yield self.create_highlighted_html(text, inline_styles)
+            return
+        
+        layout = split_paragraphs(text)
+        paragraphs = [paragraph for _, paragraph in layout]
+        reusable = self._stored_segments(thing.semantic_bits, map(text_hash, paragraphs))
+        segments = []
+        # batch_size=1 so nlp.pipe hands back each paragraph instead of buffering a batch
+        for paragraph, segment in zip(paragraphs, self._segment_stream(paragraphs, reusable, batch_size=1)):
+            segments.append(segment)
+            yield from renderer.render_paragraphs(paragraph, segment['tokens'])
+        
+        self.save_thing_analysis(thing, self._merge_segments(text, layout, segments))
     
-    def create_highlighted_html(self, text: str) -> str:
+    def save_thing_analysis(self, thing, semantic_analysis: Dict) -> None:
+        """Apply a semantic bits result to a Thing, write it and update its indexes and weekly rollup."""
+        before = semantic_rollups.stored_contributions([thing.pk]).get(str(thing.pk))
+        self.apply_semantic_analysis(thing, semantic_analysis)
+        # Queryset update keeps updated_at and save signals untouched
+        type(thing).objects.filter(pk=thing.pk).update(
+            semantic_verbs=thing.semantic_verbs,
+            semantic_nouns=thing.semantic_nouns,
+            semantic_bits=thing.semantic_bits
+        )
+        lemma_index.sync(thing)
+        relation_store.sync(thing)
+        semantic_rollups.record(before, semantic_rollups.contribution_of(thing))
+    
+    def create_highlighted_html(self, text: str, inline_styles: bool = True) -> str:
         """
         Create HTML with color-coded semantic phrases while preserving paragraph structure.
         
         Verb Phrases: Blue (#3B82F6) - includes verbs with their modifiers
         Noun Phrases: Green (#10B981) - includes nouns with their modifiers
         Others: Default color
+        
+        With inline_styles=False spans carry only their CSS classes, which
+        makes the markup much smaller; the page must style them itself.
         """
         if not self.nlp or not text:
             # Return a message if spaCy is not available
@@ -109,81 +591,16 @@ class SemanticService:
                 return format_html(
                     '<div class="p-3 bg-yellow-50 border border-yellow-200 rounded">'
                     '<p class="text-yellow-800">Semantic analysis not available. '
-                    'Please install spaCy: <code>python -m spacy download en_core_web_sm</code></p>'
-                    '</div>'
+                    'Please install spaCy: <code>python -m spacy download {}</code></p>'
+                    '</div>',
+                    self.model_name
                 )
             return text
         
-        # Split text into paragraphs to preserve structure
-        paragraphs = text.split('\n\n')
-        html_paragraphs = []
-        
-        for paragraph in paragraphs:
-            if not paragraph.strip():
-                continue
-                
-            # Process each paragraph
-            doc = self.nlp(paragraph)
-            
-            # Mark noun chunks
-            noun_chunk_tokens = set()
-            for chunk in doc.noun_chunks:
-                for i in range(chunk.start, chunk.end):
-                    noun_chunk_tokens.add(i)
-            
-            # Mark verb phrases (verb + modifiers)
-            verb_phrase_tokens = set()
-            for token in doc:
-                if token.pos_ == "VERB":
-                    verb_phrase_tokens.add(token.i)
-                    # Add modifiers
-                    for child in token.children:
-                        if child.pos_ == "ADV" or child.dep_ in ["aux", "auxpass", "neg", "prt"]:
-                            verb_phrase_tokens.add(child.i)
-            
-            html_parts = []
-            
-            for token in doc:
-                # Handle newlines within paragraphs (single line breaks)
-                if '\n' in token.text:
-                    html_parts.append('<br>')
-                    continue
-                    
-                # Skip pure whitespace tokens
-                if token.text.isspace():
-                    html_parts.append(token.text)
-                    continue
-                
-                # Determine color based on phrase membership
-                if token.i in verb_phrase_tokens:
-                    # Part of verb phrase - blue
-                    html_parts.append(format_html(
-                        '<span class="semantic-verb-phrase" style="color: #3B82F6 !important; font-weight: 500 !important; display: inline !important;" '
-                        'data-phrase="verb" data-lemma="{}" title="Verb phrase component">{}</span>',
-                        token.lemma_, token.text
-                    ))
-                elif token.i in noun_chunk_tokens:
-                    # Part of noun phrase - green
-                    html_parts.append(format_html(
-                        '<span class="semantic-noun-phrase" style="color: #10B981 !important; font-weight: 500 !important; display: inline !important;" '
-                        'data-phrase="noun" data-lemma="{}" title="Noun phrase component">{}</span>',
-                        token.lemma_, token.text
-                    ))
-                else:
-                    # Other words in default color
-                    html_parts.append(format_html(
-                        '<span class="semantic-other" style="display: inline !important;" data-pos="{}" title="{}">{}</span>',
-                        token.pos_, token.pos_, token.text
-                    ))
-                
-                # Add space after token if needed
-                if token.whitespace_:
-                    html_parts.append(token.whitespace_)
-            
-            # Wrap each paragraph in a <p> tag
-            html_paragraphs.append('<p>' + ''.join(html_parts) + '</p>')
-        
-        return mark_safe(''.join(html_paragraphs))
+        analysis = self.analyze(text, profile='highlight')
+        if not inline_styles:
+            return analysis.cached('html-classes', lambda: analysis.class_only_html, needs='highlight')
+        return analysis.cached('html', lambda: analysis.highlighted_html, needs='highlight')
     
     def get_semantic_relationships(self, text: str) -> List[Tuple]:
         """
@@ -192,10 +609,22 @@ class SemanticService:
         if not self.nlp or not text:
             return []
         
-        doc = self.nlp(text)
+        return self.analyze(text, profile='relations').relationships
+    
+    def calculate_semantic_density(self, text: str) -> Dict:
+        """
+        Calculate the semantic density of text.
+        Returns ratio of semantic content (verbs and nouns) to total words.
+        """
+        if not self.nlp or not text:
+            return {'density': 0, 'content_words': 0, 'total_words': 0}
+        
+        return self.analyze(text, profile='density').density
+    
+    def _relationships_from_tokens(self, tokens: Iterable) -> List[Dict]:
         relationships = []
         
-        for token in doc:
+        for token in tokens:
             if token.pos_ == "VERB":
                 # Find subject
                 subject = None
@@ -216,19 +645,11 @@ class SemanticService:
         
         return relationships
     
-    def calculate_semantic_density(self, text: str) -> Dict:
-        """
-        Calculate the semantic density of text.
-        Returns ratio of semantic content (verbs and nouns) to total words.
-        """
-        if not self.nlp or not text:
-            return {'density': 0, 'content_words': 0, 'total_words': 0}
-        
-        doc = self.nlp(text)
+    def _density_from_tokens(self, tokens: Iterable) -> Dict:
         content_words = 0
         total_words = 0
         
-        for token in doc:
+        for token in tokens:
             if not token.is_punct and not token.is_space:
                 total_words += 1
                 if token.pos_ in ["VERB", "NOUN"]:
@@ -241,6 +662,158 @@ class SemanticService:
             'content_words': content_words,
             'total_words': total_words
         }
+    
+    def _pos_buckets_from_tokens(self, tokens: Iterable) -> Dict[str, List[str]]:
+        buckets = {}
+        for token in tokens:
+            if token.is_punct or token.is_space:
+                continue
+            buckets.setdefault(token.pos_, []).append(token.lemma_)
+        return buckets
+
+
+class SemanticAnalysis:
+    """All semantic views of one text, computed from a single spaCy parse."""
+    
+    def __init__(
+        self,
+        service: SemanticService,
+        text: str,
+        profile: str = 'phrases',
+        previous: Optional[Dict] = None
+    ):
+        self.service = service
+        self.text = text
+        self.profile = profile
+        self.previous = previous
+        self.parseable = bool(service.nlp and text)
+        self.paragraphs = split_paragraphs(text) if text else []
+        # Docs re-parsed for views needing components self.profile skips, by profile
+        self._extra_docs = {}
+    
+    @cached_property
+    def docs(self) -> List:
+        """One spaCy Doc per paragraph, parsed on first access only."""
+        if not self.parseable:
+            return []
+        return self.service.parse_paragraphs([paragraph for _, paragraph in self.paragraphs], self.profile)
+    
+    @property
+    def tokens(self) -> Iterable:
+        """Every spaCy token of the text, paragraph by paragraph."""
+        return chain.from_iterable(self.docs)
+    
+    def source_profile(self, needs: str) -> str:
+        """
+        Profile a view needing the components of profile needs is computed with.
+        
+        That is this analysis' own profile when it runs everything needs does,
+        otherwise needs itself (and the text is parsed again for that view).
+        """
+        if set(PIPELINE_PROFILES[self.profile]) <= set(PIPELINE_PROFILES[needs]):
+            return self.profile
+        return needs
+    
+    def docs_for(self, needs: str) -> List:
+        """Docs parsed with at least the components profile needs runs."""
+        source = self.source_profile(needs)
+        if source == self.profile:
+            return self.docs
+        if source not in self._extra_docs:
+            self._extra_docs[source] = self.service.parse_paragraphs(
+                [paragraph for _, paragraph in self.paragraphs], source
+            )
+        return self._extra_docs[source]
+    
+    def tokens_for(self, needs: str) -> Iterable:
+        return chain.from_iterable(self.docs_for(needs))
+    
+    def cached(self, namespace: str, compute, needs: str = 'phrases'):
+        """
+        Serve one view of this text from semantic_cache, computing it on a miss.
+        
+        The key names the components the view's parse skipped, so a view
+        computed without e.g. the parser is never served to a caller that
+        expects it to have run.
+        """
+        if not self.parseable:
+            return compute()
+        skipped = '+'.join(sorted(PIPELINE_PROFILES[self.source_profile(needs)])) or 'none'
+        return semantic_cache.get_or_compute(
+            f"{namespace}:skip={skipped}", self.text, self.service.model_id, SEMANTIC_SCHEMA_VERSION, compute
+        )
+    
+    @cached_property
+    def semantic_bits(self) -> Dict:
+        if not self.parseable:
+            return self.service._empty_bits(self.text if self.service.nlp else None)
+        return self.cached('bits', self._build_semantic_bits)
+    
+    def _build_semantic_bits(self) -> Dict:
+        # Noun chunks need the parser: only reuse Docs parsed with it on
+        if 'docs' in self.__dict__ and self.source_profile('phrases') == self.profile:
+            segments = [self.service._segment_from_doc(doc) for doc in self.docs]
+        else:
+            paragraphs = [paragraph for _, paragraph in self.paragraphs]
+            reusable = self.service._stored_segments(self.previous, map(text_hash, paragraphs))
+            segments = self.service._segment_stream(paragraphs, reusable=reusable)
+        return self.service._merge_segments(self.text, self.paragraphs, segments)
+    
+    @property
+    def highlight_spans(self) -> List[Dict]:
+        """Non-whitespace tokens with their character offset and phrase membership."""
+        return [token for token in semantic_tokens(self.semantic_bits) if not token['text'].isspace()]
+    
+    @cached_property
+    def highlighted_html(self) -> str:
+        return render_highlighted_html(self.text, semantic_tokens(self.semantic_bits))
+    
+    @cached_property
+    def class_only_html(self) -> str:
+        return render_highlighted_html(self.text, semantic_tokens(self.semantic_bits), inline_styles=False)
+    
+    @cached_property
+    def relationships(self) -> List[Dict]:
+        if not self.parseable:
+            return []
+        return self.cached(
+            'relations',
+            lambda: self.service._relationships_from_tokens(self.tokens_for('relations')),
+            needs='relations'
+        )
+    
+    @cached_property
+    def density(self) -> Dict:
+        if not self.parseable:
+            return {'density': 0, 'content_words': 0, 'total_words': 0}
+        if 'semantic_bits' in self.__dict__:
+            stats = self.semantic_bits['stats']
+            return {
+                'density': stats['density'],
+                'content_words': stats['content_words'],
+                'total_words': stats['total_words']
+            }
+        return self.cached(
+            'density',
+            lambda: self.service._density_from_tokens(self.tokens_for('density')),
+            needs='density'
+        )
+    
+    @cached_property
+    def pos_buckets(self) -> Dict[str, List[str]]:
+        """Lemmas of the non-punctuation tokens grouped by coarse POS tag."""
+        if not self.parseable:
+            return {}
+        return self.cached(
+            'pos',
+            lambda: self.service._pos_buckets_from_tokens(self.tokens_for('pos')),
+            needs='pos'
+        )
+    
+    @property
+    def stats(self) -> Dict:
+        """Counts for the detail page stats panel."""
+        return self.semantic_bits.get('stats', {})
 
 
 # Singleton instance
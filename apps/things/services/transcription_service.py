@@ -0,0 +1,247 @@
+"""
+Segmented, concurrent and resumable transcription of voice recordings.
+
+A recording is cut into segments of TRANSCRIPTION['SEGMENT_SECONDS'] that
+overlap by OVERLAP_SECONDS, so a word cut at a boundary is heard whole by
+one of them. Segments are sent to Whisper (or whichever AI provider is
+configured, see ai_providers) concurrently, at most WORKERS at a time, and
+every result is saved to its TranscriptionSegment row as it arrives: a
+failed run leaves the finished segments in place and the retried task only
+redoes the rest. The texts are then stitched back together, dropping the
+words repeated by the overlap.
+
+Cutting needs the length of the recording: WAV files are read with the
+standard library, anything else with ffprobe/ffmpeg when installed.
+Without them a recording is transcribed as a single segment, as before.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import as_completed
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from ..models import TranscriptionSegment
+from .ai_providers import get_provider
+from .openai_client import OpenAIError
+
+logger = logging.getLogger(__name__)
+
+# Longest run of words searched for when removing overlap between segments
+MAX_OVERLAP_WORDS = 40
+WORD_PATTERN = re.compile(r"[\w']+")
+
+
+class TranscriptionIncomplete(Exception):
+    """Some segments failed; finished ones are kept for the next attempt."""
+
+
+def audio_duration(path: str) -> Optional[float]:
+    """Length of a recording in seconds, or None if it cannot be determined."""
+    try:
+        with wave.open(path, 'rb') as audio:
+            return audio.getnframes() / audio.getframerate()
+    except (wave.Error, EOFError, OSError):
+        pass
+    
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=60, check=True
+        )
+        return float(result.stdout.strip())
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+
+
+def cut_segment(path: str, start: float, end: float, dest: str) -> bool:
+    """Write [start, end) seconds of a recording to dest as WAV; False if it cannot be cut."""
+    try:
+        with wave.open(path, 'rb') as source:
+            rate = source.getframerate()
+            source.setpos(min(int(start * rate), source.getnframes()))
+            frames = source.readframes(int((end - start) * rate))
+            with wave.open(dest, 'wb') as target:
+                target.setparams(source.getparams())
+                target.writeframes(frames)
+        return True
+    except (wave.Error, EOFError, OSError):
+        pass
+    
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return False
+    try:
+        # Mono 16 kHz is all Whisper uses and keeps segments well under the upload limit
+        subprocess.run(
+            [ffmpeg, '-v', 'error', '-y', '-ss', str(start), '-t', str(end - start),
+             '-i', path, '-ac', '1', '-ar', '16000', dest],
+            capture_output=True, timeout=300, check=True
+        )
+        return True
+    except (subprocess.SubprocessError, OSError):
+        return False
+
+
+def stitch(texts: List[str]) -> str:
+    """Join segment transcripts, dropping words the next segment repeats from the overlap."""
+    words: List[str] = []
+    for text in texts:
+        following = text.split()
+        if not following:
+            continue
+        tail = [_normalize(word) for word in words[-MAX_OVERLAP_WORDS:]]
+        head = [_normalize(word) for word in following[:MAX_OVERLAP_WORDS]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            # A single repeated word is too likely to be a coincidence
+            if size >= 2 and tail[-size:] == head[:size]:
+                overlap = size
+                break
+        words.extend(following[overlap:])
+    return ' '.join(words)
+
+
+def _normalize(word: str) -> str:
+    return ''.join(WORD_PATTERN.findall(word.lower()))
+
+
+class TranscriptionPipeline:
+    """Transcribes voice recordings segment by segment."""
+    
+    @property
+    def config(self) -> Dict:
+        return settings.TRANSCRIPTION
+    
+    def plan(self, duration: Optional[float]) -> List[Tuple[float, Optional[float]]]:
+        """(start, end) seconds of each segment; a single open-ended one if not worth cutting."""
+        length = self.config['SEGMENT_SECONDS']
+        overlap = self.config['OVERLAP_SECONDS']
+        if duration is None or duration <= length + overlap:
+            return [(0.0, None)]
+        
+        segments = []
+        start = 0.0
+        # A segment starting inside the previous one's overlap would hear nothing new
+        while start + overlap < duration:
+            segments.append((start, min(start + length + overlap, duration)))
+            start += length
+        return segments
+    
+    def transcribe(self, thing) -> Optional[str]:
+        """
+        Transcribe a thing's recording, resuming from any finished segments.
+        
+        Returns:
+            The stitched transcript, or None if transcription is unavailable
+        
+        Raises:
+            TranscriptionIncomplete: if any segment failed (retry to resume)
+        """
+        if not get_provider().available:
+            return None
+        
+        path = thing.voice_recording.path
+        source_key = hashlib.sha256(
+            f"{thing.voice_recording.name}:{os.path.getsize(path)}".encode('utf-8')
+        ).hexdigest()
+        duration = audio_duration(path)
+        
+        segments = list(thing.transcription_segments.order_by('index'))
+        if any(segment.source_key != source_key for segment in segments):
+            # The recording was replaced; earlier segments describe other audio
+            thing.transcription_segments.all().delete()
+            segments = []
+        if not segments:
+            segments = TranscriptionSegment.objects.bulk_create([
+                TranscriptionSegment(
+                    thing=thing, index=i, start_seconds=start, end_seconds=end, source_key=source_key
+                )
+                for i, (start, end) in enumerate(self.plan(duration))
+            ])
+        
+        todo = [segment for segment in segments if segment.status != 'done']
+        if todo:
+            self._transcribe_segments(path, todo, duration)
+        
+        failed = [segment for segment in segments if segment.status != 'done']
+        if failed:
+            raise TranscriptionIncomplete(
+                f"{len(failed)} of {len(segments)} segments failed: {failed[0].error}"
+            )
+        return stitch([segment.text for segment in segments])
+    
+    def progress(self, thing) -> Dict:
+        """Segment counts of a thing's transcription, for polling."""
+        counts = dict(
+            thing.transcription_segments.values_list('status').annotate(count=Count('id'))
+        )
+        total = sum(counts.values())
+        done = counts.get('done', 0)
+        return {
+            'total': total,
+            'done': done,
+            'failed': counts.get('failed', 0),
+            'pending': counts.get('pending', 0),
+            'percent': round(100 * done / total) if total else 0,
+            'complete': bool(total) and done == total,
+        }
+    
+    def _transcribe_segments(
+        self,
+        path: str,
+        segments: List[TranscriptionSegment],
+        duration: Optional[float]
+    ) -> None:
+        provider = get_provider()
+        semaphore = asyncio.Semaphore(max(self.config['WORKERS'], 1))
+        
+        async def limited(audio_path, audio_seconds):
+            async with semaphore:
+                return await provider.transcribe(audio_path, model="whisper-1", audio_seconds=audio_seconds)
+        
+        with tempfile.TemporaryDirectory(prefix='transcription-') as workdir:
+            futures = {}
+            for segment in segments:
+                audio_path = path
+                if segment.end_seconds is not None:
+                    audio_path = os.path.join(workdir, f"segment-{segment.index}.wav")
+                    if not cut_segment(path, segment.start_seconds, segment.end_seconds, audio_path):
+                        self._finish(segment, error='Could not cut segment from recording')
+                        continue
+                # Billed length: the whole recording when it is sent uncut
+                end = segment.end_seconds if segment.end_seconds is not None else duration
+                audio_seconds = end - segment.start_seconds if end is not None else None
+                futures[provider.submit(limited(audio_path, audio_seconds))] = segment
+            
+            # Saved as they arrive, so progress advances and a crash loses nothing finished
+            for future in as_completed(futures):
+                segment = futures[future]
+                try:
+                    self._finish(segment, text=future.result())
+                except (OpenAIError, OSError) as e:
+                    logger.warning(f"Transcription segment {segment.index} of {segment.thing_id} failed: {e}")
+                    self._finish(segment, error=str(e))
+    
+    def _finish(self, segment: TranscriptionSegment, text: Optional[str] = None, error: str = '') -> None:
+        segment.attempts += 1
+        segment.status = 'failed' if error else 'done'
+        segment.text = (text or '').strip()
+        segment.error = error
+        segment.save(update_fields=['attempts', 'status', 'text', 'error', 'updated_at'])
+
+
+# Singleton instance
+transcription_pipeline = TranscriptionPipeline()
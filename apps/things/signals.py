@@ -1,7 +1,11 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from .models import Thing
+from .services.lemma_index import lemma_index
+from .services.relation_store import relation_store
+from .services.semantic_rollups import semantic_rollups
 from .services.search_service import algolia_search
+from .tasks import enqueue_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,38 +25,95 @@ def track_privacy_change(sender, instance, **kwargs):
         instance._privacy_changed = False
 
 
+@receiver(pre_save, sender=Thing)
+def track_semantic_rollup(sender, instance, update_fields=None, **kwargs):
+    """Remember a thing's stored contribution to the weekly rollups before it changes."""
+    if update_fields is not None and not {'semantic_bits', 'thing_date'} & set(update_fields):
+        return
+    if instance._state.adding:
+        instance._old_rollup = None
+    else:
+        instance._old_rollup = semantic_rollups.stored_contributions([instance.pk]).get(str(instance.pk))
+
+
+def _semantic_bits_version(semantic_bits):
+    """(text hash, schema version) identifying an analysis, or None if it carries neither."""
+    semantic_bits = semantic_bits or {}
+    version = (semantic_bits.get('text_hash'), semantic_bits.get('version'))
+    return version if version != (None, None) else None
+
+
+@receiver(pre_save, sender=Thing)
+def track_semantic_bits_change(sender, instance, update_fields=None, **kwargs):
+    """Note whether a save writes a different analysis than the stored one."""
+    instance._semantic_bits_changed = False
+    if update_fields is not None and 'semantic_bits' not in update_fields:
+        return
+    if not instance.semantic_bits:
+        # Nothing to index, unless this clears a stored analysis
+        instance._semantic_bits_changed = (
+            not instance._state.adding
+            and Thing.objects.filter(pk=instance.pk).exclude(semantic_bits={}).exists()
+        )
+        return
+    
+    version = _semantic_bits_version(instance.semantic_bits)
+    if instance._state.adding or version is None:
+        instance._semantic_bits_changed = True
+        return
+    stored = Thing.objects.filter(pk=instance.pk).values_list(
+        'semantic_bits__text_hash', 'semantic_bits__version'
+    ).first()
+    instance._semantic_bits_changed = stored is None or tuple(stored) != version
+
+
 @receiver(post_save, sender=Thing)
 def update_thing_in_algolia(sender, instance, created, **kwargs):
-    """Update thing in Algolia when saved."""
+    """Queue an Algolia update for a saved thing."""
     if not algolia_search.enabled:
         return
     
-    try:
-        # If thing is community, add/update in Algolia
-        if instance.privacy_level == 'community':
-            algolia_search.update_thing_index(instance)
-            logger.info(f"Thing {str(instance.id)} indexed in Algolia")
-        
-        # If privacy changed from community to something else, remove from Algolia
-        elif hasattr(instance, '_privacy_changed') and instance._privacy_changed:
-            if hasattr(instance, '_old_privacy') and instance._old_privacy == 'community':
-                algolia_search.remove_thing_from_index(instance)
-                logger.info(f"Thing {str(instance.id)} removed from Algolia (no longer community)")
-    except Exception as e:
-        logger.error(f"Error updating Algolia index for thing {str(instance.id)}: {e}")
-        # Don't let Algolia errors prevent saving the thing
+    # If thing is community, add/update in Algolia
+    if instance.privacy_level == 'community':
+        enqueue_index(instance)
+    
+    # If privacy changed from community to something else, remove from Algolia
+    elif hasattr(instance, '_privacy_changed') and instance._privacy_changed:
+        if hasattr(instance, '_old_privacy') and instance._old_privacy == 'community':
+            enqueue_index(instance, remove=True)
+
+
+@receiver(post_save, sender=Thing)
+def update_semantic_indexes(sender, instance, update_fields=None, **kwargs):
+    """Re-index a thing's lemmas and relations when a save changed its semantic_bits."""
+    # Analysis written with queryset updates (tasks, backfill) syncs the index itself
+    if not getattr(instance, '_semantic_bits_changed', False):
+        return
+    instance._semantic_bits_changed = False
+    lemma_index.sync(instance)
+    relation_store.sync(instance)
+
+
+@receiver(post_save, sender=Thing)
+def update_semantic_rollup(sender, instance, **kwargs):
+    """Move a saved thing's contribution to the weekly rollups from its old to its new value."""
+    if not hasattr(instance, '_old_rollup'):
+        return
+    semantic_rollups.record(instance._old_rollup, semantic_rollups.contribution_of(instance))
+    del instance._old_rollup
+
+
+@receiver(post_delete, sender=Thing)
+def remove_thing_from_rollup(sender, instance, **kwargs):
+    """Subtract a deleted thing from the weekly rollups."""
+    semantic_rollups.record(semantic_rollups.contribution_of(instance), None)
 
 
 @receiver(post_delete, sender=Thing)
 def remove_thing_from_algolia(sender, instance, **kwargs):
-    """Remove thing from Algolia when deleted."""
+    """Queue removal of a deleted thing from Algolia."""
     if not algolia_search.enabled:
         return
     
-    try:
-        if instance.privacy_level == 'community':
-            algolia_search.remove_thing_from_index(instance)
-            logger.info(f"Thing {str(instance.id)} removed from Algolia (deleted)")
-    except Exception as e:
-        logger.error(f"Error removing thing {str(instance.id)} from Algolia: {e}")
-        # Don't let Algolia errors prevent deleting the thing
\ No newline at end of file
+    if instance.privacy_level == 'community':
+        enqueue_index(instance, remove=True)
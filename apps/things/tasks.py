@@ -0,0 +1,213 @@
+"""
+Background task handlers for things (see apps.tasks).
+
+Views save the thing and enqueue these instead of calling OpenAI, Whisper,
+spaCy or Algolia inline. Every handler takes the thing id rather than the
+thing itself and reloads it, so it acts on the latest saved state.
+"""
+import logging
+from datetime import timedelta
+from typing import List
+
+from apps.tasks.models import Task
+from apps.tasks.services.task_queue import task_queue
+from .models import Thing
+from .services.ai_metrics import attribute_ai_calls
+from .services.ai_service import ai_service
+from .services.related_service import related_service
+from .services.search_service import algolia_search
+from .services.semantic_service import semantic_service
+from .services.transcription_service import transcription_pipeline
+
+logger = logging.getLogger(__name__)
+
+ANALYZE_AI = 'things.analyze_ai'
+ANALYZE_SEMANTICS = 'things.analyze_semantics'
+TRANSCRIBE = 'things.transcribe'
+INDEX = 'things.index'
+UPDATE_RELATED = 'things.update_related'
+
+# Merged waiting tasks keep the earliest run_after, so this bounds the wait
+RELATED_DEBOUNCE = timedelta(seconds=30)
+
+# Tasks whose results the owner waits for on the detail page; indexing and
+# related-things refreshes happen in the background without a banner
+USER_FACING_TASKS = (ANALYZE_AI, ANALYZE_SEMANTICS, TRANSCRIBE)
+
+
+def enqueue_semantics(thing) -> Task:
+    """Queue spaCy analysis of a saved thing's description."""
+    key = str(thing.pk)
+    return task_queue.enqueue(ANALYZE_SEMANTICS, {'thing_id': key}, user=thing.user, key=key)
+
+
+def enqueue_analysis(thing, source: str = 'description') -> List[Task]:
+    """Queue AI and semantic analysis of a saved thing; returns the queued tasks."""
+    key = str(thing.pk)
+    return [
+        task_queue.enqueue(ANALYZE_AI, {'thing_id': key, 'source': source}, user=thing.user, key=key),
+        enqueue_semantics(thing),
+    ]
+
+
+def enqueue_transcription(thing, use_as_description: bool = False) -> Task:
+    """
+    Queue Whisper transcription of a thing's voice recording.
+    
+    Analysis follows it: of the transcription, or of the description if
+    the recording yields no text or transcription fails for good.
+    """
+    key = str(thing.pk)
+    return task_queue.enqueue(
+        TRANSCRIBE,
+        {'thing_id': key, 'use_as_description': use_as_description},
+        user=thing.user,
+        key=key
+    )
+
+
+def enqueue_index(thing, remove: bool = False) -> Task:
+    """Queue adding/updating (or removing) a thing in the Algolia index."""
+    key = str(thing.pk)
+    # Not attributed to the user: the row may be deleted before the task runs
+    return task_queue.enqueue(INDEX, {'thing_id': key, 'remove': remove}, key=key)
+
+
+def enqueue_related(thing) -> Task:
+    """
+    Queue a refresh of the related things affected by a change to thing.
+    
+    The refresh waits RELATED_DEBOUNCE so that the AI and semantic analyses
+    of one save, and bursts of edits, are handled by one update.
+    """
+    key = str(thing.pk)
+    delay = None if task_queue.eager else RELATED_DEBOUNCE
+    return task_queue.enqueue(UPDATE_RELATED, {'thing_id': key}, user=thing.user, key=key, delay=delay)
+
+
+def active_tasks(thing):
+    """User-facing tasks for this thing that have not finished yet."""
+    return Task.objects.filter(
+        key=str(thing.pk),
+        name__in=USER_FACING_TASKS,
+        status__in=Task.ACTIVE_STATUSES
+    )
+
+
+@task_queue.register(ANALYZE_AI)
+def analyze_ai(thing_id: str, source: str = 'description'):
+    thing = Thing.objects.filter(pk=thing_id).first()
+    if thing is None:
+        return {'skipped': 'thing deleted'}
+    
+    thing_text = getattr(thing, source, '') or thing.description
+    if not thing_text:
+        return {'skipped': 'no text'}
+    
+    with attribute_ai_calls(thing.user_id):
+        analysis = ai_service.analyze_thing(thing_text)
+    thing.themes = analysis.get('themes', [])
+    thing.symbols = analysis.get('symbols', [])
+    thing.entities = analysis.get('entities', [])
+    # A regular save so the search index picks up the new themes and symbols
+    thing.save(update_fields=['themes', 'symbols', 'entities', 'updated_at'])
+    enqueue_related(thing)
+    
+    return {
+        'themes': len(thing.themes),
+        'symbols': len(thing.symbols),
+        'entities': len(thing.entities),
+    }
+
+
+@task_queue.register(ANALYZE_SEMANTICS)
+def analyze_semantics(thing_id: str):
+    thing = Thing.objects.filter(pk=thing_id).first()
+    if thing is None:
+        return {'skipped': 'thing deleted'}
+    
+    text = thing.description
+    if not text:
+        return {'skipped': 'no text'}
+    if semantic_service.has_current_analysis(thing.semantic_bits, text):
+        return {'skipped': 'analysis is current'}
+    if not semantic_service.is_available():
+        # The detail page re-analyzes stale rows once the model is installed
+        return {'skipped': 'spaCy unavailable'}
+    
+    semantic_analysis = semantic_service.extract_semantic_bits(text, previous=thing.semantic_bits)
+    semantic_service.save_thing_analysis(thing, semantic_analysis)
+    enqueue_related(thing)
+    
+    return {
+        'verb_phrases': len(thing.semantic_verbs),
+        'noun_phrases': len(thing.semantic_nouns),
+    }
+
+
+def analyze_without_transcription(thing_id: str, use_as_description: bool = False) -> List[Task]:
+    """Queue analysis of the description of a thing whose recording gave no transcription."""
+    thing = Thing.objects.filter(pk=thing_id).first()
+    if thing is None or not thing.description:
+        return []
+    logger.info(f"Thing {thing_id} has no transcription; analyzing its description")
+    return enqueue_analysis(thing)
+
+
+@task_queue.register(TRANSCRIBE, on_failure=analyze_without_transcription)
+def transcribe(thing_id: str, use_as_description: bool = False):
+    thing = Thing.objects.filter(pk=thing_id).first()
+    if thing is None:
+        return {'skipped': 'thing deleted'}
+    if not thing.voice_recording:
+        analyze_without_transcription(thing_id)
+        return {'skipped': 'no recording'}
+    
+    # Raises if a segment failed; the retried task resumes from the finished ones
+    with attribute_ai_calls(thing.user_id):
+        transcription = transcription_pipeline.transcribe(thing)
+    if not transcription:
+        analysis_tasks = analyze_without_transcription(thing_id)
+        return {
+            'transcribed': False,
+            'tasks': [str(task.pk) for task in analysis_tasks],
+        }
+    
+    thing.transcription = transcription
+    update_fields = ['transcription', 'updated_at']
+    if use_as_description:
+        thing.description = transcription
+        update_fields.append('description')
+    thing.save(update_fields=update_fields)
+    
+    analysis_tasks = enqueue_analysis(thing, source='transcription')
+    return {
+        'transcribed': True,
+        'characters': len(transcription),
+        'tasks': [str(task.pk) for task in analysis_tasks],
+    }
+
+
+@task_queue.register(INDEX)
+def index(thing_id: str, remove: bool = False):
+    if remove:
+        # The row may already be deleted; the index only needs the object id
+        algolia_search.remove_thing_from_index(Thing(pk=thing_id))
+        logger.info(f"Thing {thing_id} removed from Algolia")
+        return {'removed': True}
+    
+    thing = Thing.objects.filter(pk=thing_id).first()
+    if thing is None or thing.privacy_level != 'community':
+        return {'skipped': 'not community'}
+    
+    algolia_search.update_thing_index(thing)
+    logger.info(f"Thing {thing_id} indexed in Algolia")
+    return {'indexed': True}
+
+
+@task_queue.register(UPDATE_RELATED)
+def update_related(thing_id: str):
+    thing = Thing.objects.filter(pk=thing_id).only('id', 'user_id').first()
+    if thing is None:
+        return {'skipped': 'thing deleted'}
+    return related_service.update(thing)
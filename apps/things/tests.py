@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import asyncio
+import json
+import re
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import spacy
+from aiohttp import web
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from spacy.language import Language
+
+from apps.tasks.models import Task
+from .benchmarks.ai_standin import StandInServer
+from .models import (
+    AICallRecord, AIResultCache, RelatedThing, SemanticRelation, SemanticWeeklyRollup, Thing
+)
+from .services.ai_cache import ai_cache
+from .services.ai_metrics import AIMetrics, attribute_ai_calls
+from .services import ai_providers
+from .services.ai_providers import (
+    AIProvider, DisabledProvider, OpenAIProvider, StandInProvider, get_provider
+)
+from .services.ai_service import (
+    BATCH_ANALYSIS_PROMPT, PATTERN_MAP_PROMPT, PATTERN_REDUCE_PROMPT, ai_service
+)
+from .services.openai_client import AsyncOpenAIClient, OpenAIError
+from .services.lemma_index import lemma_index
+from .services.related_service import RelatedThingsService
+from .services.relation_store import relation_store
+from .services.semantic_cache import MISSING, semantic_cache
+from .services.semantic_encoding import (
+    concat_tokens, decode_tokens, encode_tokens, semantic_tokens, split_tokens
+)
+from .services.semantic_rollups import semantic_rollups
+from .services.semantic_service import SemanticService, semantic_service, text_hash
+from .services.transcription_service import TranscriptionPipeline, stitch
+from .tasks import (
+    ANALYZE_AI, ANALYZE_SEMANTICS, INDEX, TRANSCRIBE, UPDATE_RELATED, active_tasks
+)
+
+VERBS = {'ran', 'flew', 'saw', 'opened', 'found', 'walked', 'fell'}
+ADVERBS = {'quickly', 'slowly', 'not', 'again'}
+DETERMINERS = {'the', 'a', 'an', 'my'}
+PRONOUNS = {'i', 'he', 'she', 'we', 'they', 'it'}
+ADJECTIVES = {'blue', 'dark', 'old', 'big'}
+
+
+@Language.component('things_test_parser')
+def rule_parser(doc):
+    """Tags from small word lists; every word depends on the nearest verb."""
+    for token in doc:
+        word = token.text.lower()
+        if token.is_space:
+            token.pos_, token.tag_ = 'SPACE', '_SP'
+        elif token.is_punct:
+            token.pos_, token.tag_ = 'PUNCT', '.'
+        elif word in VERBS:
+            token.pos_, token.tag_ = 'VERB', 'VBD'
+        elif word in ADVERBS:
+            token.pos_, token.tag_ = 'ADV', 'RB'
+        elif word in DETERMINERS:
+            token.pos_, token.tag_ = 'DET', 'DT'
+        elif word in PRONOUNS:
+            token.pos_, token.tag_ = 'PRON', 'PRP'
+        elif word in ADJECTIVES:
+            token.pos_, token.tag_ = 'ADJ', 'JJ'
+        else:
+            token.pos_, token.tag_ = 'NOUN', 'NN'
+        token.lemma_ = word.rstrip('s') if token.pos_ == 'NOUN' else word
+    
+    verbs = [token.i for token in doc if token.pos_ == 'VERB']
+    for token in doc:
+        if not verbs or token.pos_ == 'VERB':
+            token.head = token
+            token.dep_ = 'ROOT'
+            continue
+        verb = min(verbs, key=lambda i: abs(i - token.i))
+        token.head = doc[verb]
+        if token.pos_ in ('NOUN', 'PRON'):
+            token.dep_ = 'nsubj' if token.i < verb else 'dobj'
+        elif token.pos_ == 'ADV':
+            token.dep_ = 'advmod'
+        elif token.pos_ == 'DET':
+            token.dep_ = 'det'
+        elif token.pos_ == 'ADJ':
+            token.dep_ = 'amod'
+        else:
+            token.dep_ = 'dep'
+    return doc
+
+
+def build_nlp():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('things_test_parser')
+    return nlp
+
+
+PARAGRAPHS = [
+    'I walked slowly to the old house.',
+    'She saw a blue bird and it flew again.',
+    'The dark water fell on my hands.',
+    'We opened the big doors quickly.',
+]
+
+
+class IncrementalAnalysisTests(SimpleTestCase):
+    """Re-analysis that reuses unchanged paragraphs must match a full analysis."""
+    
+    def setUp(self):
+        self.nlp = build_nlp()
+        self.service = SemanticService()
+        patcher = mock.patch.object(SemanticService, 'nlp', new_callable=mock.PropertyMock, return_value=self.nlp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bypass = semantic_cache.bypass()
+        bypass.__enter__()
+        self.addCleanup(bypass.__exit__, None, None, None)
+        self.parsed = []
+        pipe = self.nlp.pipe
+        
+        def counting_pipe(texts, **kwargs):
+            for doc in pipe(texts, **kwargs):
+                self.parsed.append(doc.text)
+                yield doc
+        
+        patcher = mock.patch.object(self.nlp, 'pipe', side_effect=counting_pipe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def analyze(self, paragraphs, previous=None):
+        self.parsed = []
+        return self.service.extract_semantic_bits('\n\n'.join(paragraphs), previous=previous)
+    
+    def assert_incremental_matches_full(self, before, after):
+        previous = self.analyze(before)
+        incremental = self.analyze(after, previous=previous)
+        parsed = self.parsed
+        full = self.analyze(after)
+        
+        self.assertEqual(incremental, full)
+        self.assertEqual(sorted(parsed), sorted(set(after) - set(before)))
+        self.assert_offsets_match('\n\n'.join(after), incremental)
+        return incremental
+    
+    def assert_offsets_match(self, text, semantic_bits):
+        tokens = semantic_tokens(semantic_bits)
+        self.assertTrue(tokens)
+        for token in tokens:
+            self.assertEqual(text[token['idx']:token['idx'] + len(token['text'])], token['text'])
+        
+        for phrase in semantic_bits['noun_phrases']:
+            first, last = tokens[phrase['start']], tokens[phrase['end'] - 1]
+            self.assertEqual(text[first['idx']:last['idx'] + len(last['text'])], phrase['text'])
+        
+        for entry in semantic_bits['segments']:
+            paragraph = text[entry['start']:].split('\n\n', 1)[0]
+            self.assertEqual(entry['hash'], text_hash(paragraph))
+    
+    def test_full_analysis_offsets(self):
+        self.assert_offsets_match('\n\n'.join(PARAGRAPHS), self.analyze(PARAGRAPHS))
+    
+    def test_insert_paragraph(self):
+        after = PARAGRAPHS[:2] + ['They found an old bird.'] + PARAGRAPHS[2:]
+        self.assert_incremental_matches_full(PARAGRAPHS, after)
+    
+    def test_append_paragraph(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS + ['It fell.'])
+    
+    def test_delete_paragraph(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS[:1] + PARAGRAPHS[2:])
+    
+    def test_delete_first_paragraph(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS[1:])
+    
+    def test_edit_paragraph(self):
+        after = list(PARAGRAPHS)
+        after[1] = 'She saw a dark bird and it flew slowly.'
+        self.assert_incremental_matches_full(PARAGRAPHS, after)
+    
+    def test_reorder_paragraphs(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS[::-1])
+    
+    def test_repeated_paragraph(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS + PARAGRAPHS[:1])
+    
+    def test_unchanged_text_is_not_parsed(self):
+        self.assert_incremental_matches_full(PARAGRAPHS, PARAGRAPHS)
+    
+    def test_previous_analysis_of_other_schema_is_ignored(self):
+        previous = dict(self.analyze(PARAGRAPHS), version=0)
+        self.assertEqual(self.analyze(PARAGRAPHS, previous=previous), self.analyze(PARAGRAPHS))
+        self.assertEqual(len(self.parsed), len(PARAGRAPHS))
+
+
+class TokenEncodingTests(SimpleTestCase):
+    """split_tokens and concat_tokens are inverses, including character offsets."""
+    
+    def setUp(self):
+        self.text = '\n\n'.join(PARAGRAPHS)
+        doc = build_nlp()(self.text)
+        self.tokens = [
+            {
+                'text': token.text,
+                'idx': token.idx,
+                'pos': token.pos_,
+                'tag': token.tag_,
+                'lemma': token.lemma_,
+                'is_stop': token.is_stop,
+                'is_punct': token.is_punct,
+                'phrase': 'verb' if token.pos_ == 'VERB' else 'noun' if token.pos_ == 'NOUN' else None,
+            }
+            for token in doc
+        ]
+        self.columns = encode_tokens(self.tokens)
+    
+    def test_encode_round_trip(self):
+        self.assertEqual(decode_tokens(self.columns), self.tokens)
+    
+    def test_split_then_concat_round_trip(self):
+        cuts = [0, 5, 6, 17, len(self.tokens)]
+        ranges = [(start, end, self.tokens[start]['idx']) for start, end in zip(cuts, cuts[1:])]
+        parts = split_tokens(self.columns, ranges)
+        
+        for part, (start, end, shift) in zip(parts, ranges):
+            # Same as encoding the part's tokens on their own, code tables included
+            self.assertEqual(
+                part,
+                encode_tokens([dict(token, idx=token['idx'] - shift) for token in self.tokens[start:end]])
+            )
+            self.assertEqual(part['idx'][0], 0)
+            for token in decode_tokens(part):
+                self.assertEqual(
+                    self.text[shift + token['idx']:shift + token['idx'] + len(token['text'])],
+                    token['text']
+                )
+        
+        joined = concat_tokens(zip(parts, [shift for _, _, shift in ranges]))
+        self.assertEqual(decode_tokens(joined), self.tokens)
+    
+    def test_split_empty_range(self):
+        part, = split_tokens(self.columns, [(3, 3, 0)])
+        self.assertEqual(decode_tokens(part), [])
+
+
+def analysis(words, content_words, verbs=1, nouns=1, adjectives=0):
+    """Stored semantic bits carrying just the stats the rollups read."""
+    return {
+        'verb_phrases': [],
+        'noun_phrases': [],
+        'relations': [],
+        'tokens': [],
+        'stats': {
+            'total_tokens': words + 1,
+            'total_words': words,
+            'content_words': content_words,
+            'density': round(content_words / words, 2),
+            'verb_count': verbs,
+            'noun_count': nouns,
+            'adjective_count': adjectives,
+        },
+    }
+
+
+class SemanticRollupTests(TestCase):
+    """Rollups maintained as deltas must equal a rebuild from the stored analyses."""
+    
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.thing = Thing.objects.create(
+            user=self.alice,
+            description='I walked to the house.',
+            thing_date=date(2024, 3, 6),
+            semantic_bits=analysis(10, 4)
+        )
+        Thing.objects.create(
+            user=self.alice,
+            description='She saw a bird.',
+            thing_date=date(2024, 3, 4),
+            semantic_bits=analysis(6, 3, adjectives=1)
+        )
+        Thing.objects.create(user=self.alice, description='Not analyzed yet.', thing_date=date(2024, 3, 5))
+    
+    def rollups(self):
+        return sorted(
+            SemanticWeeklyRollup.objects.values_list(
+                'user_id', 'week_start', 'thing_count', 'total_tokens', 'total_words', 'content_words',
+                'verb_count', 'noun_count', 'adjective_count', 'density_sum'
+            )
+        )
+    
+    def assert_matches_rebuild(self):
+        maintained = self.rollups()
+        for user in (self.alice, self.bob):
+            semantic_rollups.rebuild(user.pk)
+        rebuilt = self.rollups()
+        self.assertEqual(
+            [row[:-1] for row in maintained],
+            [row[:-1] for row in rebuilt]
+        )
+        for row, expected in zip(maintained, rebuilt):
+            self.assertAlmostEqual(row[-1], expected[-1])
+        return rebuilt
+    
+    def test_create(self):
+        rows = self.assert_matches_rebuild()
+        self.assertEqual(len(rows), 1)
+        week, thing_count, _, total_words, content_words = rows[0][1:6]
+        self.assertEqual((week, thing_count, total_words, content_words), (date(2024, 3, 4), 2, 16, 7))
+    
+    def test_edit_with_save(self):
+        self.thing.semantic_bits = analysis(20, 12, verbs=3)
+        self.thing.save()
+        self.assert_matches_rebuild()
+    
+    def test_edit_with_save_thing_analysis(self):
+        semantic_service.save_thing_analysis(self.thing, analysis(20, 12, verbs=3))
+        self.assert_matches_rebuild()
+    
+    def test_edit_that_drops_the_analysis(self):
+        self.thing.semantic_bits = {}
+        self.thing.save(update_fields=['semantic_bits'])
+        self.assert_matches_rebuild()
+    
+    def test_unrelated_edit(self):
+        self.thing.title = 'A walk'
+        self.thing.save(update_fields=['title'])
+        self.assert_matches_rebuild()
+    
+    def test_move_to_another_week(self):
+        self.thing.thing_date = date(2024, 3, 12)
+        self.thing.save()
+        rows = self.assert_matches_rebuild()
+        self.assertEqual([row[1] for row in rows], [date(2024, 3, 4), date(2024, 3, 11)])
+    
+    def test_move_to_another_week_with_update_fields(self):
+        self.thing.thing_date = date(2023, 12, 31)
+        self.thing.save(update_fields=['thing_date'])
+        self.assert_matches_rebuild()
+    
+    def test_move_to_another_user(self):
+        self.thing.user = self.bob
+        self.thing.save()
+        rows = self.assert_matches_rebuild()
+        self.assertEqual({row[0] for row in rows}, {self.alice.pk, self.bob.pk})
+    
+    def test_delete(self):
+        self.thing.delete()
+        self.assert_matches_rebuild()
+    
+    def test_delete_last_thing_of_a_week(self):
+        self.thing.thing_date = date(2024, 1, 1)
+        self.thing.save()
+        self.thing.delete()
+        rows = self.assert_matches_rebuild()
+        self.assertNotIn(date(2024, 1, 1), [row[1] for row in rows])
+
+
+class ActiveTasksTests(TestCase):
+    """The detail page only waits for tasks whose results it shows."""
+    
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='alice')
+        self.thing = Thing.objects.create(user=self.user, description='I walked to the house.')
+        Task.objects.all().delete()
+        key = str(self.thing.pk)
+        self.analysis = Task.objects.create(name=ANALYZE_SEMANTICS, key=key, user=self.user)
+        self.transcription = Task.objects.create(
+            name=TRANSCRIBE, key=key, user=self.user, status=Task.STATUS_RUNNING
+        )
+        Task.objects.create(name=ANALYZE_AI, key=key, user=self.user, status=Task.STATUS_SUCCEEDED)
+        Task.objects.create(name=INDEX, key=key)
+        Task.objects.create(name=UPDATE_RELATED, key=key, user=self.user)
+    
+    def test_background_tasks_are_not_active(self):
+        self.assertEqual(
+            set(active_tasks(self.thing)),
+            {self.analysis, self.transcription}
+        )
+    
+    def test_detail_page_polls_only_user_facing_tasks(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('things:detail', args=[self.thing.pk]))
+        
+        self.assertEqual(
+            {task.pk for task in response.context['pending_tasks']},
+            {self.analysis.pk, self.transcription.pk}
+        )
+        self.assertTrue(response.context['transcription_running'])
+        for task in response.context['pending_tasks']:
+            self.assertEqual(self.client.get(reverse('tasks:status', args=[task.pk])).status_code, 200)
+    
+    def test_no_banner_while_only_background_tasks_wait(self):
+        Task.objects.filter(name__in=[ANALYZE_SEMANTICS, TRANSCRIBE]).update(status=Task.STATUS_SUCCEEDED)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('things:detail', args=[self.thing.pk]))
+        
+        self.assertEqual(response.context['pending_tasks'], [])
+        self.assertNotContains(response, 'id="pendingTasks"')
+
+
+@override_settings(TRANSCRIPTION={'SEGMENT_SECONDS': 120, 'OVERLAP_SECONDS': 2, 'WORKERS': 1})
+class TranscriptionPlanTests(SimpleTestCase):
+    """Segments cover the recording once, each overlapping the next by OVERLAP_SECONDS."""
+    
+    def setUp(self):
+        self.pipeline = TranscriptionPipeline()
+    
+    def assert_covers(self, duration, segments):
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], duration)
+        for (start, end), (next_start, next_end) in zip(segments, segments[1:]):
+            self.assertEqual(end - next_start, 2)
+            # Every segment hears audio the previous one did not
+            self.assertGreater(next_end, end)
+    
+    def test_unknown_or_short_recording_is_not_cut(self):
+        for duration in (None, 0, 60, 122):
+            self.assertEqual(self.pipeline.plan(duration), [(0.0, None)])
+    
+    def test_just_over_one_segment(self):
+        segments = self.pipeline.plan(122.5)
+        self.assertEqual(segments, [(0.0, 122.0), (120.0, 122.5)])
+        self.assert_covers(122.5, segments)
+    
+    def test_exact_multiple_of_segment_length(self):
+        segments = self.pipeline.plan(360)
+        self.assertEqual(segments, [(0.0, 122.0), (120.0, 242.0), (240.0, 360)])
+        self.assert_covers(360, segments)
+    
+    def test_remainder_inside_the_overlap(self):
+        for duration in (241, 242):
+            segments = self.pipeline.plan(duration)
+            self.assertEqual(segments, [(0.0, 122.0), (120.0, duration)])
+            self.assert_covers(duration, segments)
+    
+    def test_remainder_just_past_the_overlap(self):
+        segments = self.pipeline.plan(242.5)
+        self.assertEqual(segments, [(0.0, 122.0), (120.0, 242.0), (240.0, 242.5)])
+        self.assert_covers(242.5, segments)
+
+
+class StitchTests(SimpleTestCase):
+    def test_overlapping_words_are_dropped(self):
+        self.assertEqual(
+            stitch(['I walked slowly to the', 'to the old house.', 'old house. Then it rained']),
+            'I walked slowly to the old house. Then it rained'
+        )
+    
+    def test_overlap_ignores_case_and_punctuation(self):
+        self.assertEqual(stitch(['we opened the doors.', 'The doors quickly']), 'we opened the doors. quickly')
+    
+    def test_single_repeated_word_is_kept(self):
+        self.assertEqual(stitch(['it fell', 'fell again']), 'it fell fell again')
+    
+    def test_empty_segments_are_skipped(self):
+        self.assertEqual(stitch(['', 'she saw a bird', '   ', 'a bird flew']), 'she saw a bird flew')
+
+
+BATCH_TEXT = re.compile(r'^### Text (\d+)\n(.*?)(?=\n\n### Text |\Z)', re.M | re.S)
+
+
+class StubProvider(AIProvider):
+    """Answers chat completions with reply(system prompt, user message); keeps every request."""
+    
+    name = 'stub'
+    available = True
+    
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+    
+    async def _chat_completion(self, messages, model, timeout, **params):
+        system, message = messages[0]['content'], messages[-1]['content']
+        self.requests.append((system, message))
+        content = self.reply(system, message)
+        if isinstance(content, BaseException):
+            raise content
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        return {'choices': [{'message': {'role': 'assistant', 'content': content}}]}
+    
+    async def _transcribe(self, audio_file_path, model, timeout):
+        raise OpenAIError('The stub provider does not transcribe')
+
+
+def analysis_of(text):
+    """What the stub provider answers for one text, so results can be traced to their text."""
+    return {'themes': [text], 'symbols': [], 'entities': []}
+
+
+def batch_texts(message):
+    return {int(number): text for number, text in BATCH_TEXT.findall(message)}
+
+
+NO_AI_CACHE = {'TIMEOUT': 60, 'MAX_ENTRIES': 0, 'PRUNE_EVERY': 100}
+NO_AI_METRICS = {**settings.AI_METRICS, 'ENABLED': False}
+
+
+@override_settings(AI_CACHE=NO_AI_CACHE, AI_METRICS=NO_AI_METRICS)
+class BatchedAnalysisTests(SimpleTestCase):
+    """Batched answers must reach the text they belong to, or fall back to a call of their own."""
+    
+    TEXTS = ['I walked to the old house.', 'She saw a blue bird.', 'The dark water fell.']
+    
+    def use_provider(self, batch_reply):
+        def reply(system, message):
+            if system == BATCH_ANALYSIS_PROMPT:
+                return batch_reply(batch_texts(message))
+            return analysis_of(message.removeprefix('Analyze this text: '))
+        
+        provider = StubProvider(reply)
+        patcher = mock.patch('apps.things.services.ai_service.get_provider', return_value=provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return provider
+    
+    def batch(self, texts):
+        return [(f'key-{i}', text) for i, text in enumerate(texts)]
+    
+    def response(self, content):
+        return {'choices': [{'message': {'content': json.dumps(content)}}]}
+    
+    def test_pack_respects_the_token_budget(self):
+        items = self.batch(['x' * 40] * 5 + ['y' * 400])
+        batches, singles = ai_service._pack(items, token_budget=200)
+        
+        # 129 tokens of prompt leave room for four 17-token texts; the fifth would be
+        # a batch of one, and the 107-token text does not fit next to the prompt at all
+        self.assertEqual(batches, [items[:4]])
+        self.assertEqual(singles, [items[5], items[4]])
+    
+    def test_batch_of_one_is_sent_alone(self):
+        items = self.batch(['x' * 40])
+        self.assertEqual(ai_service._pack(items, token_budget=3000), ([], items))
+    
+    def test_parse_reordered_results(self):
+        batch = self.batch(self.TEXTS)
+        results = [dict(analysis_of(text), id=i + 1) for i, text in enumerate(self.TEXTS)][::-1]
+        
+        answered = ai_service._parse_batch(batch, self.response({'results': results}))
+        self.assertEqual(answered, {key: analysis_of(text) for key, text in batch})
+    
+    def test_parse_drops_missing_extra_and_malformed_entries(self):
+        batch = self.batch(self.TEXTS)
+        results = [
+            dict(analysis_of(self.TEXTS[0]), id='1'),
+            dict(analysis_of('unknown'), id=4),
+            dict(analysis_of('unknown'), id=0),
+            {'id': 3, 'themes': 'water', 'symbols': [], 'entities': []},
+            {'themes': [], 'symbols': [], 'entities': []},
+            'not an entry',
+        ]
+        
+        answered = ai_service._parse_batch(batch, self.response({'results': results}))
+        self.assertEqual(answered, {'key-0': analysis_of(self.TEXTS[0])})
+    
+    def test_parse_unusable_responses(self):
+        batch = self.batch(self.TEXTS)
+        for response in (
+            OpenAIError('503'),
+            {'choices': []},
+            {'choices': [{'message': {'content': 'not json'}}]},
+            self.response({'answers': []}),
+        ):
+            with self.assertLogs('apps.things.services.ai_service', 'WARNING'):
+                self.assertEqual(ai_service._parse_batch(batch, response), {})
+        self.assertEqual(ai_service._parse_batch(batch, self.response({'results': {'1': analysis_of('x')}})), {})
+    
+    def test_complete_batch_needs_one_call(self):
+        provider = self.use_provider(lambda texts: {
+            'results': [dict(analysis_of(text), id=number) for number, text in texts.items()]
+        })
+        results, stats = ai_service.analyze_things(self.TEXTS)
+        
+        self.assertEqual(results, [analysis_of(text) for text in self.TEXTS])
+        self.assertEqual(stats, {'cached': 0, 'batched': 3, 'single': 0, 'calls': 1})
+        self.assertEqual(len(provider.requests), 1)
+    
+    def test_unanswered_entries_fall_back_to_single_calls(self):
+        # Answers only the first text, under the third one's id as well
+        provider = self.use_provider(lambda texts: {
+            'results': [dict(analysis_of(texts[1]), id=1), dict(analysis_of(texts[1]), id=9)]
+        })
+        results, stats = ai_service.analyze_things(self.TEXTS)
+        
+        self.assertEqual(results, [analysis_of(text) for text in self.TEXTS])
+        self.assertEqual(stats, {'cached': 0, 'batched': 1, 'single': 2, 'calls': 3})
+        self.assertEqual(len(provider.requests), 3)
+    
+    def test_failed_batch_falls_back_to_single_calls(self):
+        self.use_provider(lambda texts: OpenAIError('Service unavailable', 503))
+        with self.assertLogs('apps.things.services.ai_service', 'WARNING'):
+            results, stats = ai_service.analyze_things(self.TEXTS)
+        
+        self.assertEqual(results, [analysis_of(text) for text in self.TEXTS])
+        self.assertEqual(stats['single'], 3)
+    
+    def test_duplicate_texts_are_analyzed_once(self):
+        provider = self.use_provider(lambda texts: {
+            'results': [dict(analysis_of(text), id=number) for number, text in texts.items()]
+        })
+        results, stats = ai_service.analyze_things(self.TEXTS + self.TEXTS[:1])
+        
+        self.assertEqual(results[-1], analysis_of(self.TEXTS[0]))
+        self.assertEqual(len(batch_texts(provider.requests[0][1])), 3)
+
+
+@override_settings(
+    AI_CACHE=NO_AI_CACHE,
+    AI_METRICS=NO_AI_METRICS,
+    OPENAI={**settings.OPENAI, 'PATTERN_CHUNK_TOKENS': 200}
+)
+class PatternDiscoveryTests(SimpleTestCase):
+    """Patterns found per chunk (map) are merged by one more request (reduce)."""
+    
+    # 300 characters each: two fit a 200-token chunk
+    THINGS = [
+        {'id': 'a', 'date': '2024-03-01', 'text': ('I walked in the rain. ' * 14)[:300]},
+        {'id': 'b', 'date': '2024-03-02', 'text': ('We set off on a trip by the river. ' * 9)[:300]},
+        {'id': 'c', 'date': '2024-03-03', 'text': ('Water fell from the dark sky. ' * 11)[:300]},
+        {'id': 'd', 'date': '2024-03-04', 'text': ('She travelled across the sea. ' * 11)[:300]},
+    ]
+    MERGED = {'patterns': [
+        {'name': 'Journeys', 'type': 'theme', 'description': 'Going places', 'confidence': 0.9, 'members': [2, 3]},
+        {'name': 'Water', 'type': 'symbol', 'description': 'Rain and rivers', 'confidence': 0.5, 'members': [1]},
+        {'name': 'Unknown', 'type': 'theme', 'description': '', 'confidence': 0.9, 'members': [7]},
+    ]}
+    
+    def use_provider(self, reduce_reply):
+        def reply(system, message):
+            if system == PATTERN_MAP_PROMPT:
+                # Both chunks see water; each names the journeys differently
+                journeys = 'Journeys' if 'walked' in message else 'Travel'
+                return {'patterns': [
+                    {'name': 'Water', 'type': 'symbol', 'description': 'Rain', 'confidence': 0.6, 'occurrences': [1, 2]},
+                    {'name': journeys, 'type': 'theme', 'description': 'Trips', 'confidence': 0.8, 'occurrences': [2, 5]},
+                ]}
+            if system == PATTERN_REDUCE_PROMPT:
+                return reduce_reply
+            raise AssertionError(f"Unexpected prompt: {system[:40]}")
+        
+        provider = StubProvider(reply)
+        patcher = mock.patch('apps.things.services.ai_service.get_provider', return_value=provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return provider
+    
+    def requests(self, provider, system):
+        return [message for prompt, message in provider.requests if prompt == system]
+    
+    def test_chunks_are_mapped_then_reduced(self):
+        provider = self.use_provider(self.MERGED)
+        patterns = ai_service.find_patterns(self.THINGS)
+        
+        chunks = self.requests(provider, PATTERN_MAP_PROMPT)
+        self.assertEqual(len(chunks), 2)
+        for chunk, things in zip(sorted(chunks, key=lambda m: 'walked' not in m), [self.THINGS[:2], self.THINGS[2:]]):
+            self.assertIn(f"Text 1 ({things[0]['date']}): {things[0]['text']}", chunk)
+            self.assertIn(f"Text 2 ({things[1]['date']}): {things[1]['text']}", chunk)
+            self.assertNotIn('Text 3', chunk)
+        
+        # Same-named candidates of different chunks are combined before the reduce request
+        reduce_input, = self.requests(provider, PATTERN_REDUCE_PROMPT)
+        self.assertIn('Candidate 1 [symbol] Water: Rain (confidence 0.6, in 4 texts)', reduce_input)
+        self.assertIn('Candidate 2 [theme] Journeys: Trips (confidence 0.8, in 1 texts)', reduce_input)
+        self.assertIn('Candidate 3 [theme] Travel: Trips (confidence 0.8, in 1 texts)', reduce_input)
+        self.assertNotIn('Candidate 4', reduce_input)
+        
+        self.assertEqual(patterns, [
+            {'name': 'Journeys', 'type': 'theme', 'description': 'Going places', 'confidence': 0.9,
+             'occurrences': ['b', 'd']},
+            {'name': 'Water', 'type': 'symbol', 'description': 'Rain and rivers', 'confidence': 0.5,
+             'occurrences': ['a', 'b', 'c', 'd']},
+        ])
+    
+    def test_failed_reduce_keeps_the_candidates(self):
+        self.use_provider(OpenAIError('Service unavailable', 503))
+        with self.assertLogs('apps.things.services.ai_service', 'ERROR'):
+            patterns = ai_service.find_patterns(self.THINGS)
+        
+        self.assertEqual(
+            [(pattern['name'], pattern['occurrences']) for pattern in patterns],
+            [('Journeys', ['b']), ('Travel', ['d']), ('Water', ['a', 'b', 'c', 'd'])]
+        )
+    
+    def test_too_few_things(self):
+        provider = self.use_provider(self.MERGED)
+        self.assertEqual(ai_service.find_patterns(self.THINGS[:2]), [])
+        self.assertEqual(provider.requests, [])
+
+
+def serve_standin(testcase, server):
+    """Serve a stand-in on a free local port until the test ends; returns its API base URL."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(server.app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+    
+    testcase.addCleanup(stop)
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/v1"
+
+
+CLIENT_LOGGER = 'apps.things.services.openai_client'
+
+
+class FlakyStandIn(StandInServer):
+    """A stand-in whose first `failures` requests fail with status, without delay."""
+    
+    def __init__(self, failures, status, **kwargs):
+        super().__init__(latency_ms=0, **kwargs)
+        self.failures = failures
+        self.status = status
+    
+    async def _delay_or_fail(self, kind):
+        if self.failures <= 0:
+            return None
+        self.failures -= 1
+        self.errors[kind] += 1
+        return web.json_response({'error': {'message': 'injected'}}, status=self.status)
+
+
+@override_settings(OPENAI={
+    **settings.OPENAI,
+    'TIMEOUT': 5,
+    'MAX_RETRIES': 2,
+    'BACKOFF_SECONDS': 0.01,
+    'BACKOFF_MAX_SECONDS': 0.05,
+})
+class OpenAIClientRetryTests(SimpleTestCase):
+    """Retries of the pooled client, against the local stand-in server."""
+    
+    MESSAGES = [{'role': 'user', 'content': 'Analyze this text: I walked home.'}]
+    
+    def standin_client(self, server):
+        client = AsyncOpenAIClient(base_url=serve_standin(self, server), api_key='test')
+        self.addCleanup(client.close)
+        return client
+    
+    def test_rate_limit_is_retried(self):
+        server = FlakyStandIn(failures=2, status=429)
+        with self.assertLogs(CLIENT_LOGGER, 'WARNING') as logs:
+            response = self.standin_client(server).chat_completion_sync(self.MESSAGES)
+        
+        self.assertEqual(len(logs.records), 2)
+        
+        self.assertEqual(json.loads(response['choices'][0]['message']['content']), server.canned['analysis'])
+        self.assertEqual(server.requests['analysis'], 3)
+    
+    def test_server_error_is_retried(self):
+        for status in (500, 502, 503, 504):
+            server = FlakyStandIn(failures=1, status=status)
+            with self.assertLogs(CLIENT_LOGGER, 'WARNING'):
+                self.standin_client(server).chat_completion_sync(self.MESSAGES)
+            self.assertEqual(server.requests['analysis'], 2)
+    
+    def test_gives_up_after_max_retries(self):
+        server = FlakyStandIn(failures=10, status=503)
+        with self.assertRaises(OpenAIError) as raised, self.assertLogs(CLIENT_LOGGER, 'WARNING'):
+            self.standin_client(server).chat_completion_sync(self.MESSAGES)
+        
+        self.assertEqual(raised.exception.status, 503)
+        self.assertEqual(server.requests['analysis'], 3)
+    
+    def test_client_error_is_not_retried(self):
+        for status in (400, 401, 404):
+            server = FlakyStandIn(failures=1, status=status)
+            with self.assertRaises(OpenAIError) as raised, self.assertNoLogs(CLIENT_LOGGER, 'WARNING'):
+                self.standin_client(server).chat_completion_sync(self.MESSAGES)
+            self.assertEqual(raised.exception.status, status)
+            self.assertEqual(server.requests['analysis'], 1)
+    
+    def test_backoff_honors_retry_after_up_to_the_cap(self):
+        client = AsyncOpenAIClient(api_key='test')
+        for attempt in range(4):
+            self.assertLessEqual(client._backoff(attempt), 0.05)
+        self.assertEqual(client._backoff(0, retry_after=0.03), 0.03)
+        self.assertEqual(client._backoff(0, retry_after=120), 0.05)
+    
+    def test_timeout_is_retried(self):
+        server = StandInServer(latency_ms=500)
+        with self.assertRaises(OpenAIError) as raised, self.assertLogs(CLIENT_LOGGER, 'WARNING'):
+            self.standin_client(server).chat_completion_sync(self.MESSAGES, timeout=0.1)
+        
+        self.assertIsNone(raised.exception.status)
+        self.assertEqual(server.requests['analysis'], 3)
+    
+    def test_transcription_upload_is_rebuilt_for_a_retry(self):
+        server = FlakyStandIn(failures=1, status=503)
+        with tempfile.NamedTemporaryFile(suffix='.wav') as audio:
+            audio.write(b'RIFF' + bytes(64))
+            audio.flush()
+            with self.assertLogs(CLIENT_LOGGER, 'WARNING'):
+                transcript = self.standin_client(server).transcribe_sync(audio.name)
+        
+        self.assertEqual(transcript, server.canned['transcript'])
+        self.assertEqual(server.requests['transcription'], 2)
+
+
+@override_settings(
+    AI_CACHE={'TIMEOUT': 3600, 'MAX_ENTRIES': 3, 'PRUNE_EVERY': 100},
+    AI_METRICS=NO_AI_METRICS
+)
+class AICacheTests(TestCase):
+    """Stored AI results are reused until the text, model or prompt changes, or they expire."""
+    
+    def setUp(self):
+        ai_cache.clear()
+        self.provider = StubProvider(lambda system, message: analysis_of(message))
+        patcher = mock.patch('apps.things.services.ai_service.get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def store(self, text, age=timedelta(0), expires_in=timedelta(hours=1)):
+        now = timezone.now()
+        return AIResultCache.objects.create(
+            key=ai_cache.make_key('test', 'model', 1, text),
+            kind='test',
+            model='model',
+            prompt_version=1,
+            result={'text': text},
+            last_used_at=now - age,
+            expires_at=now + expires_in
+        )
+    
+    def test_hit_skips_the_provider(self):
+        first = ai_service.analyze_thing('I walked home.')
+        second = ai_service.analyze_thing('I walked home.')
+        
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.provider.requests), 1)
+        self.assertEqual((ai_cache.hits, ai_cache.misses), (1, 1))
+        self.assertEqual(AIResultCache.objects.get().hit_count, 1)
+    
+    def test_changed_text_misses(self):
+        ai_service.analyze_thing('I walked home.')
+        ai_service.analyze_thing('I walked home again.')
+        self.assertEqual(len(self.provider.requests), 2)
+    
+    def test_model_change_misses(self):
+        ai_service.analyze_thing('I walked home.')
+        with mock.patch('apps.things.services.ai_service.ANALYSIS_MODEL', 'gpt-4o-mini'):
+            ai_service.analyze_thing('I walked home.')
+        self.assertEqual(len(self.provider.requests), 2)
+    
+    def test_prompt_version_change_misses(self):
+        ai_service.analyze_thing('I walked home.')
+        with mock.patch('apps.things.services.ai_service.ANALYSIS_PROMPT_VERSION', 2):
+            ai_service.analyze_thing('I walked home.')
+        self.assertEqual(len(self.provider.requests), 2)
+    
+    def test_failures_are_not_cached(self):
+        self.provider.reply = lambda system, message: OpenAIError('Service unavailable', 503)
+        with self.assertLogs('apps.things.services.ai_service', 'ERROR'):
+            self.assertEqual(ai_service.analyze_thing('I walked home.'), {'themes': [], 'symbols': [], 'entities': []})
+        self.assertFalse(AIResultCache.objects.exists())
+    
+    def test_key_parts_are_separated(self):
+        self.assertNotEqual(ai_cache.make_key('ab', 'c', 1, 'x'), ai_cache.make_key('a', 'bc', 1, 'x'))
+        self.assertNotEqual(ai_cache.make_key('a', 'b', 1, '2x'), ai_cache.make_key('a', 'b', 12, 'x'))
+    
+    def test_expired_entry_misses(self):
+        self.store('old', expires_in=-timedelta(seconds=1))
+        self.assertIs(ai_cache.get(ai_cache.make_key('test', 'model', 1, 'old')), MISSING)
+    
+    def test_prune_removes_expired_then_least_recently_used(self):
+        self.store('expired', expires_in=-timedelta(seconds=1))
+        for hours in range(4):
+            self.store(f'used {hours}h ago', age=timedelta(hours=hours))
+        
+        self.assertEqual(ai_cache.prune(), {'expired': 1, 'evicted': 1})
+        self.assertEqual(
+            sorted(AIResultCache.objects.values_list('result__text', flat=True)),
+            ['used 0h ago', 'used 1h ago', 'used 2h ago']
+        )
+    
+    def test_prune_command(self):
+        self.store('expired', expires_in=-timedelta(seconds=1))
+        self.store('fresh')
+        stdout = StringIO()
+        call_command('prune_ai_cache', stdout=stdout)
+        
+        self.assertIn('Removed 1 expired and 0 evicted', stdout.getvalue())
+        self.assertEqual(list(AIResultCache.objects.values_list('result__text', flat=True)), ['fresh'])
+        
+        call_command('prune_ai_cache', '--clear', stdout=stdout)
+        self.assertFalse(AIResultCache.objects.exists())
+
+
+class HalfProvider(AIProvider):
+    """Implements chat completions but forgot transcription."""
+    
+    async def _chat_completion(self, messages, model, timeout, **params):
+        return {}
+
+
+@override_settings(AI_CACHE=NO_AI_CACHE, AI_METRICS=NO_AI_METRICS)
+class AIProviderTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(ai_providers._instances, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_backend_selection(self):
+        for backend, provider_class in [
+            ('openai', OpenAIProvider),
+            ('disabled', DisabledProvider),
+            ('apps.things.services.ai_providers.DisabledProvider', DisabledProvider),
+        ]:
+            with override_settings(AI_PROVIDER={**settings.AI_PROVIDER, 'BACKEND': backend}):
+                self.assertIs(type(get_provider()), provider_class)
+                # One instance per process
+                self.assertIs(get_provider(), get_provider(backend))
+    
+    def test_half_implemented_provider_fails_when_created(self):
+        with self.assertRaises(TypeError):
+            HalfProvider()
+        with self.assertRaises(TypeError):
+            get_provider('apps.things.tests.HalfProvider')
+    
+    def test_disabled_provider_falls_back_to_empty_results(self):
+        with override_settings(AI_PROVIDER={**settings.AI_PROVIDER, 'BACKEND': 'disabled'}):
+            self.assertFalse(ai_service.available)
+            self.assertEqual(ai_service.analyze_thing('I walked home.'), {'themes': [], 'symbols': [], 'entities': []})
+            with self.assertRaises(OpenAIError):
+                get_provider().chat_completion_sync([{'role': 'user', 'content': 'Hello'}])
+    
+    def test_standin_round_trip(self):
+        server = StandInServer(latency_ms=0)
+        url = serve_standin(self, server)
+        with override_settings(AI_PROVIDER={'BACKEND': 'standin', 'STANDIN_URL': url}):
+            provider = get_provider()
+            self.addCleanup(provider.client.close)
+            self.assertIsInstance(provider, StandInProvider)
+            self.assertTrue(ai_service.available)
+            self.assertEqual(ai_service.cache_model, 'standin/gpt-3.5-turbo')
+            
+            self.assertEqual(ai_service.analyze_thing('I walked home.'), server.canned['analysis'])
+            with tempfile.NamedTemporaryFile(suffix='.wav') as audio:
+                audio.write(b'RIFF' + bytes(64))
+                audio.flush()
+                self.assertEqual(provider.transcribe_sync(audio.name), server.canned['transcript'])
+        
+        self.assertEqual(server.requests, {'analysis': 1, 'transcription': 1})
+
+
+class AIMetricsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='alice')
+        # A private instance without the flush thread, so the test decides when rows are written
+        self.metrics = AIMetrics()
+        patcher = mock.patch.object(self.metrics, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def call(self, latency_ms, user=None, operation='analyze_thing', error=None, tokens=(100, 20)):
+        return AICallRecord.objects.create(
+            user=user,
+            provider='openai',
+            operation=operation,
+            model='gpt-3.5-turbo',
+            outcome='error' if error else 'ok',
+            latency_ms=latency_ms,
+            prompt_tokens=tokens[0],
+            completion_tokens=tokens[1],
+            cost_usd=0.001,
+            error=error or '',
+            created_at=timezone.now()
+        )
+    
+    def test_percentile_interpolates_within_a_bucket(self):
+        bounds = (10, 20, 30)
+        cumulative = [0, 5, 10, 10]
+        self.assertEqual(self.metrics._percentile(bounds, cumulative, 25, 30), 15)
+        self.assertEqual(self.metrics._percentile(bounds, cumulative, 50, 30), 20)
+        self.assertEqual(self.metrics._percentile(bounds, cumulative, 95, 30), 29)
+    
+    def test_percentile_is_capped_at_the_maximum(self):
+        self.assertEqual(self.metrics._percentile((10, 20, 30), [0, 5, 10, 10], 95, 25), 24.5)
+        # The open last bucket ends at the maximum
+        self.assertEqual(self.metrics._percentile((10, 20, 30), [0, 0, 0, 4], 50, 100), 65)
+    
+    def test_percentile_of_nothing(self):
+        self.assertEqual(self.metrics._percentile((10, 20, 30), [0, 0, 0, 0], 50, None), 0)
+    
+    def test_summary_histograms(self):
+        for latency in (10, 30, 30, 40, 70000):
+            self.call(latency, user=self.user)
+        self.call(600, operation='transcribe', error='503', tokens=(0, 0))
+        summary = self.metrics.summary('1h')
+        
+        self.assertEqual(summary['totals']['calls'], 6)
+        self.assertEqual(summary['totals']['errors'], 1)
+        self.assertEqual(summary['totals']['unattributed_calls'], 1)
+        latency = {bucket['le']: bucket['count'] for bucket in summary['latency_ms']['buckets']}
+        self.assertEqual((latency[25], latency[50], latency[1000], latency[None]), (1, 3, 1, 1))
+        self.assertEqual(summary['latency_ms']['p50'], 41.7)
+        self.assertEqual(summary['latency_ms']['p99'], 69400)
+        # Transcriptions are left out of the token histogram
+        self.assertEqual(summary['tokens_per_call']['buckets'][1], {'le': 250, 'count': 5})
+        self.assertEqual([row['name'] for row in summary['operations']], ['analyze_thing', 'transcribe'])
+        self.assertEqual(summary['top_users'][0]['calls'], 5)
+    
+    @override_settings(AI_METRICS={**settings.AI_METRICS, 'ENABLED': True, 'FLUSH_SIZE': 3})
+    def test_records_are_buffered_until_flushed(self):
+        self.metrics.record('openai', 'analyze_thing', 'gpt-3.5-turbo', 12.34, usage={'prompt_tokens': 1000})
+        self.metrics.record('openai', 'transcribe', 'whisper-1', 50, audio_seconds=90, error=OpenAIError('x', 503))
+        self.assertFalse(AICallRecord.objects.exists())
+        self.assertFalse(self.metrics._wake.is_set())
+        
+        self.assertEqual(self.metrics.flush(), 2)
+        self.assertEqual(self.metrics.flush(), 0)
+        ok, failed = AICallRecord.objects.order_by('operation')
+        self.assertEqual((ok.latency_ms, ok.prompt_tokens, ok.cost_usd), (12.3, 1000, 0.0005))
+        self.assertEqual((failed.outcome, failed.status_code, failed.cost_usd), ('error', 503, 0))
+        
+        # A full buffer wakes the flush thread
+        for _ in range(3):
+            self.metrics.record('openai', 'analyze_thing', 'gpt-3.5-turbo', 10)
+        self.assertTrue(self.metrics._wake.is_set())
+    
+    @override_settings(AI_METRICS={**settings.AI_METRICS, 'ENABLED': False})
+    def test_disabled_metrics_record_nothing(self):
+        self.metrics.record('openai', 'analyze_thing', 'gpt-3.5-turbo', 10)
+        self.assertEqual(self.metrics.flush(), 0)
+    
+    @override_settings(AI_METRICS={**settings.AI_METRICS, 'ENABLED': True})
+    def test_calls_are_attributed_across_the_provider_loop(self):
+        provider = StubProvider(lambda system, message: analysis_of(message))
+        messages = [{'role': 'user', 'content': 'Hello'}]
+        with mock.patch.object(ai_providers, 'ai_metrics', self.metrics):
+            with attribute_ai_calls(self.user):
+                provider.chat_completion_sync(messages, operation='analyze_thing')
+                with attribute_ai_calls(None):
+                    provider.chat_completion_sync(messages, operation='nested')
+            provider.chat_completion_sync(messages, operation='outside')
+        self.metrics.flush()
+        
+        self.assertEqual(
+            dict(AICallRecord.objects.values_list('operation', 'user_id')),
+            {'analyze_thing': self.user.pk, 'nested': None, 'outside': None}
+        )
+    
+    def test_view_is_staff_only(self):
+        url = reverse('things:ai_call_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        
+        self.user.is_staff = True
+        self.user.save()
+        self.call(10, user=self.user)
+        with mock.patch('apps.things.views.ai_metrics', self.metrics):
+            response = self.client.get(url, {'window': '1h'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['calls'], 1)
+        self.assertEqual(self.client.get(url, {'window': '2h'}).status_code, 400)
+
+
+class RelatedThingsTests(TestCase):
+    """Neighbors ranked by TF-IDF similarity among one user's things."""
+    
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.home = self.thing(self.alice, ['water', 'journey', 'home'], privacy_level='community')
+        self.trip = self.thing(self.alice, ['water', 'journey'])
+        self.rain = self.thing(self.alice, ['water'], symbols=['door'], privacy_level='community')
+        self.fire = self.thing(self.alice, ['fire'])
+        # Identical to home, but someone else's
+        self.other = self.thing(self.bob, ['water', 'journey', 'home'])
+        self.service = RelatedThingsService()
+    
+    def thing(self, user, themes, symbols=(), privacy_level='private'):
+        return Thing.objects.create(
+            user=user,
+            description=' '.join(themes),
+            themes=themes,
+            symbols=list(symbols),
+            privacy_level=privacy_level
+        )
+    
+    def related(self, thing):
+        return [link.related for link in RelatedThing.objects.filter(thing=thing).select_related('related')]
+    
+    def links(self):
+        return sorted(RelatedThing.objects.values_list('thing_id', 'related_id', 'rank'))
+    
+    def test_neighbors_are_ranked_by_similarity(self):
+        self.assertEqual(self.service.rebuild(self.alice.pk), 4)
+        
+        self.assertEqual(self.related(self.home), [self.trip, self.rain])
+        self.assertEqual(self.related(self.trip), [self.home, self.rain])
+        scores = list(RelatedThing.objects.filter(thing=self.home).values_list('score', flat=True))
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertTrue(all(0 < score <= 1 for score in scores))
+        # Nothing in common, so no neighbors
+        self.assertEqual(self.related(self.fire), [])
+    
+    def test_neighbors_exclude_the_thing_itself_and_other_users(self):
+        self.service.rebuild(self.alice.pk)
+        self.service.rebuild(self.bob.pk)
+        
+        for thing in (self.home, self.trip, self.rain):
+            related = self.related(thing)
+            self.assertNotIn(thing, related)
+            self.assertNotIn(self.other, related)
+        self.assertEqual(self.related(self.other), [])
+    
+    def test_visitors_only_see_community_neighbors(self):
+        self.service.rebuild(self.alice.pk)
+        url = reverse('things:detail', args=[self.home.pk])
+        
+        self.client.force_login(self.alice)
+        owner_view = self.client.get(url).context['related_links']
+        self.assertEqual([link.related for link in owner_view], [self.trip, self.rain])
+        
+        self.client.force_login(self.bob)
+        visitor_view = self.client.get(url).context['related_links']
+        self.assertEqual([link.related for link in visitor_view], [self.rain])
+    
+    def test_update_matches_rebuild(self):
+        self.service.rebuild(self.alice.pk)
+        self.fire.themes = ['water', 'journey', 'home']
+        self.fire.save()
+        self.service.update(self.fire)
+        
+        self.assertEqual(self.related(self.fire)[0], self.home)
+        self.assertEqual(self.related(self.home)[0], self.fire)
+        updated = self.links()
+        self.service.rebuild(self.alice.pk)
+        self.assertEqual(updated, self.links())
+    
+    def test_deleted_thing_leaves_the_cached_matrix(self):
+        self.service.rebuild(self.alice.pk)
+        self.trip.delete()
+        self.service.update(self.home)
+        
+        self.assertNotIn(str(self.trip.pk), self.service._matrices[str(self.alice.pk)].positions)
+        self.assertEqual(self.related(self.home), [self.rain])
+    
+    def test_rebuild_replaces_the_cached_matrix(self):
+        self.service.update(self.home)
+        cached = self.service._matrices[str(self.alice.pk)]
+        
+        # A change the version fingerprint cannot see: only a rebuild picks it up
+        Thing.objects.filter(pk=self.fire.pk).update(themes=['water', 'journey', 'home'])
+        self.assertEqual(self.service.update(self.home), {'refreshed': 0})
+        self.assertNotEqual(self.related(self.home)[0], self.fire)
+        
+        self.service.rebuild(self.alice.pk)
+        self.assertIsNot(self.service._matrices[str(self.alice.pk)], cached)
+        self.assertEqual(self.related(self.home)[0], self.fire)
+
+
+class RelationStoreTests(TestCase):
+    """Subject-verb-object triples, from extraction to the per-user query endpoints."""
+    
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        patcher = mock.patch.object(SemanticService, 'nlp', new_callable=mock.PropertyMock, return_value=build_nlp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bypass = semantic_cache.bypass()
+        bypass.__enter__()
+        self.addCleanup(bypass.__exit__, None, None, None)
+    
+    def analyzed(self, user, text, thing_date):
+        thing = Thing.objects.create(user=user, title=text[:20], description=text, thing_date=thing_date)
+        semantic_service.save_thing_analysis(thing, semantic_service.extract_semantic_bits(text))
+        return thing
+    
+    def triples(self, thing):
+        return sorted(
+            SemanticRelation.objects.filter(thing=thing).values_list('subject', 'verb', 'object', 'count')
+        )
+    
+    def test_extraction(self):
+        bits = semantic_service.extract_semantic_bits('\n\n'.join([PARAGRAPHS[0], PARAGRAPHS[2], PARAGRAPHS[3]]))
+        self.assertEqual(bits['relations'], [
+            ['i', 'walked', 'house'],
+            ['water', 'fell', 'hand'],
+            ['we', 'opened', 'door'],
+        ])
+    
+    def test_sync_writes_only_changes(self):
+        thing = self.analyzed(self.alice, 'I walked to the house. I walked to the house.', date(2024, 3, 1))
+        self.assertEqual(self.triples(thing), [('i', 'walked', 'house', 2)])
+        
+        thing.semantic_bits = {'relations': [['i', 'walked', 'house'], ['we', 'opened', 'door']]}
+        self.assertEqual(relation_store.sync(thing), {'created': 1, 'updated': 1, 'deleted': 0})
+        thing.semantic_bits = {'relations': [['we', 'opened', 'door']]}
+        self.assertEqual(relation_store.sync(thing), {'created': 0, 'updated': 0, 'deleted': 1})
+        self.assertEqual(self.triples(thing), [('we', 'opened', 'door', 1)])
+    
+    def test_queries_only_see_the_users_own_things(self):
+        first = self.analyzed(self.alice, 'I walked to the house.', date(2024, 3, 1))
+        second = self.analyzed(self.alice, 'She walked to the river. I opened the doors.', date(2024, 3, 2))
+        self.analyzed(self.bob, 'I walked to the house. He walked to the sea.', date(2024, 3, 1))
+        self.client.force_login(self.alice)
+        
+        objects = self.client.get(reverse('things:relation_objects'), {'verb': 'Walked'}).json()
+        self.assertEqual(objects['results'], [
+            {'lemma': 'house', 'total': 1, 'things': 1},
+            {'lemma': 'river', 'total': 1, 'things': 1},
+        ])
+        subjects = self.client.get(reverse('things:relation_objects'), {'verb': 'walked', 'role': 'subject'}).json()
+        self.assertEqual([row['lemma'] for row in subjects['results']], ['i', 'she'])
+        
+        timeline = self.client.get(reverse('things:relation_timeline'), {'verb': 'walked'}).json()
+        self.assertEqual(
+            [(row['thing_id'], row['subject'], row['object']) for row in timeline['results']],
+            [(str(first.pk), 'i', 'house'), (str(second.pk), 'she', 'river')]
+        )
+        since = self.client.get(reverse('things:relation_timeline'), {'since': '2024-03-02'}).json()
+        self.assertEqual({row['thing_id'] for row in since['results']}, {str(second.pk)})
+        
+        top = self.client.get(reverse('things:relation_top')).json()
+        self.assertEqual(
+            sorted((row['subject'], row['verb'], row['object'], row['total']) for row in top['results']),
+            [('i', 'opened', 'door', 1), ('i', 'walked', 'house', 1), ('she', 'walked', 'river', 1)]
+        )
+    
+    def test_query_parameters_are_checked(self):
+        self.client.force_login(self.alice)
+        for url, params in [
+            ('things:relation_objects', {}),
+            ('things:relation_objects', {'verb': 'walked', 'role': 'verb'}),
+            ('things:relation_objects', {'verb': 'walked', 'limit': 'many'}),
+            ('things:relation_timeline', {'since': 'March'}),
+            ('things:relation_top', {'until': '2024-13-01'}),
+        ]:
+            self.assertEqual(self.client.get(reverse(url), params).status_code, 400)
+    
+    def test_queries_need_a_login(self):
+        response = self.client.get(reverse('things:relation_top'))
+        self.assertEqual(response.status_code, 302)
+
+
+class LemmaQueryTests(SimpleTestCase):
+    def test_terms_are_and_ed(self):
+        self.assertEqual(lemma_index.parse_query('fly water'), [[('fly', None)], [('water', None)]])
+        self.assertEqual(lemma_index.parse_query('fly AND water'), [[('fly', None)], [('water', None)]])
+    
+    def test_or_joins_alternatives(self):
+        expected = [[('fly', None), ('fall', None)], [('water', 'NOUN')]]
+        self.assertEqual(lemma_index.parse_query('fly OR fall water:NOUN'), expected)
+        self.assertEqual(lemma_index.parse_query('fly|fall and water:noun'), expected)
+        self.assertEqual(lemma_index.parse_query('fly or fall AND water:NOUN'), expected)
+    
+    def test_terms_are_normalized(self):
+        self.assertEqual(lemma_index.parse_query('Fly:verb'), [[('fly', 'VERB')]])
+    
+    def test_dangling_operators_and_empty_terms_are_ignored(self):
+        self.assertEqual(lemma_index.parse_query('OR fly OR'), [[('fly', None)]])
+        self.assertEqual(lemma_index.parse_query('fly||fall :NOUN'), [[('fly', None), ('fall', None)]])
+        self.assertEqual(lemma_index.parse_query('  AND OR '), [])
+
+
+class LemmaSearchTests(TestCase):
+    """Searches through the lemma index built from analyses by the rule-based test parser."""
+    
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        patcher = mock.patch.object(SemanticService, 'nlp', new_callable=mock.PropertyMock, return_value=build_nlp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bypass = semantic_cache.bypass()
+        bypass.__enter__()
+        self.addCleanup(bypass.__exit__, None, None, None)
+        
+        self.house = self.analyzed(self.alice, 'I walked slowly to the old house.', date(2024, 3, 1))
+        self.water = self.analyzed(self.alice, 'The dark water fell on my hands. The water fell again.', date(2024, 3, 2))
+        self.doors = self.analyzed(self.alice, 'We opened the big doors quickly.', date(2024, 3, 3))
+        self.analyzed(self.bob, 'The water fell on the house.', date(2024, 3, 4))
+    
+    def analyzed(self, user, text, thing_date):
+        thing = Thing.objects.create(user=user, title=text[:20], description=text, thing_date=thing_date)
+        semantic_service.save_thing_analysis(thing, semantic_service.extract_semantic_bits(text))
+        return thing
+    
+    def search(self, query, pos=None):
+        return [
+            (thing, thing.match_count)
+            for thing in lemma_index.search(self.alice, lemma_index.parse_query(query), pos=pos)
+        ]
+    
+    def test_index_rows(self):
+        self.assertEqual(
+            sorted(self.water.lemma_entries.values_list('lemma', 'pos', 'count')),
+            [('dark', 'ADJ', 1), ('fell', 'VERB', 2), ('hand', 'NOUN', 1), ('water', 'NOUN', 2)]
+        )
+    
+    def test_search_only_finds_the_users_things(self):
+        self.assertEqual(self.search('water'), [(self.water, 2)])
+        self.assertEqual(self.search('house'), [(self.house, 1)])
+    
+    def test_all_groups_must_match(self):
+        self.assertEqual(self.search('water fell'), [(self.water, 4)])
+        self.assertEqual(self.search('water house'), [])
+    
+    def test_alternatives_rank_by_matching_tokens(self):
+        self.assertEqual(self.search('water OR house'), [(self.water, 2), (self.house, 1)])
+        # Equal counts fall back to the newest thing first
+        self.assertEqual(self.search('walked|opened'), [(self.doors, 1), (self.house, 1)])
+    
+    def test_parts_of_speech(self):
+        self.assertEqual(self.search('water:VERB'), [])
+        self.assertEqual(self.search('water:NOUN'), [(self.water, 2)])
+        self.assertEqual(self.search('water|fell', pos=['VERB']), [(self.water, 2)])
+    
+    def test_edited_analysis_is_reindexed(self):
+        text = 'The water fell.'
+        self.water.description = text
+        semantic_service.save_thing_analysis(self.water, semantic_service.extract_semantic_bits(text))
+        self.assertEqual(self.search('water'), [(self.water, 1)])
+        self.assertEqual(self.search('hand'), [])
+    
+    def test_search_view(self):
+        self.client.force_login(self.alice)
+        url = reverse('things:lemma_search')
+        results = self.client.get(url, {'q': 'water OR house'}).json()['results']
+        self.assertEqual(
+            [(row['id'], row['match_count']) for row in results],
+            [(str(self.water.pk), 2), (str(self.house.pk), 1)]
+        )
+        self.assertEqual(self.client.get(url, {'q': ' OR '}).status_code, 400)
@@ -10,11 +10,19 @@ urlpatterns = [
     path('quick/', views.quick_capture, name='quick_capture'),
     path('quick/<uuid:pk>/', views.quick_capture, name='quick_capture_edit'),
     path('<uuid:pk>/', views.thing_detail, name='detail'),
+    path('<uuid:pk>/semantic/', views.thing_semantic, name='semantic'),
+    path('<uuid:pk>/transcription/', views.transcription_progress, name='transcription_progress'),
     path('<uuid:pk>/edit/', views.quick_capture, name='edit'),
     path('<uuid:pk>/delete/', views.thing_delete, name='delete'),
     path('<uuid:pk>/toggle-privacy/', views.toggle_privacy, name='toggle_privacy'),
     path('<uuid:pk>/convert-to-story/', views.convert_thing_to_story, name='convert_to_story'),
     path('record/', views.record_voice, name='record_voice'),
+    path('lemmas/search/', views.lemma_search, name='lemma_search'),
+    path('relations/objects/', views.relation_objects, name='relation_objects'),
+    path('relations/timeline/', views.relation_timeline, name='relation_timeline'),
+    path('relations/top/', views.relation_top, name='relation_top'),
+    path('stats/semantic/', views.semantic_trends, name='semantic_trends'),
+    path('stats/ai/', views.ai_call_metrics, name='ai_call_metrics'),
     
     # Story URLs
     path('stories/', views.story_list, name='story_list'),
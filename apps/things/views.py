@@ -2,17 +2,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.core.paginator import Paginator
 from django.db.models import Q, Max
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from .models import Thing, ThingTag, ThingImage, Story, StoryThing
+from .services.ai_metrics import WINDOWS, ai_metrics
 from .forms import ThingForm, ThingImageFormSet
-from .services.ai_service import ai_service
+from .services.lemma_index import lemma_index
+from .services.relation_store import relation_store
+from .services.semantic_rollups import PERIODS, semantic_rollups
 from .services.semantic_service import semantic_service
 from .services.story_service import story_service
+from .services.transcription_service import transcription_pipeline
+from .tasks import (
+    ANALYZE_SEMANTICS, TRANSCRIBE, active_tasks, enqueue_analysis, enqueue_semantics, enqueue_transcription
+)
+from datetime import date
 import json
 
 
@@ -55,20 +65,19 @@ def quick_capture(request, pk=None):
                             # Use first line as title (max 200 chars)
                             thing.title = lines[0][:200].strip('#').strip()
                     
-                    # Update semantic analysis in background
-                    if content:
-                        semantic_analysis = semantic_service.extract_semantic_bits(content)
-                        thing.semantic_verbs = semantic_analysis.get('verb_phrases', [])
-                        thing.semantic_nouns = semantic_analysis.get('noun_phrases', [])
-                        thing.semantic_bits = semantic_analysis
-                    
                     thing.save()
                     
+                    # Update semantic analysis in background (only edited paragraphs are re-parsed)
+                    task_ids = []
+                    if content:
+                        task_ids.append(str(enqueue_semantics(thing).pk))
+                    
                     return JsonResponse({
                         'success': True,
                         'thing_id': str(thing.pk),
                         'word_count': len(content.split()),
-                        'saved_at': timezone.now().strftime('%H:%M')
+                        'saved_at': timezone.now().strftime('%H:%M'),
+                        'task_ids': task_ids
                     })
                 except Thing.DoesNotExist:
                     pass
@@ -83,18 +92,15 @@ def quick_capture(request, pk=None):
                     privacy_level='private'  # Default to private for minimal friction
                 )
                 
-                # Add semantic analysis
-                semantic_analysis = semantic_service.extract_semantic_bits(content)
-                thing.semantic_verbs = semantic_analysis.get('verb_phrases', [])
-                thing.semantic_nouns = semantic_analysis.get('noun_phrases', [])
-                thing.semantic_bits = semantic_analysis
-                thing.save()
+                # Add semantic analysis in background
+                task = enqueue_semantics(thing)
                 
                 return JsonResponse({
                     'success': True,
                     'thing_id': str(thing.pk),
                     'word_count': len(content.split()),
-                    'saved_at': timezone.now().strftime('%H:%M')
+                    'saved_at': timezone.now().strftime('%H:%M'),
+                    'task_ids': [str(task.pk)]
                 })
         
         # Handle regular form submission (Cmd+Enter)
@@ -124,21 +130,12 @@ def quick_capture(request, pk=None):
                 privacy_level=privacy_level
             )
         
-        # Add AI analysis if content exists
-        if content:
-            analysis = ai_service.analyze_thing(content)
-            thing.themes = analysis.get('themes', [])
-            thing.symbols = analysis.get('symbols', [])
-            thing.entities = analysis.get('entities', [])
-            
-            # Semantic analysis
-            semantic_analysis = semantic_service.extract_semantic_bits(content)
-            thing.semantic_verbs = semantic_analysis.get('verb_phrases', [])
-            thing.semantic_nouns = semantic_analysis.get('noun_phrases', [])
-            thing.semantic_bits = semantic_analysis
-        
         thing.save()
         
+        # Queue AI and semantic analysis if content exists
+        if content:
+            enqueue_analysis(thing)
+        
         # Handle image uploads
         images = request.FILES.getlist('images')
         for image in images:
@@ -196,29 +193,17 @@ def thing_detail(request, pk):
     thing = get_object_or_404(Thing, pk=pk)
     
     # Check permissions
-    if thing.user != request.user:
-        if thing.privacy_level == 'private':
-            messages.error(request, "You don't have permission to view this thing.")
-            return redirect('things:list')
-        elif thing.privacy_level == 'specific_users' and request.user not in thing.shared_with_users.all():
-            messages.error(request, "You don't have permission to view this thing.")
-            return redirect('things:list')
-        elif thing.privacy_level == 'groups':
-            # Groups are de-scoped: treat as private if disabled
-            if not getattr(settings, 'FEATURE_GROUPS', False):
-                messages.error(request, "You don't have permission to view this thing.")
-                return redirect('things:list')
-            else:
-                user_groups = request.user.thing_groups.all()
-                thing_groups = thing.shared_with_groups.all()
-                if not any(group in thing_groups for group in user_groups):
-                    messages.error(request, "You don't have permission to view this thing.")
-                    return redirect('things:list')
+    if not _can_view_thing(request.user, thing):
+        messages.error(request, "You don't have permission to view this thing.")
+        return redirect('things:list')
     
-    # Generate semantic HTML for the description
-    semantic_html = None
-    if thing.description:
-        semantic_html = semantic_service.create_highlighted_html(thing.description)
+    # Background analysis still running for this thing (only shown to its owner)
+    pending_tasks = list(active_tasks(thing)) if thing.user == request.user else []
+    
+    # Precomputed neighbors; visitors only see the owner's community things
+    related_links = thing.related_links.select_related('related')
+    if thing.user != request.user:
+        related_links = related_links.filter(related__privacy_level='community')
     
     # Check if thing can be converted to story
     can_convert_to_story = story_service.is_thing_long_enough(thing)
@@ -226,12 +211,82 @@ def thing_detail(request, pk):
     context = {
         'thing': thing,
         'can_edit': thing.user == request.user,
-        'semantic_html': semantic_html,
         'can_convert_to_story': can_convert_to_story,
+        'pending_tasks': pending_tasks,
+        'transcription_running': any(task.name == TRANSCRIBE for task in pending_tasks),
+        'related_links': list(related_links),
     }
     return render(request, 'things/thing_detail.html', context)
 
 
+@login_required
+def thing_semantic(request, pk):
+    """
+    Stream the semantic view of a thing's description (loaded by HTMX).
+    
+    Highlighted paragraphs are sent one at a time, so the detail page itself
+    never waits for spaCy and long entries start arriving early.
+    """
+    thing = get_object_or_404(Thing, pk=pk)
+    if not _can_view_thing(request.user, thing):
+        return HttpResponseForbidden()
+    
+    # A queued semantics task is about to refresh a stale analysis; the page
+    # reloads once it finishes, so don't parse the description twice
+    analyze_if_stale = not active_tasks(thing).filter(name=ANALYZE_SEMANTICS).exists()
+    if not analyze_if_stale and not semantic_service.has_current_analysis(thing.semantic_bits, thing.description):
+        return render(request, 'things/partials/semantic_pending.html')
+    
+    def content():
+        yield '<div class="p-4 bg-white rounded-lg border prose max-w-none" style="line-height: 1.8;">'
+        yield from semantic_service.stream_thing_highlight(thing, analyze_if_stale, inline_styles=False)
+        yield '</div>'
+        # The stats are complete once the last paragraph has been analyzed
+        yield render_to_string('things/partials/semantic_stats.html', {
+            'semantic_stats': thing.semantic_bits.get('stats'),
+        })
+    
+    return StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
+
+
+@login_required
+def transcription_progress(request, pk):
+    """
+    Progress of a thing's segmented transcription, for polling.
+    
+    HTMX requests get the progress partial (which keeps polling until the
+    transcription finishes); others get JSON.
+    """
+    thing = get_object_or_404(Thing, pk=pk, user=request.user)
+    progress = transcription_pipeline.progress(thing)
+    progress['running'] = active_tasks(thing).filter(name=TRANSCRIBE).exists()
+    
+    if request.headers.get('HX-Request'):
+        return render(request, 'things/partials/transcription_progress.html', {
+            'thing': thing,
+            'progress': progress,
+        })
+    return JsonResponse(progress)
+
+
+def _can_view_thing(user, thing):
+    """Whether user may see thing under its privacy settings."""
+    if thing.user == user:
+        return True
+    if thing.privacy_level == 'private':
+        return False
+    if thing.privacy_level == 'specific_users':
+        return user in thing.shared_with_users.all()
+    if thing.privacy_level == 'groups':
+        # Groups are de-scoped: treat as private if disabled
+        if not getattr(settings, 'FEATURE_GROUPS', False):
+            return False
+        user_groups = user.thing_groups.all()
+        thing_groups = thing.shared_with_groups.all()
+        return any(group in thing_groups for group in user_groups)
+    return True
+
+
 @login_required
 def thing_create(request):
     """Create a new thing."""
@@ -249,28 +304,13 @@ def thing_create(request):
             image_formset.instance = thing
             image_formset.save()
             
-            # Handle voice transcription if audio file uploaded
+            # Queue voice transcription if audio file uploaded (analysis follows it,
+            # falling back to the description if there is no transcript),
+            # otherwise analyze the description right away
             if thing.voice_recording:
-                transcription = ai_service.transcribe_audio(thing.voice_recording.path)
-                if transcription:
-                    thing.transcription = transcription
-                    thing.save()
-            
-            # Analyze thing content
-            thing_text = thing.transcription or thing.description
-            if thing_text:
-                analysis = ai_service.analyze_thing(thing_text)
-                thing.themes = analysis.get('themes', [])
-                thing.symbols = analysis.get('symbols', [])
-                thing.entities = analysis.get('entities', [])
-                
-                # Semantic bit analysis
-                semantic_analysis = semantic_service.extract_semantic_bits(thing_text)
-                thing.semantic_verbs = semantic_analysis.get('verb_phrases', [])
-                thing.semantic_nouns = semantic_analysis.get('noun_phrases', [])
-                thing.semantic_bits = semantic_analysis
-                
-                thing.save()
+                enqueue_transcription(thing)
+            elif thing.description:
+                enqueue_analysis(thing)
             
             messages.success(request, 'Thing recorded successfully!')
             
@@ -339,19 +379,8 @@ def record_voice(request):
                 privacy_level=request.user.default_privacy
             )
             
-            # Transcribe the audio
-            transcription = ai_service.transcribe_audio(thing.voice_recording.path)
-            if transcription:
-                thing.transcription = transcription
-                thing.description = transcription  # Also save as description
-                
-                # Analyze the thing
-                analysis = ai_service.analyze_thing(transcription)
-                thing.themes = analysis.get('themes', [])
-                thing.symbols = analysis.get('symbols', [])
-                thing.entities = analysis.get('entities', [])
-            
-            thing.save()
+            # Transcribe the audio in background, also saving it as the description
+            task = enqueue_transcription(thing, use_as_description=True)
             
             # Handle tags
             tags_text = request.POST.get('tags', '')
@@ -364,8 +393,14 @@ def record_voice(request):
                     )
                     thing.tags.add(tag)
             
-            messages.success(request, 'Thing recorded and transcribed successfully!')
-            return JsonResponse({'success': True, 'redirect_url': f'/things/{thing.pk}/'})
+            messages.success(request, 'Thing recorded! Transcription is running in the background.')
+            return JsonResponse({
+                'success': True,
+                'redirect_url': f'/things/{thing.pk}/',
+                'task_id': str(task.pk),
+                'status_url': reverse('tasks:status', args=[task.pk]),
+                'progress_url': reverse('things:transcription_progress', args=[thing.pk])
+            })
     
     return render(request, 'things/record_voice.html')
 
@@ -456,6 +491,147 @@ def community_search_api(request):
     return JsonResponse(results)
 
 
+@login_required
+def lemma_search(request):
+    """
+    Search the current user's things by lemma.
+    
+    q holds AND-ed terms with OR alternatives, e.g. "fly OR fall water:NOUN";
+    pos optionally restricts every term to comma-separated parts of speech.
+    """
+    query = request.GET.get('q', '')
+    groups = lemma_index.parse_query(query)
+    if not groups:
+        return JsonResponse({'error': 'Missing query'}, status=400)
+    
+    pos = [tag.strip().upper() for tag in request.GET.get('pos', '').split(',') if tag.strip()]
+    try:
+        limit = _limit_param(request, default=50)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    things = lemma_index.search(request.user, groups, pos=pos or None)
+    results = [
+        {
+            'id': str(thing.pk),
+            'title': thing.title,
+            'thing_date': thing.thing_date.isoformat(),
+            'url': thing.get_absolute_url(),
+            'match_count': thing.match_count,
+        }
+        for thing in things.only('id', 'title', 'thing_date', 'created_at')[:limit]
+    ]
+    
+    return JsonResponse({
+        'query': [[{'lemma': lemma, 'pos': term_pos} for lemma, term_pos in group] for group in groups],
+        'pos': pos,
+        'count': len(results),
+        'results': results,
+    })
+
+
+@login_required
+def relation_objects(request):
+    """Objects (or, with role=subject, subjects) of a verb across the user's things."""
+    verb = request.GET.get('verb', '').strip()
+    if not verb:
+        return JsonResponse({'error': 'Missing verb'}, status=400)
+    role = request.GET.get('role', 'object')
+    if role not in ('object', 'subject'):
+        return JsonResponse({'error': 'role must be object or subject'}, status=400)
+    try:
+        limit = _limit_param(request, default=50)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    lookup = relation_store.objects_of if role == 'object' else relation_store.subjects_of
+    return JsonResponse({
+        'verb': verb.lower(),
+        'role': role,
+        'results': lookup(request.user, verb, limit=limit),
+    })
+
+
+@login_required
+def relation_timeline(request):
+    """Subject-verb-object relations matching the given lemmas, in thing date order."""
+    subject = request.GET.get('subject', '').strip()
+    verb = request.GET.get('verb', '').strip()
+    obj = request.GET.get('object', '').strip()
+    try:
+        limit = _limit_param(request, default=200, maximum=1000)
+        since, until = _date_range_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or date'}, status=400)
+    
+    results = relation_store.timeline(
+        request.user, subject=subject, verb=verb, obj=obj, since=since, until=until, limit=limit
+    )
+    return JsonResponse({'count': len(results), 'results': results})
+
+
+@login_required
+def relation_top(request):
+    """The user's most frequent subject-verb-object triples."""
+    try:
+        limit = _limit_param(request, default=20)
+        since, until = _date_range_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or date'}, status=400)
+    
+    return JsonResponse({
+        'results': relation_store.top_triples(request.user, limit=limit, since=since, until=until),
+    })
+
+
+@login_required
+def semantic_trends(request):
+    """Weekly, monthly or yearly totals of the user's semantic stats, from the rollup table."""
+    period = request.GET.get('period', 'week')
+    if period not in PERIODS:
+        return JsonResponse({'error': f"period must be one of {', '.join(PERIODS)}"}, status=400)
+    try:
+        since, until = _date_range_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+    
+    results = semantic_rollups.trends(request.user, period=period, since=since, until=until)
+    return JsonResponse({'period': period, 'count': len(results), 'results': results})
+
+
+@login_required
+def ai_call_metrics(request):
+    """AI call latency/token histograms, cost and top callers over a rolling window, as JSON (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    
+    window = request.GET.get('window', '24h')
+    if window not in WINDOWS:
+        return JsonResponse({'error': f"window must be one of {', '.join(WINDOWS)}"}, status=400)
+    try:
+        user = int(request.GET['user']) if request.GET.get('user') else None
+        top_users = _limit_param(request, 20)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid user or limit'}, status=400)
+    
+    return JsonResponse(ai_metrics.summary(window, user=user, top_users=top_users))
+
+
+def _limit_param(request, default, maximum=200):
+    """The limit query parameter clamped to [1, maximum]; raises ValueError if malformed."""
+    return min(max(int(request.GET.get('limit', default)), 1), maximum)
+
+
+def _date_range_params(request):
+    """since/until query parameters (YYYY-MM-DD) as dates or None; raises ValueError if malformed."""
+    since = request.GET.get('since')
+    until = request.GET.get('until')
+    return (
+        date.fromisoformat(since) if since else None,
+        date.fromisoformat(until) if until else None,
+    )
+
+
 @login_required
 def story_list(request):
     """List all stories for the current user."""
@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration (picked up automatically from the project root).
+
+With preload_app the Django application is imported once in the master
+process and when_ready() loads the spaCy model there too. Workers forked
+afterwards share those memory pages copy-on-write instead of each loading
+their own copy of the model.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    """Warm up NLP models in the master before workers are forked."""
+    if not preload_app:
+        return
+    
+    from apps.things.services.semantic_service import semantic_service
+    
+    for name, stats in semantic_service.warm_up().items():
+        if 'error' in stats:
+            server.log.warning(f"spaCy model {name} not preloaded: {stats['error']}")
+        else:
+            server.log.info(
+                f"Preloaded spaCy model {name} in {stats['load_seconds']}s "
+                f"(RSS +{stats['rss_delta_bytes'] / (1024 * 1024):.1f} MiB)"
+            )
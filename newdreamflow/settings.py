@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'apps.things',
     'apps.patterns',
     'apps.sharing',
+    'apps.tasks',
 ]
 
 # Conditionally add Algolia if configured
@@ -197,6 +198,91 @@ ALGOLIA = {
     'INDEX_PREFIX': 'newdreamflow',
 }
 
+# OpenAI REST client (apps.things.services.openai_client): one pooled
+# connection set per process, per-call timeouts in seconds and jittered
+# exponential backoff between retries
+OPENAI = {
+    'BASE_URL': os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+    'TIMEOUT': float(os.getenv('OPENAI_TIMEOUT', '30')),
+    'TRANSCRIBE_TIMEOUT': float(os.getenv('OPENAI_TRANSCRIBE_TIMEOUT', '120')),
+    'MAX_RETRIES': int(os.getenv('OPENAI_MAX_RETRIES', '3')),
+    'BACKOFF_SECONDS': float(os.getenv('OPENAI_BACKOFF_SECONDS', '0.5')),
+    'BACKOFF_MAX_SECONDS': float(os.getenv('OPENAI_BACKOFF_MAX_SECONDS', '8')),
+    'POOL_SIZE': int(os.getenv('OPENAI_POOL_SIZE', '10')),
+    'KEEPALIVE_SECONDS': float(os.getenv('OPENAI_KEEPALIVE_SECONDS', '30')),
+    # Batched analysis (AIService.analyze_things): estimated prompt tokens per
+    # request and requests in flight at once
+    'BATCH_TOKEN_BUDGET': int(os.getenv('OPENAI_BATCH_TOKEN_BUDGET', '3000')),
+    'BATCH_CONCURRENCY': int(os.getenv('OPENAI_BATCH_CONCURRENCY', '4')),
+    # Pattern discovery (AIService.find_patterns): estimated tokens per chunk
+    # of entries and per merge request
+    'PATTERN_CHUNK_TOKENS': int(os.getenv('OPENAI_PATTERN_CHUNK_TOKENS', '6000')),
+}
+
+# Backend for AI calls (apps.things.services.ai_providers): openai, standin
+# (the local server started by run_ai_standin), disabled, or the dotted path
+# of an AIProvider subclass
+AI_PROVIDER = {
+    'BACKEND': os.getenv('AI_PROVIDER', 'openai'),
+    'STANDIN_URL': os.getenv('AI_STANDIN_URL', 'http://127.0.0.1:8765/v1'),
+}
+
+# Voice recordings are transcribed as overlapping segments (seconds), at most
+# WORKERS at a time (apps.things.services.transcription_service)
+TRANSCRIPTION = {
+    'SEGMENT_SECONDS': float(os.getenv('TRANSCRIPTION_SEGMENT_SECONDS', '120')),
+    'OVERLAP_SECONDS': float(os.getenv('TRANSCRIPTION_OVERLAP_SECONDS', '2')),
+    'WORKERS': int(os.getenv('TRANSCRIPTION_WORKERS', '4')),
+}
+
+# Persistent AI result cache (apps.things.services.ai_cache), keyed by a hash
+# of the text, model and prompt version; 0 entries disables it
+AI_CACHE = {
+    'TIMEOUT': int(os.getenv('AI_CACHE_TIMEOUT', str(60 * 60 * 24 * 90))),
+    'MAX_ENTRIES': int(os.getenv('AI_CACHE_MAX_ENTRIES', '50000')),
+    'PRUNE_EVERY': int(os.getenv('AI_CACHE_PRUNE_EVERY', '100')),
+}
+
+# AI call instrumentation (apps.things.services.ai_metrics): every provider
+# call is recorded with latency, tokens, outcome and user, written in batches
+# every FLUSH_SECONDS or FLUSH_SIZE records and kept RETENTION_DAYS.
+# PRICES are USD per 1K input/output tokens, or per audio minute.
+AI_METRICS = {
+    'ENABLED': os.getenv('AI_METRICS_ENABLED', 'true').lower() == 'true',
+    'RETENTION_DAYS': int(os.getenv('AI_METRICS_RETENTION_DAYS', '30')),
+    'FLUSH_SECONDS': float(os.getenv('AI_METRICS_FLUSH_SECONDS', '5')),
+    'FLUSH_SIZE': int(os.getenv('AI_METRICS_FLUSH_SIZE', '100')),
+    'PRICES': {
+        'gpt-3.5-turbo': {'input': 0.0005, 'output': 0.0015},
+        'whisper-1': {'minute': 0.006},
+    },
+}
+
+# spaCy pipeline used by semantic analysis: sm, md, lg, trf or a package name.
+# Changing it changes stored analyses; run backfill_semantics afterwards.
+SEMANTIC_MODEL = os.getenv('SEMANTIC_MODEL', 'sm')
+
+# Semantic analysis cache: bounded in-process LRU, optionally backed by a
+# shared Django cache alias (e.g. 'default') so workers reuse each other's results
+SEMANTIC_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '256')),
+    'BACKEND': os.getenv('SEMANTIC_CACHE_BACKEND', ''),
+    'TIMEOUT': int(os.getenv('SEMANTIC_CACHE_TIMEOUT', str(60 * 60 * 24))),
+}
+
+# Background task queue (apps.tasks, run with `manage.py run_workers`).
+# In eager mode tasks run in-process right after the request commits, so
+# development works without a worker; it defaults to on when DEBUG is on.
+TASK_QUEUE = {
+    'EAGER': os.getenv('TASK_QUEUE_EAGER', str(DEBUG)).lower() == 'true',
+    'MAX_ATTEMPTS': int(os.getenv('TASK_QUEUE_MAX_ATTEMPTS', '5')),
+    'BACKOFF_SECONDS': int(os.getenv('TASK_QUEUE_BACKOFF_SECONDS', '10')),
+    'BACKOFF_MAX_SECONDS': int(os.getenv('TASK_QUEUE_BACKOFF_MAX_SECONDS', '3600')),
+    'POLL_INTERVAL': float(os.getenv('TASK_QUEUE_POLL_INTERVAL', '1.0')),
+    'LOCK_TIMEOUT_SECONDS': int(os.getenv('TASK_QUEUE_LOCK_TIMEOUT_SECONDS', '900')),
+    'HEARTBEAT_SECONDS': int(os.getenv('TASK_QUEUE_HEARTBEAT_SECONDS', '60')),
+}
+
 # Production Security Settings
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -29,6 +29,7 @@ urlpatterns = [
     path('patterns/', include('apps.patterns.urls', namespace='patterns')),
     path('sharing/', include('apps.sharing.urls', namespace='sharing')),
     path('users/', include('apps.users.urls', namespace='users')),
+    path('tasks/', include('apps.tasks.urls', namespace='tasks')),
     path('accounts/', include('django.contrib.auth.urls')),
 ]
 